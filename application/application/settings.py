@@ -77,6 +77,16 @@ DATABASES = {
 }
 
 
+# Generation counters and lookup entries are shared between worker processes,
+# so this has to be a cache every process sees, not the per-process default.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    }
+}
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
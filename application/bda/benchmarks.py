@@ -0,0 +1,181 @@
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+from django.utils import timezone
+
+from .decomposition import decomposed_tour
+from .local_search import improve_tour, neighbour_lists
+from .models import CityBankBranch
+from .tsp import (
+    SOLVER_TIME_LIMIT, branch_coordinates, calculate_distance_matrix, greedy_order, tour_length, tsp_greedy_solver,
+    tsp_solver,
+)
+
+
+# Roughly the Dhaka metropolitan area, where the real branches are.
+AREA = {'latitude': (23.65, 23.95), 'longitude': (90.30, 90.55)}
+DEFAULT_SIZES = (10, 100, 1000, 5000, 20000)
+# Solvers that need the full n x n matrix are skipped above this size.
+MAX_MATRIX_SIZE = 5000
+
+
+def uniform_branches(size, rng):
+    latitudes = rng.uniform(*AREA['latitude'], size)
+    longitudes = rng.uniform(*AREA['longitude'], size)
+    return latitudes, longitudes
+
+
+def clustered_branches(size, rng, cluster_count=None):
+    """Gaussian blobs around random centres, like branches bunched in commercial districts."""
+    cluster_count = cluster_count or max(1, int(np.sqrt(size) / 2))
+    centres_latitude, centres_longitude = uniform_branches(cluster_count, rng)
+    labels = rng.integers(0, cluster_count, size)
+    spread = 0.01
+    return (
+        centres_latitude[labels] + rng.normal(0, spread, size),
+        centres_longitude[labels] + rng.normal(0, spread, size),
+    )
+
+
+def road_branches(size, rng, road_count=None):
+    """Points scattered tightly along random straight roads crossing the area."""
+    road_count = road_count or max(2, int(np.sqrt(size) / 4))
+    starts = np.column_stack(uniform_branches(road_count, rng))
+    ends = np.column_stack(uniform_branches(road_count, rng))
+    roads = rng.integers(0, road_count, size)
+    offsets = rng.random(size)[:, None]
+    points = starts[roads] + (ends[roads] - starts[roads]) * offsets + rng.normal(0, 0.0005, (size, 2))
+    return points[:, 0], points[:, 1]
+
+
+LAYOUTS = {
+    'uniform': uniform_branches,
+    'clustered': clustered_branches,
+    'road': road_branches,
+}
+
+
+def make_branches(latitudes, longitudes):
+    """Unsaved branches, so the solvers run on exactly what they get in production without touching the DB."""
+    return [
+        CityBankBranch(pk=index + 1, name=f'Branch {index + 1}', latitude=latitude, longitude=longitude)
+        for index, (latitude, longitude) in enumerate(zip(latitudes.tolist(), longitudes.tolist()))
+    ]
+
+
+def _branch_tour(city_branches, route):
+    positions = {id(branch): index for index, branch in enumerate(city_branches)}
+    return [positions[id(branch)] for branch in route]
+
+
+def run_distance_matrix(city_branches):
+    calculate_distance_matrix(city_branches)
+    return None
+
+
+def run_greedy(city_branches):
+    return _branch_tour(city_branches, tsp_greedy_solver(city_branches))
+
+
+def run_greedy_local_search(city_branches):
+    distance_matrix = calculate_distance_matrix(city_branches)
+    latitudes, longitudes = branch_coordinates(city_branches)
+    return improve_tour(greedy_order(latitudes, longitudes), distance_matrix, neighbours=neighbour_lists(distance_matrix))
+
+
+def run_ortools(city_branches):
+    return _branch_tour(city_branches, tsp_solver(city_branches, calculate_distance_matrix(city_branches)))
+
+
+def run_decomposed(city_branches):
+    latitudes, longitudes = branch_coordinates(city_branches)
+    return decomposed_tour(latitudes, longitudes, workers=1, time_limit=SOLVER_TIME_LIMIT)
+
+
+# name -> (runner, needs the full distance matrix)
+SOLVERS = {
+    'distance_matrix': (run_distance_matrix, True),
+    'greedy': (run_greedy, False),
+    'greedy_local_search': (run_greedy_local_search, True),
+    'ortools': (run_ortools, True),
+    'decomposed': (run_decomposed, False),
+}
+
+
+def timed_run(runner, city_branches):
+    started = time.perf_counter()
+    tour = runner(city_branches)
+    return time.perf_counter() - started, tour
+
+
+def peak_memory(runner, city_branches):
+    """Peak bytes allocated by one run. Traced separately because tracing slows Python-heavy solvers severalfold."""
+    tracemalloc.start()
+    try:
+        runner(city_branches)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, layouts=tuple(LAYOUTS), solvers=tuple(SOLVERS), repeat=1, seed=0,
+                   max_matrix_size=MAX_MATRIX_SIZE, progress=None):
+    """Benchmark every solver on every layout and size; returns a JSON-serialisable report."""
+    results = []
+    for layout in layouts:
+        for size in sizes:
+            rng = np.random.default_rng(seed)
+            latitudes, longitudes = LAYOUTS[layout](size, rng)
+            city_branches = make_branches(latitudes, longitudes)
+
+            for solver in solvers:
+                runner, needs_matrix = SOLVERS[solver]
+                entry = {'layout': layout, 'size': size, 'solver': solver}
+                if needs_matrix and size > max_matrix_size:
+                    entry['status'] = 'skipped'
+                    results.append(entry)
+                    continue
+
+                runs = [timed_run(runner, city_branches) for _ in range(repeat)]
+                seconds = [run[0] for run in runs]
+                tour = runs[-1][1]
+                entry.update({
+                    'status': 'ok',
+                    'seconds': min(seconds),
+                    'mean_seconds': sum(seconds) / len(seconds),
+                    'peak_memory_bytes': peak_memory(runner, city_branches),
+                    'tour_length_m': tour_length(latitudes, longitudes, tour) if tour is not None else None,
+                })
+                results.append(entry)
+                if progress is not None:
+                    progress(entry)
+
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'seed': seed,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare_reports(report, baseline, tolerance=0.2):
+    """Messages for every result that got slower or longer than ``baseline`` by more than ``tolerance``."""
+    previous = {
+        (entry['layout'], entry['size'], entry['solver']): entry
+        for entry in baseline.get('results', []) if entry.get('status') == 'ok'
+    }
+    regressions = []
+    for entry in report['results']:
+        before = previous.get((entry['layout'], entry['size'], entry['solver']))
+        if entry.get('status') != 'ok' or before is None:
+            continue
+        label = f"{entry['layout']}/{entry['size']}/{entry['solver']}"
+        if entry['seconds'] > before['seconds'] * (1 + tolerance):
+            regressions.append(f"{label}: {before['seconds']:.3f}s -> {entry['seconds']:.3f}s")
+        if entry['tour_length_m'] and before.get('tour_length_m') and entry['tour_length_m'] > before['tour_length_m'] * (1 + tolerance):
+            regressions.append(f"{label}: tour {before['tour_length_m']} m -> {entry['tour_length_m']} m")
+    return regressions
@@ -0,0 +1,187 @@
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from .local_search import improve_tour, neighbour_lists
+from .spatial import unit_vectors
+from .tsp import SOLVER_TIME_LIMIT, greedy_order, haversine_matrix, scale_distances, vrp_solver
+
+
+CLUSTER_SIZE = 300
+# Clusters are split again until none is larger than this.
+MAX_CLUSTER_SIZE = 2 * CLUSTER_SIZE
+KMEANS_ITERATIONS = 25
+JUNCTION_WINDOW = 40
+# Share of the overall time limit kept back for re-optimising the junctions.
+JUNCTION_TIME_SHARE = 0.1
+# Below this many seconds a cluster keeps its locally improved greedy tour
+# instead of starting OR-Tools.
+MIN_SOLVER_TIME = 0.2
+# Closing-edge cost that pins both ends of a junction window in place.
+PINNED_EDGE_COST = 10 ** 12
+
+
+def spherical_kmeans(points, cluster_count, iterations=KMEANS_ITERATIONS, seed=0):
+    """k-means on unit vectors, assigning each point to the centroid with the largest dot product."""
+    rng = np.random.default_rng(seed)
+    centroids = points[rng.choice(len(points), cluster_count, replace=False)]
+    labels = np.zeros(len(points), dtype=np.int64)
+    for _ in range(iterations):
+        labels = np.argmax(points @ centroids.T, axis=1)
+        sums = np.column_stack([np.bincount(labels, weights=points[:, axis], minlength=cluster_count) for axis in range(3)])
+        norms = np.linalg.norm(sums, axis=1)
+        filled = norms > 0
+        updated = centroids.copy()
+        updated[filled] = sums[filled] / norms[filled, None]
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+    return labels, centroids
+
+
+def partition(points, cluster_size=CLUSTER_SIZE, max_cluster_size=MAX_CLUSTER_SIZE):
+    """Split point indices into geographic clusters, recursing into any cluster that is still too large."""
+    clusters = []
+    stack = [np.arange(len(points))]
+    while stack:
+        indices = stack.pop()
+        if len(indices) <= max_cluster_size:
+            clusters.append(indices)
+            continue
+        labels, _ = spherical_kmeans(points[indices], math.ceil(len(indices) / cluster_size))
+        groups = [indices[labels == label] for label in np.unique(labels)]
+        if len(groups) == 1:
+            # Degenerate input (e.g. many identical points): halve along the widest axis.
+            subset = points[indices]
+            axis = int(np.argmax(subset.max(axis=0) - subset.min(axis=0)))
+            order = indices[np.argsort(subset[:, axis], kind='stable')]
+            groups = [order[:len(order) // 2], order[len(order) // 2:]]
+        stack.extend(groups)
+    return clusters
+
+
+def remaining_time(deadline):
+    return max(deadline - time.monotonic(), 0)
+
+
+def solve_cluster(latitudes, longitudes, time_limit):
+    """Closed tour over one cluster within ``time_limit`` seconds, as local indices starting at 0. Runs in a worker process."""
+    deadline = time.monotonic() + time_limit
+    size = len(latitudes)
+    if size <= 3:
+        return list(range(size))
+    distance_matrix = scale_distances(haversine_matrix(latitudes, longitudes))
+    neighbours = neighbour_lists(distance_matrix)
+    tour = improve_tour(
+        greedy_order(latitudes, longitudes), distance_matrix, neighbours=neighbours, time_limit=remaining_time(deadline)
+    )
+    if remaining_time(deadline) < MIN_SOLVER_TIME:
+        return tour
+    routes, _ = vrp_solver(distance_matrix, initial_routes=[tour[1:]], time_limit=remaining_time(deadline))
+    return improve_tour([0] + routes[0], distance_matrix, neighbours=neighbours, time_limit=remaining_time(deadline))
+
+
+def cluster_order(centroids, first):
+    """Visiting order of the clusters, starting with ``first``."""
+    if len(centroids) <= 2:
+        return [first] + [index for index in range(len(centroids)) if index != first]
+    latitudes = np.degrees(np.arcsin(np.clip(centroids[:, 2], -1, 1)))
+    longitudes = np.degrees(np.arctan2(centroids[:, 1], centroids[:, 0]))
+    distance_matrix = scale_distances(haversine_matrix(latitudes, longitudes))
+    return improve_tour(greedy_order(latitudes, longitudes, start=first), distance_matrix)
+
+
+def open_cycle(cycle, points, previous_point, next_point):
+    """Cut a cluster's closed tour into the path that best joins ``previous_point`` to ``next_point``.
+
+    Every edge (u, v) of the cycle is a candidate cut; the path then runs
+    v..u forwards or u..v backwards, whichever connects more cheaply.
+    """
+    cycle = np.asarray(cycle)
+    if len(cycle) == 1:
+        return cycle.tolist()
+    following = np.roll(cycle, -1)
+    u, v = points[cycle], points[following]
+    cut = np.linalg.norm(u - v, axis=1)
+    forward = np.linalg.norm(v - previous_point, axis=1) + np.linalg.norm(u - next_point, axis=1) - cut
+    backward = np.linalg.norm(u - previous_point, axis=1) + np.linalg.norm(v - next_point, axis=1) - cut
+    edge = int(np.argmin(np.minimum(forward, backward)))
+    path = np.roll(cycle, -(edge + 1))
+    if backward[edge] < forward[edge]:
+        path = path[::-1]
+    return path.tolist()
+
+
+def polish_junction(tour, position, latitudes, longitudes, window=JUNCTION_WINDOW, time_limit=None):
+    """Run the local search over the stretch of ``tour`` around ``position``, keeping its two ends fixed."""
+    start, end = max(position - window, 0), min(position + window, len(tour) - 1)
+    if end - start < 4:
+        return
+    nodes = np.asarray(tour[start:end + 1])
+    distance_matrix = scale_distances(haversine_matrix(latitudes[nodes], longitudes[nodes]))
+    # improve_tour works on closed tours with a fixed first node; making every
+    # edge back to it except from the stretch's real last node prohibitively
+    # expensive keeps that last node in place too.
+    distance_matrix[:, 0] = PINNED_EDGE_COST
+    distance_matrix[-1, 0] = 0
+    local = improve_tour(list(range(len(nodes))), distance_matrix, max_iterations=10 * window, time_limit=time_limit)
+    tour[start:end + 1] = nodes[local].tolist()
+
+
+def decomposed_tour(latitudes, longitudes, depot=0, workers=None, time_limit=SOLVER_TIME_LIMIT):
+    """Closed tour over a large point set, starting at ``depot``, without building the full distance matrix.
+
+    Points are clustered, each cluster is solved in a process pool within
+    ``time_limit`` seconds of wall time overall, clusters are visited in the
+    order of a tour over their centroids, and the stretches around every
+    junction between clusters are re-optimised.
+    """
+    deadline = time.monotonic() + time_limit
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    points = unit_vectors(latitudes, longitudes)
+    clusters = partition(points)
+    workers = min(workers or os.cpu_count() or 1, len(clusters))
+
+    # Clusters are solved in rounds of ``workers``; each round gets an equal
+    # share of what is left, minus the junctions' share.
+    rounds = math.ceil(len(clusters) / workers)
+    cluster_time_limit = min(SOLVER_TIME_LIMIT, remaining_time(deadline) * (1 - JUNCTION_TIME_SHARE) / rounds)
+    arguments = ([latitudes[cluster] for cluster in clusters], [longitudes[cluster] for cluster in clusters])
+    if workers > 1:
+        # Spawned workers do not inherit the locks of the threads running route jobs.
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            local_tours = list(pool.map(solve_cluster, *arguments, repeat(cluster_time_limit)))
+    else:
+        local_tours = list(map(solve_cluster, *arguments, repeat(cluster_time_limit)))
+    cycles = [cluster[local] for cluster, local in zip(clusters, local_tours)]
+
+    centroids = np.array([points[cluster].mean(axis=0) for cluster in clusters])
+    centroids /= np.linalg.norm(centroids, axis=1)[:, None]
+    first = next(index for index, cluster in enumerate(clusters) if depot in cluster)
+    order = cluster_order(centroids, first)
+
+    tour, junctions = [], []
+    previous_point = centroids[order[-1]]
+    for position, cluster in enumerate(order):
+        next_point = centroids[order[(position + 1) % len(order)]]
+        path = open_cycle(cycles[cluster], points, previous_point, next_point)
+        if tour:
+            junctions.append(len(tour))
+        tour.extend(path)
+        previous_point = points[path[-1]]
+
+    for number, position in enumerate(junctions):
+        time_left = remaining_time(deadline)
+        if not time_left:
+            break
+        polish_junction(tour, position, latitudes, longitudes, time_limit=time_left / (len(junctions) - number))
+
+    start = tour.index(depot)
+    return tour[start:] + tour[:start]
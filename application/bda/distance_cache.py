@@ -0,0 +1,204 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+from .tsp import distances_from, haversine_matrix, scale_distances
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms only get the in-process lock
+    fcntl = None
+
+
+DISTANCE_MATRIX_CACHE_DIR = getattr(
+    settings, 'DISTANCE_MATRIX_CACHE_DIR', os.path.join(settings.BASE_DIR, 'tsp_cache')
+)
+MIN_CAPACITY = 64
+GROWTH_FACTOR = 1.5
+# Past this share of changed branches a full rebuild is cheaper than patching.
+REBUILD_RATIO = 0.25
+
+
+class DistanceMatrixCache:
+    """Branch distance matrix persisted as a memory-mapped .npy file.
+
+    The matrix file is allocated with spare capacity so that adding, moving
+    or removing one branch only rewrites its own row and column (O(n)) in
+    place. Branch ids, coordinates and a version counter live next to it in
+    a small metadata file. Removal swaps the last branch into the freed slot,
+    so the order of ``ids`` is the order of the matrix rows.
+    """
+
+    def __init__(self, directory=DISTANCE_MATRIX_CACHE_DIR):
+        self.directory = directory
+        self.matrix_path = os.path.join(directory, 'distance_matrix.npy')
+        self.meta_path = os.path.join(directory, 'distance_matrix_meta.npz')
+        self.lock_path = os.path.join(directory, 'distance_matrix.lock')
+        self._thread_lock = threading.RLock()
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_meta(self):
+        if not (os.path.exists(self.meta_path) and os.path.exists(self.matrix_path)):
+            return None
+        with np.load(self.meta_path) as data:
+            return {
+                'ids': data['ids'].astype(np.int64),
+                'coords': data['coords'].astype(np.float64).reshape(-1, 2),
+                'version': int(data['version']),
+            }
+
+    def _save_meta(self, meta):
+        temporary_path = self.meta_path + '.tmp.npz'
+        np.savez(temporary_path, ids=meta['ids'], coords=meta['coords'], version=meta['version'])
+        os.replace(temporary_path, self.meta_path)
+
+    def _open_matrix(self):
+        return np.lib.format.open_memmap(self.matrix_path, mode='r+')
+
+    def _rebuild(self, ids, coords, version):
+        ids = np.asarray(ids, dtype=np.int64)
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        size = len(ids)
+        capacity = max(MIN_CAPACITY, int(size * GROWTH_FACTOR))
+
+        temporary_path = self.matrix_path + '.tmp.npy'
+        matrix = np.lib.format.open_memmap(temporary_path, mode='w+', dtype=np.int64, shape=(capacity, capacity))
+        if size:
+            matrix[:size, :size] = scale_distances(haversine_matrix(coords[:, 0], coords[:, 1]))
+        matrix.flush()
+        del matrix
+        os.replace(temporary_path, self.matrix_path)
+
+        meta = {'ids': ids, 'coords': coords, 'version': version}
+        self._save_meta(meta)
+        return meta
+
+    def _upsert(self, meta, pk, latitude, longitude):
+        ids, coords = meta['ids'], meta['coords']
+        positions = np.flatnonzero(ids == pk)
+        if len(positions):
+            index = int(positions[0])
+            if tuple(coords[index]) == (latitude, longitude):
+                return meta
+            coords = coords.copy()
+            coords[index] = (latitude, longitude)
+        else:
+            index = len(ids)
+            ids = np.append(ids, pk)
+            coords = np.vstack([coords, [(latitude, longitude)]])
+
+        matrix = self._open_matrix()
+        if len(ids) > matrix.shape[0]:
+            del matrix
+            return self._rebuild(ids, coords, meta['version'] + 1)
+
+        size = len(ids)
+        row = distances_from(latitude, longitude, coords[:, 0], coords[:, 1])
+        row[index] = 0
+        matrix[index, :size] = row
+        matrix[:size, index] = row
+        matrix.flush()
+        return {'ids': ids, 'coords': coords, 'version': meta['version'] + 1}
+
+    def _remove(self, meta, pk):
+        ids, coords = meta['ids'], meta['coords']
+        positions = np.flatnonzero(ids == pk)
+        if not len(positions):
+            return meta
+
+        index = int(positions[0])
+        last = len(ids) - 1
+        if index != last:
+            matrix = self._open_matrix()
+            matrix[index, :last + 1] = matrix[last, :last + 1]
+            matrix[:last + 1, index] = matrix[:last + 1, last]
+            matrix[index, index] = 0
+            matrix.flush()
+            ids = ids.copy()
+            coords = coords.copy()
+            ids[index] = ids[last]
+            coords[index] = coords[last]
+        return {'ids': ids[:last], 'coords': coords[:last], 'version': meta['version'] + 1}
+
+    def upsert(self, pk, latitude, longitude):
+        with self._locked():
+            meta = self._load_meta()
+            if meta is None:
+                return
+            self._save_meta(self._upsert(meta, pk, float(latitude), float(longitude)))
+
+    def remove(self, pk):
+        with self._locked():
+            meta = self._load_meta()
+            if meta is None:
+                return
+            self._save_meta(self._remove(meta, pk))
+
+    def _sync(self, rows, create):
+        current = {row[0]: (float(row[1]), float(row[2])) for row in rows}
+        meta = self._load_meta()
+        if meta is None:
+            if not create:
+                return None
+            ids = list(current)
+            return self._rebuild(ids, [current[pk] for pk in ids], 1)
+
+        cached = {int(pk): tuple(coords) for pk, coords in zip(meta['ids'], meta['coords'])}
+        removed = [pk for pk in cached if pk not in current]
+        changed = [pk for pk, coords in current.items() if cached.get(pk) != coords]
+        if not removed and not changed:
+            return meta
+
+        if len(removed) + len(changed) > max(1, REBUILD_RATIO * len(current)):
+            ids = list(current)
+            return self._rebuild(ids, [current[pk] for pk in ids], meta['version'] + 1)
+
+        for pk in removed:
+            meta = self._remove(meta, pk)
+        for pk in changed:
+            meta = self._upsert(meta, pk, *current[pk])
+        self._save_meta(meta)
+        return meta
+
+    def sync(self, rows, create=True):
+        """Bring the cache in line with ``rows`` starting (pk, latitude, longitude) and return its metadata.
+
+        With ``create=False`` a cache that was never built is left alone and ``None`` is returned.
+        """
+        with self._locked():
+            return self._sync(rows, create)
+
+    def rebuild(self, rows):
+        rows = list(rows)
+        with self._locked():
+            meta = self._load_meta()
+            version = meta['version'] + 1 if meta else 1
+            return self._rebuild([row[0] for row in rows], [row[1:3] for row in rows], version)
+
+    def matrix(self, rows):
+        """Return ``(ids, matrix, version)`` for the branch set in ``rows``; matrix rows follow ``ids``."""
+        # Sync and read under one lock, or a concurrent remove could swap rows
+        # between the two and leave ``ids`` describing a different matrix.
+        with self._locked():
+            meta = self._sync(rows, create=True)
+            size = len(meta['ids'])
+            matrix = np.array(self._open_matrix()[:size, :size])
+        return [int(pk) for pk in meta['ids']], matrix, meta['version']
+
+
+distance_matrix_cache = DistanceMatrixCache()
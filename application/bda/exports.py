@@ -0,0 +1,144 @@
+import csv
+
+from django.http import Http404, StreamingHttpResponse
+
+from .models import ProductCategory, Product, Supplier, SaleItem, PurchaseItem
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORTS = {
+    'categories': {
+        'model': ProductCategory,
+        'filename': 'product_categories.csv',
+        'columns': [
+            ('Name', 'name'),
+            ('Trade Type', 'trade_type'),
+        ],
+        'date_field': 'created_at',
+        'name_field': 'name',
+    },
+    'products': {
+        'model': Product,
+        'filename': 'products.csv',
+        'columns': [
+            ('Product Name', 'product_name'),
+            ('Category', 'category__name'),
+            ('Supplier', 'supplier__name'),
+            ('SKU', 'sku'),
+            ('Bar Code', 'bar_code'),
+            ('Unit', 'unit'),
+            ('Cost Price', 'cost_price'),
+            ('Selling Price', 'selling_price'),
+            ('Quantity in Stock', 'quantity_in_stock'),
+            ('Stock Threshold', 'stock_threshold'),
+            ('Active', 'is_active'),
+            ('Creation Date', 'creation_date'),
+        ],
+        'date_field': 'creation_date',
+        'name_field': 'product_name',
+    },
+    'suppliers': {
+        'model': Supplier,
+        'filename': 'suppliers.csv',
+        'columns': [
+            ('Name', 'name'),
+            ('Company Name', 'company_name'),
+            ('Contact Person', 'contact_person'),
+            ('Contact Number', 'contact_number'),
+            ('Email', 'email'),
+            ('Address', 'address'),
+        ],
+        'date_field': None,
+        'name_field': 'name',
+    },
+    'sales': {
+        'model': SaleItem,
+        'filename': 'sales.csv',
+        'columns': [
+            ('Sale', 'sale_id'),
+            ('Sale Date', 'sale__sale_date'),
+            ('Customer', 'sale__customer__name'),
+            ('Payment Method', 'sale__payment_method'),
+            ('Sale Total', 'sale__total_amount'),
+            ('Product', 'product__product_name'),
+            ('Quantity', 'quantity'),
+            ('Unit Price', 'unit_price'),
+            ('Total Price', 'total_price'),
+        ],
+        'date_field': 'sale__sale_date',
+        'name_field': 'product__product_name',
+    },
+    'purchases': {
+        'model': PurchaseItem,
+        'filename': 'purchases.csv',
+        'columns': [
+            ('Purchase', 'purchase_id'),
+            ('Purchase Date', 'purchase__purchase_date'),
+            ('Supplier', 'purchase__supplier__name'),
+            ('Purchase Total', 'purchase__total_amount'),
+            ('Product', 'product__product_name'),
+            ('Quantity', 'quantity'),
+            ('Unit Price', 'unit_price'),
+            ('Total Price', 'total_price'),
+        ],
+        'date_field': 'purchase__purchase_date',
+        'name_field': 'product__product_name',
+    },
+}
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def filter_export_queryset(spec, params):
+    queryset = spec['model'].objects.all()
+
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    search_name = params.get('search_name')
+
+    if spec['date_field'] and start_date and end_date:
+        queryset = queryset.filter(**{f"{spec['date_field']}__range": [start_date, end_date]})
+
+    if search_name:
+        queryset = queryset.filter(**{f"{spec['name_field']}__icontains": search_name})
+
+    return queryset
+
+
+def iter_export_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    # Walk the table in primary key order one chunk at a time. Unlike
+    # .iterator(), this keeps memory flat on MySQL, whose driver buffers the
+    # whole result set of a single query.
+    queryset = queryset.order_by('pk').values_list('pk', *fields)
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        for row in rows:
+            yield row[1:]
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+def stream_export(resource, params):
+    spec = EXPORTS.get(resource)
+    if spec is None:
+        raise Http404('Unknown export.')
+
+    headers, fields = zip(*spec['columns'])
+    queryset = filter_export_queryset(spec, params)
+    writer = csv.writer(Echo())
+
+    def rows():
+        yield writer.writerow(headers)
+        for row in iter_export_rows(queryset, fields):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{spec["filename"]}"'
+    return response
@@ -0,0 +1,148 @@
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Product
+from .search import match_products
+
+
+FACET_CACHE_TIMEOUT = 600
+FACET_GENERATION_KEY = 'shop-facets:generation'
+
+PRICE_BUCKETS = (
+    (Decimal('0'), Decimal('100')),
+    (Decimal('100'), Decimal('500')),
+    (Decimal('500'), Decimal('1000')),
+    (Decimal('1000'), Decimal('5000')),
+    (Decimal('5000'), Decimal('99999999.99')),
+)
+
+# Facets counted with a GROUP BY on one column: (filter name, column).
+VALUE_FACETS = (
+    ('category', 'category__name'),
+    ('supplier', 'supplier__name'),
+    ('trade_type', 'category__trade_type'),
+    ('unit', 'unit'),
+    ('is_active', 'is_active'),
+)
+
+
+def parse_filters(params):
+    filters = {}
+
+    for key in ('name', 'category', 'supplier', 'trade_type', 'unit'):
+        value = (params.get(key) or '').strip()
+        if value:
+            filters[key] = value
+
+    price = params.get('price')
+    if price:
+        try:
+            min_price, max_price = map(Decimal, price.split('-'))
+            filters['price'] = (min_price, max_price)
+        except (ValueError, InvalidOperation):
+            pass
+
+    is_active = params.get('is_active')
+    if is_active:
+        filters['is_active'] = is_active.lower() == 'true'
+
+    stock_threshold = params.get('stock_threshold')
+    if stock_threshold:
+        try:
+            filters['stock_threshold'] = int(stock_threshold)
+        except ValueError:
+            pass
+
+    return filters
+
+
+def apply_filters(queryset, filters, exclude=None):
+    for key, value in filters.items():
+        if key == exclude:
+            continue
+        if key == 'name':
+            queryset = match_products(queryset, value)
+        elif key == 'category':
+            queryset = queryset.filter(category__name=value)
+        elif key == 'supplier':
+            queryset = queryset.filter(supplier__name=value)
+        elif key == 'price':
+            queryset = queryset.filter(selling_price__range=value)
+        elif key == 'trade_type':
+            queryset = queryset.filter(category__trade_type=value)
+        elif key == 'unit':
+            queryset = queryset.filter(unit=value)
+        elif key == 'is_active':
+            queryset = queryset.filter(is_active=value)
+        elif key == 'stock_threshold':
+            queryset = queryset.filter(quantity_in_stock__lte=value)
+    return queryset
+
+
+def facet_generation():
+    generation = cache.get(FACET_GENERATION_KEY)
+    if generation is None:
+        generation = 1
+        cache.add(FACET_GENERATION_KEY, generation, None)
+    return generation
+
+
+def invalidate_facets():
+    # Bumping the generation orphans every cached combination at once.
+    try:
+        cache.incr(FACET_GENERATION_KEY)
+    except ValueError:
+        cache.set(FACET_GENERATION_KEY, 2, None)
+
+
+def _facet_cache_key(filters):
+    normalized = json.dumps(sorted((key, str(value)) for key, value in filters.items()))
+    digest = hashlib.md5(normalized.encode()).hexdigest()
+    return f'shop-facets:{facet_generation()}:{digest}'
+
+
+def compute_facets(filters):
+    # Each facet is counted with every filter applied except its own, so the
+    # sidebar shows how many products each alternative choice would return.
+    products = Product.objects.all()
+    facets = {}
+
+    for key, column in VALUE_FACETS:
+        rows = (
+            apply_filters(products, filters, exclude=key)
+            .values(column)
+            .annotate(count=Count('id'))
+            .order_by(column)
+        )
+        facets[key] = [
+            {'value': row[column], 'count': row['count']}
+            for row in rows
+            if row[column] not in (None, '')
+        ]
+
+    bucket_counts = apply_filters(products, filters, exclude='price').aggregate(**{
+        f'bucket_{index}': Count('id', filter=Q(selling_price__gte=low, selling_price__lt=high))
+        for index, (low, high) in enumerate(PRICE_BUCKETS)
+    })
+    facets['price'] = [
+        {'value': f'{low}-{high}', 'low': str(low), 'high': str(high), 'count': bucket_counts[f'bucket_{index}']}
+        for index, (low, high) in enumerate(PRICE_BUCKETS)
+    ]
+
+    for option in facets['is_active']:
+        option['value'] = 'true' if option['value'] else 'false'
+
+    return facets
+
+
+def get_facets(filters):
+    key = _facet_cache_key(filters)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(filters)
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
@@ -1,7 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from .models import CustomUser, Subscription, ProductCategory, Product, Supplier, Customer, Sale, SaleItem, StockEntry, Purchase, PurchaseItem, PurchaseReturn, PurchaseItemReturn, SalesItemReturn, SalesReturn, Warehouse, WarehouseStock, StockTransfer, ContactForm
-from .utils import generate_barcode
+from .utils import generate_barcode, next_sku
 from decimal import Decimal, ROUND_DOWN
 
 class CustomUserCreationForm(UserCreationForm):
@@ -58,6 +58,9 @@ class ProductForm(forms.ModelForm):
         super(ProductForm, self).__init__(*args, **kwargs)
         self.initial['barcode'] = generate_barcode()
         self.fields['stock_threshold'].required = False
+        if self.instance.pk:
+            # The edit is posted as a change against the stock the user was shown.
+            self.fields['quantity_in_stock'].show_hidden_initial = True
 
     def clean(self):
         cleaned_data = super().clean()
@@ -78,27 +81,31 @@ class ProductForm(forms.ModelForm):
             selling_price = cost_price * (1 + profit_margin)
             product.selling_price = selling_price
 
-        existing_skus = Product.objects.values_list('sku', flat=True)
-        new_sku = generate_sku(existing_skus)
-        product.sku = new_sku
+        if not product.sku:
+            product.sku = next_sku()
 
         if commit:
             product.save()
 
         return product
 
-def generate_sku(existing_skus):
-    if existing_skus:
-        sku_numbers = [int(sku.split('SKU')[1]) for sku in existing_skus if 'SKU' in sku]
-        if sku_numbers:
-            sku_number = max(sku_numbers) + 1
-        else:
-            sku_number = 1
-    else:
-        sku_number = 1
+    def stock_adjustment(self):
+        """How far the user moved quantity_in_stock from the value they were shown, for an existing product."""
+        if not self.instance.pk or 'quantity_in_stock' not in self.changed_data:
+            return 0
+        field = self.fields['quantity_in_stock']
+        try:
+            shown = field.to_python(self.data.get(self.add_initial_prefix('quantity_in_stock')))
+        except forms.ValidationError:
+            shown = None
+        if shown is None:
+            shown = self.initial.get('quantity_in_stock') or 0
+        return self.cleaned_data['quantity_in_stock'] - shown
 
-    new_sku = f'SKU{sku_number:03d}'
-    return new_sku
+
+class ProductImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV or XLSX with product_name, category and cost_price columns.')
+    dry_run = forms.BooleanField(required=False)
 
        
 class SupplierForm(forms.ModelForm):
@@ -117,4 +124,21 @@ from .models import CityBankBranch
 class CityBankBranchForm(forms.ModelForm):
     class Meta:
         model = CityBankBranch
-        fields = ['name', 'latitude', 'longitude']
+        fields = ['name', 'latitude', 'longitude', 'demand', 'service_time', 'time_window_start', 'time_window_end']
+        widgets = {
+            'time_window_start': forms.TimeInput(attrs={'type': 'time'}),
+            'time_window_end': forms.TimeInput(attrs={'type': 'time'}),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('time_window_start')
+        end = cleaned_data.get('time_window_end')
+        if start and end and start > end:
+            raise forms.ValidationError("The time window must end after it starts.")
+        return cleaned_data
+
+
+class CityBankBranchImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV, XLSX or GeoJSON with name, latitude and longitude.')
+    dry_run = forms.BooleanField(required=False)
@@ -0,0 +1,446 @@
+import csv
+import io
+import json
+import os
+import zipfile
+from datetime import datetime
+from decimal import Decimal, ROUND_DOWN
+
+import numpy as np
+from django.db import DatabaseError, transaction
+
+from .distance_cache import distance_matrix_cache
+from .facets import invalidate_facets
+from .inventory import post_movements
+from .low_stock import check_low_stock
+from .models import CityBankBranch, Product, ProductCategory, StockMovement, Supplier
+from .reporting import apply_dashboard_delta
+from .route_jobs import branch_rows
+from .search import index_products
+from .spatial import SphereKDTree
+from .tsp import DAY_MINUTES, EARTH_RADIUS_KM
+from .utils import generate_barcode, reserve_skus
+
+
+IMPORT_CHUNK_SIZE = 1000
+PROFIT_MARGIN = Decimal('0.3')
+DEFAULT_STOCK_THRESHOLD = 5
+# Product prices are DecimalField(max_digits=10, decimal_places=2).
+MAX_PRICE = Decimal('99999999.99')
+# Quantities are PositiveIntegerField, which every backend can store up to this.
+MAX_INTEGER = 2147483647
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'active')
+# Branches closer than this to an existing or earlier imported branch are treated as duplicates.
+BRANCH_DUPLICATE_RADIUS_M = 25
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+
+def _normalize_header(header):
+    return (header or '').strip().lower().replace(' ', '_')
+
+
+def read_tabular_rows(file, filename):
+    """Yield ``(row_number, row)`` pairs from a CSV or XLSX upload with normalised headers."""
+    extension = os.path.splitext(filename)[1].lower()
+
+    if extension == '.xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError('Reading .xlsx files requires the openpyxl package.')
+        try:
+            sheet = load_workbook(file, read_only=True, data_only=True).active
+        except (zipfile.BadZipFile, KeyError, OSError):
+            raise ValueError('The file is not a valid .xlsx workbook.')
+        rows = sheet.iter_rows(values_only=True)
+        headers = [_normalize_header(str(value) if value is not None else '') for value in next(rows, ())]
+        for row_number, values in enumerate(rows, start=2):
+            yield row_number, {
+                header: '' if value is None else str(value).strip()
+                for header, value in zip(headers, values)
+            }
+        return
+
+    if extension != '.csv':
+        raise ValueError('Unsupported file type; upload a .csv or .xlsx file.')
+
+    if isinstance(file, io.TextIOBase):
+        text = file
+    else:
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    try:
+        reader.fieldnames = [_normalize_header(header) for header in reader.fieldnames or []]
+        for row_number, row in enumerate(reader, start=2):
+            yield row_number, {key: (value or '').strip() for key, value in row.items() if key}
+    except csv.Error as error:
+        raise ValueError(f'The file is not valid CSV (line {reader.line_num}): {error}')
+    except UnicodeDecodeError:
+        raise ValueError('The file is not UTF-8 encoded CSV.')
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _check_price(number, field):
+    if number > MAX_PRICE:
+        raise ValueError(f'{field} cannot be more than {MAX_PRICE}.')
+    return number
+
+
+def _parse_decimal(value, field):
+    try:
+        number = Decimal(value)
+    except (ArithmeticError, TypeError):
+        raise ValueError(f'{field} must be a number.')
+    if not number.is_finite():
+        raise ValueError(f'{field} must be a number.')
+    if number < 0:
+        raise ValueError(f'{field} cannot be negative.')
+    return _check_price(number, field).quantize(Decimal('0.00'), rounding=ROUND_DOWN)
+
+
+def _parse_text(value, field, max_length):
+    if value and len(value) > max_length:
+        raise ValueError(f'{field} is longer than {max_length} characters.')
+    return value or None
+
+
+def _parse_int(value, field, default):
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f'{field} must be a whole number.')
+    if number < 0:
+        raise ValueError(f'{field} cannot be negative.')
+    if number > MAX_INTEGER:
+        raise ValueError(f'{field} cannot be more than {MAX_INTEGER}.')
+    return number
+
+
+def build_product(row, categories, suppliers):
+    product_name = row.get('product_name', '')
+    if not product_name:
+        raise ValueError('product_name is required.')
+    if len(product_name) > 100:
+        raise ValueError('product_name is longer than 100 characters.')
+
+    category_id = categories.get(row.get('category', '').lower())
+    if category_id is None:
+        raise ValueError(f"Unknown category '{row.get('category', '')}'.")
+
+    supplier_id = None
+    if row.get('supplier'):
+        supplier_id = suppliers.get(row['supplier'].lower())
+        if supplier_id is None:
+            raise ValueError(f"Unknown supplier '{row['supplier']}'.")
+
+    cost_price = _parse_decimal(row.get('cost_price'), 'cost_price')
+    if row.get('selling_price'):
+        selling_price = _parse_decimal(row['selling_price'], 'selling_price')
+    else:
+        selling_price = _check_price(
+            (cost_price * (1 + PROFIT_MARGIN)).quantize(Decimal('0.00'), rounding=ROUND_DOWN), 'selling_price',
+        )
+
+    is_active = row.get('is_active', '')
+    return Product(
+        product_name=product_name,
+        category_id=category_id,
+        supplier_id=supplier_id,
+        unit=_parse_text(row.get('unit'), 'unit', 50),
+        cost_price=cost_price,
+        selling_price=selling_price,
+        quantity_in_stock=_parse_int(row.get('quantity_in_stock'), 'quantity_in_stock', 0),
+        stock_threshold=_parse_int(row.get('stock_threshold'), 'stock_threshold', DEFAULT_STOCK_THRESHOLD),
+        is_active=is_active.lower() in TRUE_VALUES if is_active else True,
+        bar_code=_parse_text(row.get('bar_code'), 'bar_code', 50),
+    )
+
+
+def _insert_products(products):
+    skus = reserve_skus(len(products))
+    for product, sku in zip(products, skus):
+        product.sku = sku
+        if not product.bar_code:
+            product.bar_code = generate_barcode()
+
+    with transaction.atomic():
+        Product.objects.bulk_create(products)
+        # bulk_create skips signals and MySQL does not return primary keys, so
+        # look the rows up by their unique names for the follow-up work.
+        product_ids = list(
+            Product.objects.filter(product_name__in=[product.product_name for product in products])
+            .values_list('pk', flat=True)
+        )
+        index_products(product_ids)
+        apply_dashboard_delta(
+            available_stock_amount=sum(
+                (product.cost_price * product.quantity_in_stock for product in products if product.is_active),
+                Decimal('0'),
+            ),
+            total_stock_quantity=sum(product.quantity_in_stock for product in products if product.is_active),
+        )
+        post_movements([
+            StockMovement(
+                product_id=pk, quantity=quantity, movement_type='opening', reference_type='product', reference_id=pk,
+            )
+            for pk, quantity in Product.objects.filter(pk__in=product_ids, quantity_in_stock__gt=0)
+            .values_list('pk', 'quantity_in_stock')
+        ], update_products=False)
+        check_low_stock(product_ids)
+
+
+def import_products(rows, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+    """Validate and insert ``(row_number, row)`` pairs in chunks, collecting per-row errors."""
+    result = ImportResult()
+    categories = {name.lower(): pk for pk, name in ProductCategory.objects.values_list('pk', 'name')}
+    suppliers = {name.lower(): pk for pk, name in Supplier.objects.values_list('pk', 'name')}
+    seen_names = set()
+    seen_barcodes = set()
+
+    for chunk in chunked(rows, chunk_size):
+        candidates = []
+        for row_number, row in chunk:
+            try:
+                product = build_product(row, categories, suppliers)
+            except ValueError as error:
+                result.add_error(row_number, str(error))
+                continue
+            if product.product_name.lower() in seen_names:
+                result.add_error(row_number, f"Duplicate product_name '{product.product_name}' in file.")
+                continue
+            if product.bar_code and product.bar_code in seen_barcodes:
+                result.add_error(row_number, f"Duplicate bar_code '{product.bar_code}' in file.")
+                continue
+            seen_names.add(product.product_name.lower())
+            if product.bar_code:
+                seen_barcodes.add(product.bar_code)
+            candidates.append((row_number, product))
+
+        existing_names = {
+            name.lower() for name in Product.objects.filter(
+                product_name__in=[product.product_name for _, product in candidates]
+            ).values_list('product_name', flat=True)
+        }
+        existing_barcodes = set(Product.objects.filter(
+            bar_code__in=[product.bar_code for _, product in candidates if product.bar_code]
+        ).values_list('bar_code', flat=True))
+
+        products = []
+        for row_number, product in candidates:
+            if product.product_name.lower() in existing_names:
+                result.add_error(row_number, f"Product '{product.product_name}' already exists.")
+            elif product.bar_code in existing_barcodes:
+                result.add_error(row_number, f"bar_code '{product.bar_code}' already exists.")
+            else:
+                products.append((row_number, product))
+
+        if not products or dry_run:
+            result.created += len(products)
+            continue
+
+        try:
+            _insert_products([product for _, product in products])
+        except DatabaseError as error:
+            for row_number, _ in products:
+                result.add_error(row_number, f'Chunk rejected by the database: {error}')
+            continue
+        result.created += len(products)
+
+    if result.created and not dry_run:
+        invalidate_facets()
+
+    result.errors.sort()
+    return result
+
+
+#Branch import
+def read_branch_rows(file, filename):
+    """Yield ``(row_number, row)`` pairs from a CSV/XLSX upload or a GeoJSON FeatureCollection of points."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in ('.csv', '.xlsx'):
+        yield from read_tabular_rows(file, filename)
+        return
+    if extension not in ('.geojson', '.json'):
+        raise ValueError('Unsupported file type; upload a .csv, .xlsx or .geojson file.')
+
+    try:
+        data = json.load(file)
+    except (UnicodeDecodeError, ValueError):
+        raise ValueError('The file is not valid GeoJSON.')
+    if not isinstance(data, dict) or data.get('type') != 'FeatureCollection':
+        raise ValueError('GeoJSON must be a FeatureCollection.')
+
+    for row_number, feature in enumerate(data.get('features') or [], start=1):
+        feature = feature if isinstance(feature, dict) else {}
+        properties = feature.get('properties') or {}
+        row = {
+            _normalize_header(key): '' if value is None else str(value).strip()
+            for key, value in properties.items()
+        }
+        geometry = feature.get('geometry') or {}
+        coordinates = geometry.get('coordinates')
+        if geometry.get('type') == 'Point' and isinstance(coordinates, list) and len(coordinates) >= 2:
+            # GeoJSON positions are [longitude, latitude].
+            row['longitude'], row['latitude'] = str(coordinates[0]), str(coordinates[1])
+        else:
+            row.setdefault('latitude', '')
+            row.setdefault('longitude', '')
+            row['_geometry_error'] = 'Feature geometry must be a Point.'
+        yield row_number, row
+
+
+def _parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _parse_time(value, field):
+    if not value:
+        return None
+    for time_format in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(value, time_format).time()
+        except ValueError:
+            continue
+    raise ValueError(f'{field} must be a time like 09:30.')
+
+
+def coordinate_errors(latitudes, longitudes):
+    """One message (or ``None``) per row, from a single vectorized range check of the coordinates."""
+    missing = np.isnan(latitudes) | np.isnan(longitudes)
+    latitude_out_of_range = ~missing & (np.abs(latitudes) > 90)
+    longitude_out_of_range = ~missing & (np.abs(longitudes) > 180)
+    null_island = ~missing & (latitudes == 0) & (longitudes == 0)
+
+    errors = np.full(len(latitudes), None, dtype=object)
+    errors[null_island] = 'Coordinates 0, 0 are almost certainly a missing location.'
+    errors[longitude_out_of_range] = 'longitude must be between -180 and 180.'
+    errors[latitude_out_of_range] = 'latitude must be between -90 and 90.'
+    errors[missing] = 'latitude and longitude must be numbers.'
+    return errors.tolist()
+
+
+def find_nearby_duplicates(latitudes, longitudes, existing_latitudes, existing_longitudes, radius_m):
+    """For each new point, whether it lies within ``radius_m`` of an existing point or an earlier new one."""
+    existing_count = len(existing_latitudes)
+    tree = SphereKDTree(
+        np.concatenate((existing_latitudes, latitudes)), np.concatenate((existing_longitudes, longitudes))
+    )
+    # New points join the tree one by one as they are accepted, so duplicates
+    # inside the file are caught against the row that came first.
+    for index in range(existing_count, existing_count + len(latitudes)):
+        tree.remove(index)
+
+    # Chord length on the unit sphere for an arc of radius_m.
+    max_chord = 2 * np.sin(radius_m / 1000 / EARTH_RADIUS_KM / 2)
+    duplicates = []
+    for index in range(existing_count, existing_count + len(latitudes)):
+        nearest = tree.nearest(index)
+        duplicate = nearest is not None and tree.chord_distance(index, nearest) <= max_chord
+        if not duplicate:
+            tree.restore(index)
+        duplicates.append(duplicate)
+    return duplicates
+
+
+def build_branch(row):
+    name = row.get('name', '')
+    if not name:
+        raise ValueError('name is required.')
+    if len(name) > 100:
+        raise ValueError('name is longer than 100 characters.')
+
+    time_window_start = _parse_time(row.get('time_window_start'), 'time_window_start')
+    time_window_end = _parse_time(row.get('time_window_end'), 'time_window_end')
+    if time_window_start and time_window_end and time_window_start > time_window_end:
+        raise ValueError('time_window_end must not be before time_window_start.')
+
+    service_time = _parse_int(row.get('service_time'), 'service_time', 0)
+    if service_time > DAY_MINUTES:
+        # Routes are planned within one day, so the branch could never be served.
+        raise ValueError(f'service_time cannot be more than {DAY_MINUTES} minutes.')
+
+    return CityBankBranch(
+        name=name,
+        demand=_parse_int(row.get('demand'), 'demand', 0),
+        service_time=service_time,
+        time_window_start=time_window_start,
+        time_window_end=time_window_end,
+    )
+
+
+def import_branches(rows, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False, duplicate_radius_m=BRANCH_DUPLICATE_RADIUS_M):
+    """Validate and bulk insert ``(row_number, row)`` branch pairs, collecting per-row errors.
+
+    Coordinates are validated for the whole file at once and rows within
+    ``duplicate_radius_m`` of a known branch are rejected. The distance
+    matrix cache is brought up to date once at the end rather than per branch.
+    """
+    result = ImportResult()
+    rows = list(rows)
+    latitudes = np.array([_parse_float(row.get('latitude')) for _, row in rows], dtype=np.float64)
+    longitudes = np.array([_parse_float(row.get('longitude')) for _, row in rows], dtype=np.float64)
+
+    candidates = []
+    for index, ((row_number, row), error) in enumerate(zip(rows, coordinate_errors(latitudes, longitudes))):
+        error = row.get('_geometry_error') or error
+        if error is None:
+            try:
+                branch = build_branch(row)
+            except ValueError as exception:
+                error = str(exception)
+        if error is not None:
+            result.add_error(row_number, error)
+            continue
+        branch.latitude, branch.longitude = float(latitudes[index]), float(longitudes[index])
+        candidates.append((row_number, branch))
+
+    existing = np.array(CityBankBranch.objects.values_list('latitude', 'longitude'), dtype=np.float64).reshape(-1, 2)
+    duplicates = find_nearby_duplicates(
+        np.array([branch.latitude for _, branch in candidates]),
+        np.array([branch.longitude for _, branch in candidates]),
+        existing[:, 0], existing[:, 1], duplicate_radius_m,
+    )
+    branches = []
+    for (row_number, branch), duplicate in zip(candidates, duplicates):
+        if duplicate:
+            result.add_error(row_number, f'Within {duplicate_radius_m} m of another branch.')
+        else:
+            branches.append((row_number, branch))
+
+    if branches and not dry_run:
+        try:
+            with transaction.atomic():
+                # bulk_create skips the per-branch signals that patch the distance matrix cache one by one.
+                CityBankBranch.objects.bulk_create([branch for _, branch in branches], batch_size=chunk_size)
+                transaction.on_commit(lambda: distance_matrix_cache.sync(branch_rows(), create=False))
+        except DatabaseError as error:
+            for row_number, _ in branches:
+                result.add_error(row_number, f'Rejected by the database: {error}')
+            branches = []
+    result.created = len(branches)
+
+    result.errors.sort()
+    return result
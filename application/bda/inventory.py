@@ -0,0 +1,439 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q, QuerySet, Sum
+from django.utils import timezone
+
+from .models import (
+    Product, ProductCategory, PurchaseItem, PurchaseItemReturn, SaleItem, SalesItemReturn, StockEntry, StockMovement,
+    StockTransfer, Warehouse, WarehouseStock,
+)
+from .facets import invalidate_facets
+from .low_stock import check_low_stock
+from .product_lookup import invalidate_all_product_lookups, invalidate_product_lookups
+from .reporting import apply_dashboard_delta, rebuild_dashboard_snapshot
+
+
+# Purchases, sales and returns carry no warehouse: stock they add goes into
+# this one, and stock they remove comes out of it first, then out of
+# whichever other warehouses hold the product.
+DEFAULT_WAREHOUSE_NAME = getattr(settings, 'INVENTORY_DEFAULT_WAREHOUSE', 'Main')
+
+# Models whose rows move stock: movement type, direction, and the paths to
+# the product and quantity (plus the warehouses for transfers).
+STOCK_SOURCES = {
+    PurchaseItem: ('purchase', 1, {'product': 'product_id', 'quantity': 'quantity'}),
+    SaleItem: ('sale', -1, {'product': 'product_id', 'quantity': 'quantity'}),
+    StockEntry: ('stock_entry', 1, {'product': 'product_id', 'quantity': 'quantity_added'}),
+    PurchaseItemReturn: ('purchase_return', -1, {'product': 'purchase_item__product_id', 'quantity': 'return_quantity'}),
+    SalesItemReturn: ('sales_return', 1, {'product': 'sale_item__product_id', 'quantity': 'return_quantity'}),
+    StockTransfer: ('transfer', 1, {
+        'product': 'product_id',
+        'quantity': 'quantity_transferred',
+        'from_warehouse': 'from_warehouse_id',
+        'to_warehouse': 'to_warehouse_id',
+    }),
+}
+
+
+class InsufficientStock(ValueError):
+    def __init__(self, product_id, warehouse_id, requested):
+        self.product_id = product_id
+        self.warehouse_id = warehouse_id
+        self.requested = requested
+        location = f' in warehouse #{warehouse_id}' if warehouse_id is not None else ''
+        super().__init__(f'Not enough stock of product #{product_id}{location} to remove {requested}.')
+
+
+def default_warehouse_id():
+    pk = Warehouse.objects.filter(name=DEFAULT_WAREHOUSE_NAME).values_list('pk', flat=True).first()
+    if pk is not None:
+        return pk
+    try:
+        with transaction.atomic():
+            return Warehouse.objects.create(name=DEFAULT_WAREHOUSE_NAME).pk
+    except IntegrityError:
+        return Warehouse.objects.get(name=DEFAULT_WAREHOUSE_NAME).pk
+
+
+def stock_on_hand(product_id, warehouse_id=None):
+    """Current stock of a product, in total or in one warehouse; a single indexed lookup either way."""
+    if warehouse_id is None:
+        queryset = Product.objects.filter(pk=product_id)
+    else:
+        queryset = WarehouseStock.objects.filter(product_id=product_id, warehouse_id=warehouse_id)
+    return queryset.values_list('quantity_in_stock', flat=True).first() or 0
+
+
+#Balances
+def _balance_condition(keys):
+    by_warehouse = defaultdict(list)
+    for product_id, warehouse_id in keys:
+        by_warehouse[warehouse_id].append(product_id)
+    return reduce(
+        lambda left, right: left | right,
+        (Q(warehouse_id=warehouse_id, product_id__in=products) for warehouse_id, products in by_warehouse.items()),
+    )
+
+
+def _lock_warehouse_stock(keys):
+    """Lock the balances for ``(product_id, warehouse_id)`` keys, in key order, and return them by key."""
+    stocks = (
+        WarehouseStock.objects.select_for_update().filter(_balance_condition(keys)).order_by('product_id', 'warehouse_id')
+    )
+    return {(stock.product_id, stock.warehouse_id): stock for stock in stocks}
+
+
+def _apply_warehouse_deltas(deltas):
+    """Add ``{(product_id, warehouse_id): delta}`` to the warehouse balances.
+
+    Balances that do not exist yet are created first, then only the
+    balances touched are locked, with a single ``SELECT ... FOR UPDATE`` in
+    (product, warehouse) order, so overlapping postings queue on each other
+    instead of deadlocking. New balances are checked in memory and written
+    with one ``bulk_update``. Must run inside a transaction.
+    """
+    deltas = {key: delta for key, delta in sorted(deltas.items()) if delta}
+    if not deltas:
+        return
+
+    existing = set(WarehouseStock.objects.filter(_balance_condition(deltas)).values_list('product_id', 'warehouse_id'))
+    missing = [key for key in deltas if key not in existing]
+    for product_id, warehouse_id in missing:
+        if deltas[product_id, warehouse_id] < 0:
+            raise InsufficientStock(product_id, warehouse_id, -deltas[product_id, warehouse_id])
+    if missing:
+        WarehouseStock.objects.bulk_create(
+            [WarehouseStock(product_id=product_id, warehouse_id=warehouse_id) for product_id, warehouse_id in missing],
+            ignore_conflicts=True,
+        )
+
+    stocks = _lock_warehouse_stock(deltas)
+
+    now = timezone.now()
+    for key, delta in deltas.items():
+        stock = stocks[key]
+        if stock.quantity_in_stock + delta < 0:
+            raise InsufficientStock(key[0], key[1], -delta)
+        stock.quantity_in_stock += delta
+        stock.last_updated = now
+    WarehouseStock.objects.bulk_update(stocks.values(), ['quantity_in_stock', 'last_updated'], batch_size=1000)
+
+
+def _apply_product_deltas(totals):
+    """Add ``{product_id: delta}`` to the product totals the same way, after the warehouse balances."""
+    totals = {product_id: delta for product_id, delta in totals.items() if delta}
+    if not totals:
+        return
+
+    products = list(
+        Product.objects.select_for_update().filter(pk__in=list(totals)).order_by('pk')
+        .only('pk', 'quantity_in_stock', 'cost_price', 'is_active', 'bar_code', 'sku')
+    )
+    for product in products:
+        if product.quantity_in_stock + totals[product.pk] < 0:
+            raise InsufficientStock(product.pk, None, -totals[product.pk])
+        product.quantity_in_stock += totals[product.pk]
+    Product.objects.bulk_update(products, ['quantity_in_stock'], batch_size=1000)
+
+    # bulk_update bypasses Product signals, so keep the dashboard, low-stock
+    # alerts, cached barcode lookups and shop facet counts in step here.
+    active = [product for product in products if product.is_active]
+    apply_dashboard_delta(
+        available_stock_amount=sum((product.cost_price * totals[product.pk] for product in active), Decimal('0')),
+        total_stock_quantity=sum(totals[product.pk] for product in active),
+    )
+    check_low_stock(totals)
+    codes = [code for product in products for code in (product.bar_code, product.sku)]
+    transaction.on_commit(lambda: invalidate_product_lookups(codes))
+    transaction.on_commit(invalidate_facets)
+
+
+def _allocate_issues(movements, warehouse_id):
+    """Split removals without a warehouse across the warehouses holding the product.
+
+    The default warehouse ``warehouse_id`` is drawn down first, then the
+    others from the fullest. Returns the movements with a warehouse each.
+    """
+    stocks = WarehouseStock.objects.select_for_update().filter(
+        product_id__in={movement.product_id for movement in movements}, quantity_in_stock__gt=0,
+    ).order_by('product_id', 'warehouse_id').values_list('product_id', 'warehouse_id', 'quantity_in_stock')
+    available = defaultdict(dict)
+    for product_id, stock_warehouse_id, quantity in stocks:
+        available[product_id][stock_warehouse_id] = quantity
+
+    allocated = []
+    for movement in movements:
+        stock = available[movement.product_id]
+        remaining = -movement.quantity
+        for source in sorted(stock, key=lambda pk: (pk != warehouse_id, -stock[pk], pk)):
+            taken = min(remaining, stock[source])
+            if not taken:
+                continue
+            stock[source] -= taken
+            remaining -= taken
+            allocated.append(StockMovement(
+                product_id=movement.product_id, warehouse_id=source, quantity=-taken,
+                movement_type=movement.movement_type, reference_type=movement.reference_type,
+                reference_id=movement.reference_id, created_at=movement.created_at,
+            ))
+            if not remaining:
+                break
+        if remaining:
+            raise InsufficientStock(movement.product_id, None, -movement.quantity)
+    return allocated
+
+
+def post_movements(movements, update_products=True):
+    """Append unsaved ``StockMovement`` rows to the ledger and apply them to the balances atomically.
+
+    Movements without a warehouse add to the default one, or remove from the
+    warehouses holding the product, the default one first; a removal may
+    become several movements. If any balance would drop below zero
+    ``InsufficientStock`` is raised and nothing is written.
+    With ``update_products=False`` only warehouse balances change, for callers
+    that already saved ``Product.quantity_in_stock`` themselves.
+    """
+    movements = [movement for movement in movements if movement.quantity]
+    if not movements:
+        return []
+
+    with transaction.atomic():
+        if any(movement.warehouse_id is None for movement in movements):
+            warehouse_id = default_warehouse_id()
+            issues = [movement for movement in movements if movement.warehouse_id is None and movement.quantity < 0]
+            for movement in movements:
+                if movement.warehouse_id is None and movement.quantity > 0:
+                    movement.warehouse_id = warehouse_id
+            if issues:
+                movements = [movement for movement in movements if movement.warehouse_id is not None]
+                movements.extend(_allocate_issues(issues, warehouse_id))
+
+        balances, totals = defaultdict(int), defaultdict(int)
+        for movement in movements:
+            balances[movement.product_id, movement.warehouse_id] += movement.quantity
+            totals[movement.product_id] += movement.quantity
+
+        _apply_warehouse_deltas(balances)
+        if update_products:
+            _apply_product_deltas(totals)
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+    return movements
+
+
+#Transfers
+def transfer_stock_batch(lines, transfer_date=None):
+    """Move stock for ``(product_id, from_warehouse_id, to_warehouse_id, quantity)`` lines in one transaction.
+
+    Lines are netted per balance, so a batch locks and writes each balance
+    once; transfers and their ledger movements are bulk inserted. Raises
+    ``InsufficientStock`` before anything changes if a source cannot cover
+    its lines.
+    """
+    lines = [tuple(int(value) for value in line) for line in lines]
+    for product_id, from_warehouse_id, to_warehouse_id, quantity in lines:
+        if quantity <= 0:
+            raise ValueError('Transfer quantity must be positive.')
+        if from_warehouse_id == to_warehouse_id:
+            raise ValueError(f'Product #{product_id} cannot be transferred to the warehouse it is in.')
+    if not lines:
+        return []
+    product_ids = {line[0] for line in lines}
+    warehouse_ids = {warehouse_id for line in lines for warehouse_id in line[1:3]}
+    if (
+        Product.objects.filter(pk__in=product_ids).count() < len(product_ids)
+        or Warehouse.objects.filter(pk__in=warehouse_ids).count() < len(warehouse_ids)
+    ):
+        raise ValueError('Transfer lines refer to an unknown product or warehouse.')
+
+    transfer_date = transfer_date or timezone.now()
+    deltas = defaultdict(int)
+    for product_id, from_warehouse_id, to_warehouse_id, quantity in lines:
+        deltas[product_id, from_warehouse_id] -= quantity
+        deltas[product_id, to_warehouse_id] += quantity
+
+    batch = uuid.uuid4()
+    with transaction.atomic():
+        _apply_warehouse_deltas(deltas)
+
+        # Inserted without signals: the balances are already applied above.
+        transfers = StockTransfer.objects.bulk_create([
+            StockTransfer(
+                product_id=product_id, from_warehouse_id=from_warehouse_id, to_warehouse_id=to_warehouse_id,
+                quantity_transferred=quantity, transfer_date=transfer_date, batch=batch,
+            )
+            for product_id, from_warehouse_id, to_warehouse_id, quantity in lines
+        ], batch_size=1000)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # MySQL returns no primary keys; a batch's rows get ascending ids in insertion order.
+            pks = StockTransfer.objects.filter(batch=batch).order_by('pk').values_list('pk', flat=True)
+            for transfer, pk in zip(transfers, pks):
+                transfer.pk = pk
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_id=transfer.product_id, warehouse_id=warehouse_id, quantity=quantity,
+                movement_type='transfer', reference_type='stocktransfer', reference_id=transfer.pk,
+                created_at=transfer_date,
+            )
+            for transfer in transfers
+            for warehouse_id, quantity in (
+                (transfer.from_warehouse_id, -transfer.quantity_transferred),
+                (transfer.to_warehouse_id, transfer.quantity_transferred),
+            )
+        ], batch_size=1000)
+    return transfers
+
+
+def transfer_stock(product_id, from_warehouse_id, to_warehouse_id, quantity):
+    return transfer_stock_batch([(product_id, from_warehouse_id, to_warehouse_id, quantity)])[0]
+
+
+#Stock sources
+def _resolve(instance, path):
+    return reduce(lambda value, attribute: getattr(value, attribute, None), path.split('__'), instance)
+
+
+def stock_lines(model, values):
+    """``(product_id, warehouse_id, quantity)`` lines one row of a stock source contributes."""
+    _, direction, _ = STOCK_SOURCES[model]
+    product, quantity = values['product'], values['quantity'] or 0
+    if product is None or not quantity:
+        return []
+    if model is StockTransfer:
+        return [(product, values['from_warehouse'], -quantity), (product, values['to_warehouse'], quantity)]
+    return [(product, None, direction * quantity)]
+
+
+def instance_stock_lines(instance):
+    model = type(instance)
+    paths = STOCK_SOURCES[model][2]
+    return stock_lines(model, {name: _resolve(instance, path) for name, path in paths.items()})
+
+
+def stored_stock_lines(model, pk):
+    """Lines of the row as currently stored, or an empty list if it does not exist yet."""
+    paths = STOCK_SOURCES[model][2]
+    row = model.objects.filter(pk=pk).values(*paths.values()).first()
+    if row is None:
+        return []
+    return stock_lines(model, {name: row[path] for name, path in paths.items()})
+
+
+def record_stock_change(instance, previous=(), current=None):
+    """Post the difference between the ``previous`` and ``current`` lines of a stock source row."""
+    model = type(instance)
+    current = instance_stock_lines(instance) if current is None else current
+    net = defaultdict(int)
+    for product_id, warehouse_id, quantity in current:
+        net[product_id, warehouse_id] += quantity
+    for product_id, warehouse_id, quantity in previous:
+        net[product_id, warehouse_id] -= quantity
+
+    return post_movements(
+        StockMovement(
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            quantity=quantity,
+            movement_type=STOCK_SOURCES[model][0],
+            reference_type=model._meta.model_name,
+            reference_id=instance.pk,
+        )
+        for (product_id, warehouse_id), quantity in net.items() if quantity
+    )
+
+
+def deleting_stock_owner(origin):
+    """Whether a cascade started at a product, category or warehouse, whose stock rows go with it.
+
+    Warehouses still holding stock cannot be deleted, so skipping the
+    reversals of an emptied one's transfers leaves every balance as it is.
+    """
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (Product, ProductCategory, Warehouse)
+
+
+def _product_movement(product_id, quantity, movement_type):
+    return StockMovement(
+        product_id=product_id, quantity=quantity, movement_type=movement_type,
+        reference_type='product', reference_id=product_id,
+    )
+
+
+def record_product_adjustment(product_id, quantity, movement_type='adjustment'):
+    """Ledger entry for a ``quantity_in_stock`` change already written to the product row."""
+    return post_movements([_product_movement(product_id, quantity, movement_type)], update_products=False)
+
+
+def adjust_stock(product_id, quantity, movement_type='adjustment'):
+    """Add ``quantity`` (negative to remove) to a product's stock through the ledger.
+
+    Relative, so stock posted since the caller last read the product is kept.
+    """
+    return post_movements([_product_movement(product_id, quantity, movement_type)])
+
+
+#Rebuild
+def seed_stock_ledger():
+    """Opening movements for products not in the ledger yet, from their current stock.
+
+    Existing warehouse balances are taken as they are and whatever is left of
+    the product total is placed in the default warehouse.
+    """
+    ledgered = StockMovement.objects.values('product_id').distinct()
+    products = dict(Product.objects.exclude(pk__in=ledgered).values_list('pk', 'quantity_in_stock'))
+    if not products:
+        return 0
+
+    movements = []
+    allocated = defaultdict(int)
+    for product_id, warehouse_id, quantity in WarehouseStock.objects.filter(
+        product_id__in=list(products), quantity_in_stock__gt=0,
+    ).values_list('product_id', 'warehouse_id', 'quantity_in_stock'):
+        movements.append(StockMovement(
+            product_id=product_id, warehouse_id=warehouse_id, quantity=quantity, movement_type='opening',
+        ))
+        allocated[product_id] += quantity
+
+    remainders = {pk: quantity - allocated[pk] for pk, quantity in products.items() if quantity > allocated[pk]}
+    if remainders:
+        warehouse_id = default_warehouse_id()
+        movements.extend(
+            StockMovement(product_id=pk, warehouse_id=warehouse_id, quantity=quantity, movement_type='opening')
+            for pk, quantity in remainders.items()
+        )
+
+    StockMovement.objects.bulk_create(movements, batch_size=1000)
+    return len(movements)
+
+
+def rebuild_stock_balances():
+    """Recompute every warehouse balance and product total from the ledger."""
+    balances = (
+        StockMovement.objects.values('product_id', 'warehouse_id')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+    rows = [
+        WarehouseStock(product_id=row['product_id'], warehouse_id=row['warehouse_id'], quantity_in_stock=row['total'])
+        for row in balances if row['total'] > 0
+    ]
+    totals = defaultdict(int)
+    for row in rows:
+        totals[row.product_id] += row.quantity_in_stock
+
+    products = list(Product.objects.only('pk', 'quantity_in_stock'))
+    for product in products:
+        product.quantity_in_stock = totals[product.pk]
+
+    with transaction.atomic():
+        WarehouseStock.objects.all().delete()
+        WarehouseStock.objects.bulk_create(rows, batch_size=1000)
+        Product.objects.bulk_update(products, ['quantity_in_stock'], batch_size=1000)
+    rebuild_dashboard_snapshot()
+    check_low_stock()
+    invalidate_all_product_lookups()
+    return len(rows), len(products)
@@ -0,0 +1,210 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+OR_OPT_SEGMENT_LENGTHS = (1, 2, 3)
+DEFAULT_MAX_ITERATIONS = 100000
+NEIGHBOUR_COUNT = 10
+
+
+# Tours are closed: node lists starting at the depot, which never moves, and
+# returning to it after the last stop.
+def tour_cost(tour, distance_matrix):
+    if len(tour) < 2:
+        return 0
+    tour = np.asarray(tour)
+    return int(distance_matrix[tour, np.roll(tour, -1)].sum())
+
+
+def neighbour_lists(distance_matrix, count=NEIGHBOUR_COUNT):
+    """The ``count`` nearest other nodes of every node, nearest first."""
+    distance_matrix = np.asarray(distance_matrix)
+    size = len(distance_matrix)
+    count = min(count, size - 1)
+    if count <= 0:
+        return np.empty((size, 0), dtype=np.int64)
+    masked = distance_matrix.astype(np.float64)
+    np.fill_diagonal(masked, np.inf)
+    nearest = np.argpartition(masked, count - 1, axis=1)[:, :count]
+    order = np.argsort(np.take_along_axis(masked, nearest, axis=1), axis=1)
+    return np.take_along_axis(nearest, order, axis=1)
+
+
+def _tour_positions(tour, node_count):
+    positions = np.full(node_count, -1, dtype=np.int64)
+    positions[tour] = np.arange(len(tour))
+    return positions
+
+
+def _out_of_budget(deadline):
+    return deadline is not None and time.monotonic() > deadline
+
+
+def two_opt_move(tour, positions, node, distance_matrix, neighbours=None):
+    """Apply the best improving 2-opt move that adds an edge at ``node``; return the touched nodes or ``None``.
+
+    A move swaps edges (a, b) and (c, d) for (a, c) and (b, d) by reversing
+    b..c in place. All candidate second edges are scored in one vectorized
+    step: every edge in the tour, or with ``neighbours`` only the edges next
+    to the node's nearest neighbours.
+    """
+    size = len(tour)
+    i = positions[node]
+    if size < 4 or i < 0:
+        return None
+    if neighbours is None:
+        others = np.arange(size)
+    else:
+        others = positions[neighbours[node]]
+        others = others[others >= 0]
+    # Pair the edge leaving the node with edges leaving its candidates, and
+    # the edge entering it with edges entering them; both create (node, candidate).
+    first = np.concatenate((np.full(len(others), i), np.full(len(others), (i - 1) % size)))
+    second = np.concatenate((others, (others - 1) % size))
+    low, high = np.minimum(first, second), np.maximum(first, second)
+    valid = (high - low >= 2) & ~((low == 0) & (high == size - 1))
+    if not valid.any():
+        return None
+    low, high = low[valid], high[valid]
+
+    a, b, c, d = tour[low], tour[low + 1], tour[high], tour[(high + 1) % size]
+    delta = distance_matrix[a, c] + distance_matrix[b, d] - distance_matrix[a, b] - distance_matrix[c, d]
+    best = int(np.argmin(delta))
+    if delta[best] >= 0:
+        return None
+
+    start, end = int(low[best]) + 1, int(high[best]) + 1
+    tour[start:end] = tour[start:end][::-1]
+    positions[tour[start:end]] = np.arange(start, end)
+    return [a[best], b[best], c[best], d[best]]
+
+
+def or_opt_move(tour, positions, node, distance_matrix, neighbours=None, segment_lengths=OR_OPT_SEGMENT_LENGTHS):
+    """Move a short segment starting at ``node`` to its cheapest position; return the touched nodes or ``None``.
+
+    Segments may be reinserted reversed. With ``neighbours`` only edges next
+    to the nearest neighbours of the segment ends are tried.
+    """
+    size = len(tour)
+    start = int(positions[node])
+    if size < 4 or start <= 0:
+        return None
+
+    for length in segment_lengths:
+        end = start + length - 1
+        if end >= size or size - length < 3:
+            continue
+        segment = tour[start:end + 1].copy()
+        previous, following = tour[start - 1], tour[(end + 1) % size]
+        first, last = segment[0], segment[-1]
+        removal_gain = (
+            distance_matrix[previous, first] + distance_matrix[last, following]
+            - distance_matrix[previous, following]
+        )
+
+        if neighbours is None:
+            edges = np.arange(size)
+        else:
+            candidates = positions[np.concatenate((neighbours[first], neighbours[last]))]
+            candidates = candidates[candidates >= 0]
+            edges = np.unique(np.concatenate((candidates, (candidates - 1) % size)))
+        # Edges touching the segment are not insertion points; (previous, first) is where it already sits.
+        edges = edges[(edges < start - 1) | (edges > end)]
+        if not len(edges):
+            continue
+
+        c, d = tour[edges], tour[(edges + 1) % size]
+        forward = distance_matrix[c, first] + distance_matrix[last, d] - distance_matrix[c, d]
+        backward = distance_matrix[c, last] + distance_matrix[first, d] - distance_matrix[c, d]
+        insertion = np.minimum(forward, backward)
+        best = int(np.argmin(insertion))
+        if insertion[best] - removal_gain < 0:
+            if backward[best] < forward[best]:
+                segment = segment[::-1]
+            edge = int(edges[best])
+            if edge < start:
+                pieces = (tour[:edge + 1], segment, tour[edge + 1:start], tour[end + 1:])
+            else:
+                pieces = (tour[:start], tour[end + 1:edge + 1], segment, tour[edge + 1:])
+            tour[:] = np.concatenate(pieces)
+            positions[tour] = np.arange(size)
+            return [previous, following, first, last, c[best], d[best]]
+    return None
+
+
+def improve_tour(tour, distance_matrix, focus=None, neighbours=None, max_iterations=DEFAULT_MAX_ITERATIONS, time_limit=None):
+    """Improve a tour with 2-opt and Or-opt moves until none helps or a budget runs out.
+
+    Nodes wait in a queue and are only looked at again once a move changes
+    an edge next to them, so converged parts of the tour cost nothing.
+    ``max_iterations`` caps the number of moves and ``time_limit`` (seconds)
+    the wall time. With ``focus`` the search starts from those nodes only,
+    which keeps a repair after a small change local and cheap.
+    """
+    distance_matrix = np.asarray(distance_matrix)
+    tour = np.array(tour, dtype=np.int64)
+    positions = _tour_positions(tour, len(distance_matrix))
+    deadline = time.monotonic() + time_limit if time_limit is not None else None
+
+    queue = deque(tour.tolist() if focus is None else set(focus).intersection(tour.tolist()))
+    queued = np.zeros(len(distance_matrix), dtype=bool)
+    queued[list(queue)] = True
+
+    moves = 0
+    while queue and moves < max_iterations and not _out_of_budget(deadline):
+        node = queue.popleft()
+        queued[node] = False
+        touched = two_opt_move(tour, positions, node, distance_matrix, neighbours)
+        if touched is None:
+            touched = or_opt_move(tour, positions, node, distance_matrix, neighbours)
+        if touched is None:
+            continue
+        moves += 1
+        for other in touched:
+            if not queued[other]:
+                queued[other] = True
+                queue.append(other)
+    return tour.tolist()
+
+
+def splice_out(tours, nodes):
+    """Remove ``nodes`` from every tour, joining their neighbours directly."""
+    nodes = set(nodes)
+    return [[node for node in tour if node not in nodes] for tour in tours]
+
+
+def cheapest_insertion(tours, node, distance_matrix, depot=0, vehicle_count=None, loads=None, demands=None, capacity=None):
+    """Insert ``node`` where it adds the least distance; return the tour index used, or ``None`` if nothing fits.
+
+    Tours are updated in place. An empty vehicle may be opened while there are
+    fewer tours than ``vehicle_count``. With a ``capacity`` the ``loads`` list
+    is kept in step and full tours are skipped.
+    """
+    demand = demands[node] if demands is not None else 0
+    best_cost, best_tour, best_position = None, None, None
+    for index, tour in enumerate(tours):
+        if capacity is not None and loads[index] + demand > capacity:
+            continue
+        tour_array = np.asarray(tour)
+        following = np.roll(tour_array, -1)
+        costs = distance_matrix[tour_array, node] + distance_matrix[node, following] - distance_matrix[tour_array, following]
+        position = int(np.argmin(costs))
+        if best_cost is None or costs[position] < best_cost:
+            best_cost, best_tour, best_position = costs[position], index, position + 1
+
+    if vehicle_count is not None and len(tours) < vehicle_count and (capacity is None or demand <= capacity):
+        cost = distance_matrix[depot, node] + distance_matrix[node, depot]
+        if best_cost is None or cost < best_cost:
+            tours.append([depot])
+            if loads is not None:
+                loads.append(0)
+            best_tour, best_position = len(tours) - 1, 1
+
+    if best_tour is None:
+        return None
+    tours[best_tour].insert(best_position, node)
+    if loads is not None:
+        loads[best_tour] += demand
+    return best_tour
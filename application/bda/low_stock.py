@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import connection
+from django.utils import timezone
+
+from .models import LowStockAlert, Product
+
+
+LOW_STOCK_DIGEST_RECIPIENTS = getattr(settings, 'LOW_STOCK_DIGEST_RECIPIENTS', [settings.DEFAULT_FROM_EMAIL])
+
+
+def check_low_stock(product_ids=None):
+    """Open or clear low-stock alerts for ``product_ids`` after their stock changed; ``None`` checks every product.
+
+    Costs three queries however many products are passed, so callers hand
+    over exactly the products they touched rather than the catalog.
+    """
+    products = Product.objects.all()
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        products = products.filter(pk__in=product_ids)
+
+    low, restocked = [], []
+    for pk, quantity, threshold, is_active in products.values_list(
+        'pk', 'quantity_in_stock', 'stock_threshold', 'is_active',
+    ):
+        if is_active and quantity <= threshold:
+            low.append(LowStockAlert(product_id=pk, quantity_in_stock=quantity, stock_threshold=threshold))
+        else:
+            restocked.append(pk)
+
+    if product_ids is None:
+        LowStockAlert.objects.exclude(product_id__in=[alert.product_id for alert in low]).delete()
+    elif restocked:
+        LowStockAlert.objects.filter(product_id__in=restocked).delete()
+    if low:
+        # Products already alerted keep their creation and notification time.
+        # MySQL upserts on any unique key and rejects an explicit target.
+        unique_fields = ['product'] if connection.features.supports_update_conflicts_with_target else None
+        LowStockAlert.objects.bulk_create(
+            low, batch_size=1000, update_conflicts=True,
+            unique_fields=unique_fields, update_fields=['quantity_in_stock', 'stock_threshold'],
+        )
+
+
+def reorder_candidates():
+    return LowStockAlert.objects.select_related('product', 'product__supplier').order_by('created_at')
+
+
+def low_stock_digests(alerts):
+    """Group alerts per supplier into ``(subject, body)`` messages."""
+    by_supplier = defaultdict(list)
+    for alert in alerts:
+        by_supplier[alert.product.supplier].append(alert)
+
+    messages = []
+    for supplier, supplier_alerts in sorted(by_supplier.items(), key=lambda item: item[0].name if item[0] else ''):
+        name = supplier.name if supplier else 'No supplier'
+        lines = [
+            f'- {alert.product.product_name}: {alert.quantity_in_stock} in stock, threshold {alert.stock_threshold}'
+            for alert in supplier_alerts
+        ]
+        if supplier and supplier.email:
+            lines.append(f'\nContact: {supplier.contact_person or supplier.name} <{supplier.email}>')
+        messages.append((f'Reorder from {name}: {len(supplier_alerts)} products low on stock', '\n'.join(lines)))
+    return messages
+
+
+def send_low_stock_digest(recipients=None, dry_run=False):
+    """Mail one digest per supplier covering alerts not notified yet, then mark them notified."""
+    recipients = recipients or LOW_STOCK_DIGEST_RECIPIENTS
+    alerts = list(reorder_candidates().filter(notified_at__isnull=True))
+    messages = low_stock_digests(alerts)
+    if messages and not dry_run:
+        send_mass_mail([(subject, body, None, recipients) for subject, body in messages])
+        LowStockAlert.objects.filter(pk__in=[alert.pk for alert in alerts]).update(notified_at=timezone.now())
+    return messages
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from bda.reporting import rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily, monthly, per-product and per-customer sales rollup tables from the sales tables.'
+
+    def handle(self, *args, **options):
+        days, months, products, customers = rebuild_sales_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {days} daily, {months} monthly, {products} product and {customers} customer sales rollups.'
+        ))
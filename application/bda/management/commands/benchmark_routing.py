@@ -0,0 +1,78 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bda.benchmarks import DEFAULT_SIZES, LAYOUTS, MAX_MATRIX_SIZE, SOLVERS, compare_reports, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the route solvers on synthetic uniform, clustered and road-like branch sets, '
+        'recording wall time, peak memory and tour length as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+        parser.add_argument('--layouts', nargs='+', choices=list(LAYOUTS), default=list(LAYOUTS))
+        parser.add_argument('--solvers', nargs='+', choices=list(SOLVERS), default=list(SOLVERS))
+        parser.add_argument('--repeat', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--max-matrix-size', type=int, default=MAX_MATRIX_SIZE,
+            help='Skip solvers that need the full distance matrix above this many branches.',
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--baseline', help='Earlier JSON report to compare against; regressions fail the command.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Allowed slowdown or tour length increase against the baseline, as a fraction.',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or any(size < 1 for size in options['sizes']):
+            raise CommandError('Sizes and --repeat must be positive.')
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError(f'Could not read the baseline: {error}')
+
+        def progress(entry):
+            self.stderr.write(
+                f"{entry['layout']:>9} {entry['size']:>6} {entry['solver']:<20} "
+                f"{entry['seconds']:.3f}s {entry['peak_memory_bytes'] / 2 ** 20:.1f} MiB"
+            )
+
+        report = run_benchmarks(
+            sizes=options['sizes'],
+            layouts=options['layouts'],
+            solvers=options['solvers'],
+            repeat=options['repeat'],
+            seed=options['seed'],
+            max_matrix_size=options['max_matrix_size'],
+            progress=progress,
+        )
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            try:
+                with open(options['output'], 'w') as file:
+                    file.write(output)
+            except OSError as error:
+                raise CommandError(str(error))
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {len(report['results'])} benchmark results to {options['output']}."
+            ))
+        else:
+            self.stdout.write(output)
+
+        if baseline is not None:
+            regressions = compare_reports(report, baseline, options['tolerance'])
+            for message in regressions:
+                self.stderr.write(message)
+            if regressions:
+                raise CommandError(f'{len(regressions)} benchmark regressions against {options["baseline"]}.')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
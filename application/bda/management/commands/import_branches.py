@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bda.imports import BRANCH_DUPLICATE_RADIUS_M, IMPORT_CHUNK_SIZE, import_branches, read_branch_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk import City Bank branches from a CSV, XLSX or GeoJSON file. Expected columns: name, latitude, '
+        'longitude and optionally demand, service_time, time_window_start, time_window_end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument(
+            '--duplicate-radius', type=float, default=BRANCH_DUPLICATE_RADIUS_M,
+            help='Reject branches closer than this many metres to an existing or earlier imported branch.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Validate rows without inserting anything.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as file:
+                result = import_branches(
+                    read_branch_rows(file, path),
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run'],
+                    duplicate_radius_m=options['duplicate_radius'],
+                )
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+
+        for row_number, message in result.errors:
+            self.stderr.write(f'Row {row_number}: {message}')
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {result.created} branches with {len(result.errors)} errors.'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bda.imports import IMPORT_CHUNK_SIZE, import_products, read_tabular_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk import products from a CSV or XLSX file. Expected columns: product_name, category, cost_price '
+        'and optionally supplier, unit, selling_price, quantity_in_stock, stock_threshold, is_active, bar_code.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate rows without inserting anything.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as file:
+                result = import_products(
+                    read_tabular_rows(file, path),
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run'],
+                )
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+
+        for row_number, message in result.errors:
+            self.stderr.write(f'Row {row_number}: {message}')
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {result.created} products with {len(result.errors)} errors.'))
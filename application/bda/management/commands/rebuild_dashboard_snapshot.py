@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bda.reporting import rebuild_dashboard_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard KPI snapshot from scratch. Schedule periodically (e.g. nightly cron) to correct any drift from bulk updates.'
+
+    def handle(self, *args, **options):
+        snapshot = rebuild_dashboard_snapshot()
+        self.stdout.write(self.style.SUCCESS(f'Dashboard snapshot rebuilt at {snapshot.rebuilt_at:%Y-%m-%d %H:%M:%S}.'))
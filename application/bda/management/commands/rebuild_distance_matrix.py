@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from bda.distance_cache import distance_matrix_cache
+from bda.route_jobs import branch_rows
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached branch distance matrix from scratch.'
+
+    def handle(self, *args, **options):
+        meta = distance_matrix_cache.rebuild(branch_rows())
+        self.stdout.write(self.style.SUCCESS(
+            f"Distance matrix rebuilt for {len(meta['ids'])} branches (version {meta['version']})."
+        ))
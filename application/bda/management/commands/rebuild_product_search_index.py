@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bda.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search token index from the Product table.'
+
+    def handle(self, *args, **options):
+        total = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} products.'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from bda.inventory import rebuild_stock_balances, seed_stock_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute warehouse balances and product stock from the stock movement ledger. '
+        'Use --seed once to open the ledger from the current stock of products that have no movements yet.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', action='store_true',
+            help='Record opening movements for products missing from the ledger before rebuilding.',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seeded = seed_stock_ledger()
+            self.stdout.write(f'Recorded {seeded} opening movements.')
+        balances, products = rebuild_stock_balances()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {balances} warehouse balances for {products} products.'))
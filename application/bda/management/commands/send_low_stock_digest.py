@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from bda.low_stock import check_low_stock, send_low_stock_digest
+
+
+class Command(BaseCommand):
+    help = (
+        'Mail one reorder digest per supplier for products that fell to or below their stock threshold '
+        'since the last digest. Schedule periodically (e.g. hourly cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', nargs='+', help='Recipients instead of LOW_STOCK_DIGEST_RECIPIENTS.')
+        parser.add_argument('--rebuild', action='store_true', help='Recheck every product before sending.')
+        parser.add_argument('--dry-run', action='store_true', help='Print the digests without sending them.')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            check_low_stock()
+        messages = send_low_stock_digest(recipients=options['to'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            for subject, body in messages:
+                self.stdout.write(f'{subject}\n{body}\n')
+        self.stdout.write(self.style.SUCCESS(f'{len(messages)} supplier digests {"prepared" if options["dry_run"] else "sent"}.'))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bda.imports import read_tabular_rows
+from bda.inventory import transfer_stock_batch
+from bda.models import Product, Warehouse
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply a batch of stock transfers from a CSV or XLSX file in one transaction. '
+        'Expected columns: product_name, from_warehouse, to_warehouse, quantity.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as file:
+                rows = list(read_tabular_rows(file, path))
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+
+        products = dict(Product.objects.filter(
+            product_name__in={row.get('product_name') for _, row in rows}
+        ).values_list('product_name', 'pk'))
+        warehouses = dict(Warehouse.objects.filter(
+            name__in={row.get(column) for _, row in rows for column in ('from_warehouse', 'to_warehouse')}
+        ).values_list('name', 'pk'))
+
+        lines = []
+        for row_number, row in rows:
+            try:
+                lines.append((
+                    products[row.get('product_name')],
+                    warehouses[row.get('from_warehouse')],
+                    warehouses[row.get('to_warehouse')],
+                    int(row.get('quantity') or 0),
+                ))
+            except KeyError as error:
+                raise CommandError(f'Row {row_number}: unknown product or warehouse {error}.')
+            except ValueError:
+                raise CommandError(f'Row {row_number}: quantity must be a whole number.')
+
+        try:
+            transfers = transfer_stock_batch(lines)
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f'Applied {len(transfers)} stock transfers.'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.0 on 2026-10-18 15:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bda', '0002_citybankbranch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_purchase_quantity', models.BigIntegerField(default=0)),
+                ('total_sold_quantity', models.BigIntegerField(default=0)),
+                ('total_suppliers', models.BigIntegerField(default=0)),
+                ('total_customers', models.BigIntegerField(default=0)),
+                ('total_sold_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('total_purchase_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('available_stock_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('rebuilt_at', models.DateTimeField(blank=True, null=True)),
+                ('last_updated', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
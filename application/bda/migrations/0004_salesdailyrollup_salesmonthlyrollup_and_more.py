@@ -0,0 +1,69 @@
+# Generated by Django 5.0 on 2026-10-18 15:23
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_sales_rollups(apps, schema_editor):
+    # Same buckets as reporting.rebuild_sales_rollups, on the historical models.
+    Sale = apps.get_model('bda', 'Sale')
+    SalesDailyRollup = apps.get_model('bda', 'SalesDailyRollup')
+    SalesMonthlyRollup = apps.get_model('bda', 'SalesMonthlyRollup')
+
+    daily = (
+        Sale.objects.annotate(day=TruncDate('sale_date'))
+        .values('day')
+        .annotate(total=Sum('total_amount'), count=Count('id'))
+        .order_by('day')
+    )
+    daily_rows = [
+        SalesDailyRollup(date=row['day'], total_amount=row['total'] or 0, sale_count=row['count'])
+        for row in daily
+    ]
+
+    monthly = {}
+    for row in daily_rows:
+        key = (row.date.year, row.date.month)
+        bucket = monthly.setdefault(key, SalesMonthlyRollup(year=key[0], month=key[1], total_amount=0, sale_count=0))
+        bucket.total_amount += row.total_amount
+        bucket.sale_count += row.sale_count
+
+    SalesDailyRollup.objects.bulk_create(daily_rows, batch_size=1000)
+    SalesMonthlyRollup.objects.bulk_create(monthly.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bda', '0003_dashboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('sale_count', models.BigIntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('sale_count', models.BigIntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='salesmonthlyrollup',
+            constraint=models.UniqueConstraint(fields=('year', 'month'), name='bda_sales_monthly_rollup_year_month'),
+        ),
+        migrations.RunPython(backfill_sales_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-18 15:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bda', '0004_salesdailyrollup_salesmonthlyrollup_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcategory',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0 on 2026-10-18 15:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from bda.search import FIELD_WEIGHTS, INDEX_BATCH_SIZE, product_tokens
+
+
+def index_existing_products(apps, schema_editor):
+    Product = apps.get_model('bda', 'Product')
+    ProductSearchToken = apps.get_model('bda', 'ProductSearchToken')
+
+    # Also run again by later migrations whenever tokenization changes.
+    ProductSearchToken.objects.all().delete()
+    fields = [field for field, _ in FIELD_WEIGHTS]
+    rows = Product.objects.order_by('pk').values('pk', *fields)
+    last_pk = 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk)[:INDEX_BATCH_SIZE])
+        if not batch:
+            return
+        ProductSearchToken.objects.bulk_create([
+            ProductSearchToken(product_id=row['pk'], token=token, weight=weight)
+            for row in batch
+            for token, weight in product_tokens(row).items()
+        ], batch_size=1000)
+        last_pk = batch[-1]['pk']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bda', '0005_productcategory_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=50)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='bda.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'product'], name='bda_product_token_712a1d_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_products, migrations.RunPython.noop),
+    ]
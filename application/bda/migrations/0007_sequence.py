@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-18 15:26
+
+import re
+
+from django.db import migrations, models
+
+
+def seed_sku_sequence(apps, schema_editor):
+    Product = apps.get_model('bda', 'Product')
+    Sequence = apps.get_model('bda', 'Sequence')
+
+    last_value = 0
+    for sku in Product.objects.exclude(sku__isnull=True).values_list('sku', flat=True).iterator():
+        match = re.fullmatch(r'SKU(\d+)', sku)
+        if match:
+            last_value = max(last_value, int(match.group(1)))
+    Sequence.objects.update_or_create(name='sku', defaults={'last_value': last_value})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bda', '0006_productsearchtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=50, unique=True)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_sku_sequence, migrations.RunPython.noop),
+    ]
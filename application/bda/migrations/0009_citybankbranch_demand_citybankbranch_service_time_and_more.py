@@ -0,0 +1,43 @@
+# Generated by Django 5.0 on 2026-10-18 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bda', '0008_routejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='citybankbranch',
+            name='demand',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='citybankbranch',
+            name='service_time',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='citybankbranch',
+            name='time_window_end',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='citybankbranch',
+            name='time_window_start',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='routejob',
+            name='vehicle_capacity',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='routejob',
+            name='vehicle_count',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
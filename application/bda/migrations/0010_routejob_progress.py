@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bda', '0009_citybankbranch_demand_citybankbranch_service_time_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routejob',
+            name='progress',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
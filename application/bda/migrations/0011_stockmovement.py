@@ -0,0 +1,132 @@
+# Generated by Django 5.0 on 2026-10-18 15:49
+
+from collections import defaultdict
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+from bda.inventory import DEFAULT_WAREHOUSE_NAME
+
+
+def merge_duplicate_warehouse_stock(apps, schema_editor):
+    WarehouseStock = apps.get_model('bda', 'WarehouseStock')
+
+    duplicates = (
+        WarehouseStock.objects.values('product_id', 'warehouse_id')
+        .annotate(rows=Count('id'), total=Sum('quantity_in_stock'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        stocks = WarehouseStock.objects.filter(product_id=row['product_id'], warehouse_id=row['warehouse_id'])
+        keep = stocks.order_by('pk').values_list('pk', flat=True).first()
+        stocks.exclude(pk=keep).delete()
+        stocks.update(quantity_in_stock=row['total'])
+
+
+def backfill_total_stock_quantity(apps, schema_editor):
+    DashboardSnapshot = apps.get_model('bda', 'DashboardSnapshot')
+    Product = apps.get_model('bda', 'Product')
+
+    total = Product.objects.filter(is_active=True).aggregate(total=Sum('quantity_in_stock'))['total'] or 0
+    DashboardSnapshot.objects.update(total_stock_quantity=total)
+
+
+def seed_opening_balances(apps, schema_editor):
+    Product = apps.get_model('bda', 'Product')
+    StockMovement = apps.get_model('bda', 'StockMovement')
+    Warehouse = apps.get_model('bda', 'Warehouse')
+    WarehouseStock = apps.get_model('bda', 'WarehouseStock')
+
+    # Existing warehouse balances open as they are; whatever is left of each
+    # product's total opens in the default warehouse.
+    movements = []
+    allocated = defaultdict(int)
+    for product_id, warehouse_id, quantity in WarehouseStock.objects.filter(quantity_in_stock__gt=0).values_list(
+        'product_id', 'warehouse_id', 'quantity_in_stock',
+    ).iterator():
+        movements.append(StockMovement(
+            product_id=product_id, warehouse_id=warehouse_id, quantity=quantity, movement_type='opening',
+        ))
+        allocated[product_id] += quantity
+
+    remainders = {}
+    overallocated = []
+    for product_id, quantity in Product.objects.values_list('pk', 'quantity_in_stock').iterator():
+        if quantity > allocated[product_id]:
+            remainders[product_id] = quantity - allocated[product_id]
+        elif quantity < allocated[product_id]:
+            overallocated.append(Product(pk=product_id, quantity_in_stock=allocated[product_id]))
+    # The product total has to equal the sum of its balances from here on.
+    Product.objects.bulk_update(overallocated, ['quantity_in_stock'], batch_size=1000)
+
+    if remainders:
+        warehouse, _ = Warehouse.objects.get_or_create(name=DEFAULT_WAREHOUSE_NAME)
+        stocks = {
+            stock.product_id: stock
+            for stock in WarehouseStock.objects.filter(warehouse=warehouse, product_id__in=list(remainders))
+        }
+        for product_id, quantity in remainders.items():
+            stock = stocks.setdefault(product_id, WarehouseStock(warehouse=warehouse, product_id=product_id))
+            stock.quantity_in_stock += quantity
+            movements.append(StockMovement(
+                product_id=product_id, warehouse_id=warehouse.pk, quantity=quantity, movement_type='opening',
+            ))
+        WarehouseStock.objects.bulk_update(
+            [stock for stock in stocks.values() if stock.pk is not None], ['quantity_in_stock'], batch_size=1000,
+        )
+        WarehouseStock.objects.bulk_create([stock for stock in stocks.values() if stock.pk is None], batch_size=1000)
+
+    StockMovement.objects.bulk_create(movements, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bda', '0010_routejob_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('movement_type', models.CharField(choices=[('opening', 'Opening Balance'), ('adjustment', 'Adjustment'), ('purchase', 'Purchase'), ('sale', 'Sale'), ('purchase_return', 'Purchase Return'), ('sales_return', 'Sales Return'), ('stock_entry', 'Stock Entry'), ('transfer', 'Stock Transfer')], max_length=20)),
+                ('reference_type', models.CharField(blank=True, max_length=30, null=True)),
+                ('reference_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='dashboardsnapshot',
+            name='total_stock_quantity',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(merge_duplicate_warehouse_stock, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='warehousestock',
+            constraint=models.UniqueConstraint(fields=('product', 'warehouse'), name='bda_warehouse_stock_product_warehouse'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bda.product'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='warehouse',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bda.warehouse'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['product', 'warehouse', 'created_at'], name='bda_stockmo_product_aa589f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['reference_type', 'reference_id'], name='bda_stockmo_referen_2bfdf3_idx'),
+        ),
+        migrations.RunPython(seed_opening_balances, migrations.RunPython.noop),
+        migrations.RunPython(backfill_total_stock_quantity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bda', '0012_lowstockalert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stocktransfer',
+            name='batch',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+    ]
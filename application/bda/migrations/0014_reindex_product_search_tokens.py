@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-18 17:05
+
+from importlib import import_module
+
+from django.db import migrations
+
+
+# Tokens written before tokenization became Unicode-aware left out every
+# non-ASCII word, so the index is rebuilt with the current tokenizer.
+index_existing_products = import_module('bda.migrations.0006_productsearchtoken').index_existing_products
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bda', '0013_stocktransfer_batch'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_existing_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0 on 2026-10-18 16:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_top_sales_rollups(apps, schema_editor):
+    # Same rows as reporting.rebuild_sales_rollups, on the historical models.
+    Sale = apps.get_model('bda', 'Sale')
+    SaleItem = apps.get_model('bda', 'SaleItem')
+    ProductSalesRollup = apps.get_model('bda', 'ProductSalesRollup')
+    CustomerSalesRollup = apps.get_model('bda', 'CustomerSalesRollup')
+
+    ProductSalesRollup.objects.bulk_create([
+        ProductSalesRollup(product_id=row['product'], total_quantity=row['total'])
+        for row in SaleItem.objects.filter(product__isnull=False).values('product').annotate(total=Sum('quantity'))
+        .order_by('product')
+    ], batch_size=1000)
+    CustomerSalesRollup.objects.bulk_create([
+        CustomerSalesRollup(customer_id=row['customer'], total_amount=row['total'] or 0, sale_count=row['count'])
+        for row in Sale.objects.filter(customer__isnull=False).values('customer')
+        .annotate(total=Sum('total_amount'), count=Count('id')).order_by('customer')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bda', '0014_reindex_product_search_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=18)),
+                ('sale_count', models.BigIntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollup', to='bda.customer')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_quantity', models.BigIntegerField(db_index=True, default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollup', to='bda.product')),
+            ],
+        ),
+        migrations.RunPython(backfill_top_sales_rollups, migrations.RunPython.noop),
+    ]
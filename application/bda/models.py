@@ -61,6 +61,7 @@ class ProductCategory(models.Model):
 
     name = models.CharField(max_length=100, unique=True, db_index=True)
     trade_type = models.CharField(max_length=20, choices=TRADE_TYPE_CHOICES, blank=True, null=True, db_index=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
     class Meta:
         indexes = [
             models.Index(fields=['name', 'trade_type']),
@@ -103,6 +104,20 @@ class Product(models.Model):
             models.Index(fields=['is_active', 'category']),
             models.Index(fields=['supplier']),
         ]
+
+
+class ProductSearchToken(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=50)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.token} - {self.product_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['token', 'product']),
+        ]
     
 
 class Customer(models.Model):
@@ -276,6 +291,11 @@ class WarehouseStock(models.Model):
     def __str__(self):
         return f"{self.warehouse.name} - {self.product.product_name}"
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'warehouse'], name='bda_warehouse_stock_product_warehouse'),
+        ]
+
 
 class StockTransfer(models.Model):
     from_warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='transfers_sent')
@@ -283,11 +303,59 @@ class StockTransfer(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity_transferred = models.PositiveIntegerField()
     transfer_date = models.DateTimeField(default=timezone.now)
+    # Shared by the transfers inserted together, so their ids can be read back
+    # where bulk_create returns none (MySQL).
+    batch = models.UUIDField(blank=True, null=True, db_index=True)
 
     def __str__(self):
         return f"Transfer from {self.from_warehouse.name} to {self.to_warehouse.name} - {self.product.product_name}"
 
 
+class StockMovement(models.Model):
+    MOVEMENT_TYPE_CHOICES = (
+        ('opening', 'Opening Balance'),
+        ('adjustment', 'Adjustment'),
+        ('purchase', 'Purchase'),
+        ('sale', 'Sale'),
+        ('purchase_return', 'Purchase Return'),
+        ('sales_return', 'Sales Return'),
+        ('stock_entry', 'Stock Entry'),
+        ('transfer', 'Stock Transfer'),
+    )
+
+    # Append-only: balances in WarehouseStock and Product.quantity_in_stock
+    # are the running sums of these rows.
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+    movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPE_CHOICES)
+    reference_type = models.CharField(max_length=30, blank=True, null=True)
+    reference_id = models.PositiveBigIntegerField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.get_movement_type_display()} {self.quantity:+d} - {self.product_id} @ {self.warehouse_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'warehouse', 'created_at']),
+            models.Index(fields=['reference_type', 'reference_id']),
+        ]
+
+
+class LowStockAlert(models.Model):
+    # One row per product currently at or below its stock threshold; the row
+    # is removed again once the product is restocked.
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='low_stock_alert')
+    quantity_in_stock = models.PositiveIntegerField()
+    stock_threshold = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    notified_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    def __str__(self):
+        return f"Low stock - {self.product_id} ({self.quantity_in_stock}/{self.stock_threshold})"
+
+
 
 #Accounting 
 class PurchaseExpense(models.Model):
@@ -757,7 +825,79 @@ class ContactForm(models.Model):
 
     def __str__(self):
         return f"{self.name} - {self.subject}"
-    
+
+
+class Sequence(models.Model):
+    name = models.CharField(max_length=50, unique=True, db_index=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} - {self.last_value}"
+
+
+#Reporting
+class DashboardSnapshot(models.Model):
+    SINGLETON_ID = 1
+
+    total_purchase_quantity = models.BigIntegerField(default=0)
+    total_sold_quantity = models.BigIntegerField(default=0)
+    total_suppliers = models.BigIntegerField(default=0)
+    total_customers = models.BigIntegerField(default=0)
+    total_sold_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    total_purchase_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    available_stock_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    total_stock_quantity = models.BigIntegerField(default=0)
+    rebuilt_at = models.DateTimeField(blank=True, null=True)
+    last_updated = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Dashboard Snapshot - {self.last_updated}"
+
+
+class SalesDailyRollup(models.Model):
+    date = models.DateField(unique=True)
+    total_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    sale_count = models.BigIntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Sales {self.date} - {self.total_amount}"
+
+
+class SalesMonthlyRollup(models.Model):
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    total_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    sale_count = models.BigIntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Sales {self.year}-{self.month:02d} - {self.total_amount}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month'], name='bda_sales_monthly_rollup_year_month'),
+        ]
+
+
+class ProductSalesRollup(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='sales_rollup')
+    total_quantity = models.BigIntegerField(default=0, db_index=True)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Sold {self.product_id} - {self.total_quantity}"
+
+
+class CustomerSalesRollup(models.Model):
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, related_name='sales_rollup')
+    total_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0, db_index=True)
+    sale_count = models.BigIntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Sales {self.customer_id} - {self.total_amount}"
+
 
 
 
@@ -768,6 +908,41 @@ class CityBankBranch(models.Model):
     name = models.CharField(max_length=100)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    demand = models.PositiveIntegerField(default=0)
+    # Minutes spent at the branch once the vehicle arrives.
+    service_time = models.PositiveIntegerField(default=0)
+    time_window_start = models.TimeField(blank=True, null=True)
+    time_window_end = models.TimeField(blank=True, null=True)
+
+    def __str__(self):
+        return self.name
+
+
+class RouteJob(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    branch_set_hash = models.CharField(max_length=64, db_index=True)
+    branch_count = models.PositiveIntegerField(default=0)
+    vehicle_count = models.PositiveSmallIntegerField(default=1)
+    vehicle_capacity = models.PositiveIntegerField(blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    result = models.JSONField(blank=True, null=True)
+    # Live solver telemetry while the job runs.
+    progress = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"Route Job #{self.id} - {self.status}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['branch_set_hash', 'created_at']),
+        ]
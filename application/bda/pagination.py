@@ -0,0 +1,116 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+PAGE_SIZE_CHOICES = (25, 50, 100, 250, 500)
+DEFAULT_PAGE_SIZE = 50
+COUNT_CACHE_TIMEOUT = 60
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        page_size = int(request.GET.get('page_size', default))
+    except ValueError:
+        return default
+    return page_size if page_size in PAGE_SIZE_CHOICES else default
+
+
+def base_querystring(request, *exclude):
+    params = request.GET.copy()
+    for key in exclude:
+        params.pop(key, None)
+    return params.urlencode()
+
+
+class CachedCountPaginator(Paginator):
+    # COUNT(*) is as expensive as the page itself on large tables, so the total
+    # is shared between requests for the same query for a short while.
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None:
+            return super().count
+        key = 'paginator-count:' + hashlib.md5(
+            f'{self.object_list.model._meta.label}:{query}'.encode()
+        ).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+
+def paginate(request, queryset, page_size):
+    paginator = CachedCountPaginator(queryset, page_size)
+    page = request.GET.get('page', 1)
+    try:
+        return paginator.page(page)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
+
+
+def encode_cursor(values):
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        timestamp = parse_datetime(timestamp)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        return None
+    if timestamp is None:
+        return None
+    return timestamp, pk
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+
+def keyset_paginate(queryset, date_field, cursor, page_size):
+    # Seek pagination on (date_field, id), newest first. Every page costs one
+    # index range scan no matter how deep it is, and no COUNT(*) is needed.
+    queryset = queryset.order_by(f'-{date_field}', '-id')
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        timestamp, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__lt': timestamp}) | Q(**{date_field: timestamp, 'id__lt': pk})
+        )
+
+    object_list = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(object_list) > page_size:
+        object_list = object_list[:page_size]
+        last = object_list[-1]
+        next_cursor = encode_cursor([getattr(last, date_field), last.pk])
+
+    return KeysetPage(object_list, next_cursor, cursor if position is not None else None)
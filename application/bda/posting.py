@@ -0,0 +1,118 @@
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.utils import timezone
+
+from .inventory import post_movements
+from .models import Product, Purchase, PurchaseItem, Sale, SaleItem, StockMovement
+from .reporting import apply_dashboard_delta, apply_product_sales_delta
+
+
+CENT = Decimal('0.01')
+# Prices and totals are DecimalField(max_digits=10, decimal_places=2).
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+def _money(value, field):
+    try:
+        amount = Decimal(str(value))
+    except (ArithmeticError, TypeError, ValueError):
+        raise ValueError(f'{field} must be a number.')
+    if not amount.is_finite():
+        raise ValueError(f'{field} must be a number.')
+    if amount < 0:
+        raise ValueError(f'{field} cannot be negative.')
+    if amount > MAX_AMOUNT:
+        raise ValueError(f'{field} cannot be more than {MAX_AMOUNT}.')
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def build_items(model, lines, price_field, require_active=False):
+    """Validate ``lines`` and return unsaved items plus their total amount.
+
+    Each line is a dict with ``product_id``, ``quantity`` and optionally
+    ``unit_price``, which defaults to the product's ``price_field``. All
+    products are fetched with one ``in_bulk`` query.
+    """
+    lines = list(lines)
+    if not lines:
+        raise ValueError('At least one line is required.')
+    product_ids = []
+    for number, line in enumerate(lines, start=1):
+        try:
+            product_ids.append(int(line.get('product_id')))
+        except (TypeError, ValueError):
+            raise ValueError(f'Line {number}: product_id must be a whole number.')
+    products = Product.objects.only('pk', 'product_name', 'is_active', price_field).in_bulk(set(product_ids))
+
+    items = []
+    total_amount = Decimal('0')
+    for number, (product_id, line) in enumerate(zip(product_ids, lines), start=1):
+        product = products.get(product_id)
+        if product is None:
+            raise ValueError(f'Line {number}: product #{product_id} does not exist.')
+        if require_active and not product.is_active:
+            raise ValueError(f"Line {number}: '{product.product_name}' is not active.")
+        try:
+            quantity = int(line.get('quantity'))
+        except (TypeError, ValueError):
+            raise ValueError(f'Line {number}: quantity must be a whole number.')
+        if quantity <= 0:
+            raise ValueError(f'Line {number}: quantity must be positive.')
+        unit_price = line.get('unit_price')
+        unit_price = getattr(product, price_field) if unit_price is None else _money(unit_price, f'Line {number}: unit_price')
+
+        total_price = _money(unit_price * quantity, f'Line {number}: total_price')
+        items.append(model(product_id=product.pk, quantity=quantity, unit_price=unit_price, total_price=total_price))
+        total_amount += total_price
+    return items, _money(total_amount, 'total_amount')
+
+
+def _post_items(header, header_field, items, movement_type, direction, dashboard_field):
+    for item in items:
+        setattr(item, header_field, header)
+    type(items[0]).objects.bulk_create(items, batch_size=1000)
+
+    # bulk_create skips the per-item signals, so the ledger and the dashboard
+    # get one combined update for the whole document instead.
+    quantities = defaultdict(int)
+    for item in items:
+        quantities[item.product_id] += item.quantity
+    post_movements(
+        StockMovement(
+            product_id=product_id, quantity=direction * quantity, movement_type=movement_type,
+            reference_type=header._meta.model_name, reference_id=header.pk,
+        )
+        for product_id, quantity in quantities.items()
+    )
+    apply_dashboard_delta(**{dashboard_field: sum(quantities.values())})
+    return quantities
+
+
+def post_purchase(supplier, lines, purchase_date=None, notes=None):
+    """Create a purchase with its items and receive the stock, all in one transaction."""
+    items, total_amount = build_items(PurchaseItem, lines, 'cost_price')
+    with transaction.atomic():
+        purchase = Purchase.objects.create(
+            supplier=supplier, total_amount=total_amount, purchase_date=purchase_date or timezone.now(), notes=notes,
+        )
+        _post_items(purchase, 'purchase', items, 'purchase', 1, 'total_purchase_quantity')
+    return purchase
+
+
+def post_sale(lines, customer=None, payment_method=None, sale_date=None, notes=None):
+    """Create a sale with its items and issue the stock, all in one transaction.
+
+    Raises ``InsufficientStock`` and writes nothing if any product cannot
+    cover its lines.
+    """
+    items, total_amount = build_items(SaleItem, lines, 'selling_price', require_active=True)
+    with transaction.atomic():
+        sale = Sale.objects.create(
+            customer=customer, total_amount=total_amount, payment_method=payment_method,
+            sale_date=sale_date or timezone.now(), notes=notes,
+        )
+        quantities = _post_items(sale, 'sale', items, 'sale', -1, 'total_sold_quantity')
+        apply_product_sales_delta(quantities)
+    return sale
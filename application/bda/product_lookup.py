@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Product
+
+
+PRODUCT_LOOKUP_CACHE_TIMEOUT = 600
+PRODUCT_LOOKUP_GENERATION_KEY = 'product-lookup:generation'
+# Invalidated codes are marked for this long instead of deleted, and entries
+# are only ever added, so a lookup that read the row before the change
+# cannot cache it again afterwards.
+PRODUCT_LOOKUP_INVALIDATED_TIMEOUT = getattr(settings, 'PRODUCT_LOOKUP_INVALIDATED_TIMEOUT', 30)
+INVALIDATED = 'invalidated'
+PRODUCT_LOOKUP_LOCAL_SIZE = getattr(settings, 'PRODUCT_LOOKUP_LOCAL_SIZE', 10000)
+# Other processes only learn about changes through the shared cache, so local
+# entries are trusted for this many seconds at most.
+PRODUCT_LOOKUP_LOCAL_TTL = getattr(settings, 'PRODUCT_LOOKUP_LOCAL_TTL', 2)
+MAX_BATCH_CODES = 200
+
+LOOKUP_FIELDS = ('pk', 'product_name', 'selling_price', 'quantity_in_stock', 'bar_code', 'sku')
+
+
+class LRUCache:
+    """Thread-safe, size-bounded in-process cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_lookups = LRUCache(PRODUCT_LOOKUP_LOCAL_SIZE, PRODUCT_LOOKUP_LOCAL_TTL)
+
+
+def lookup_generation():
+    generation = cache.get(PRODUCT_LOOKUP_GENERATION_KEY)
+    if generation is None:
+        generation = 1
+        cache.add(PRODUCT_LOOKUP_GENERATION_KEY, generation, None)
+    return generation
+
+
+def _cache_key(generation, code):
+    return f'product-lookup:{generation}:{code}'
+
+
+def product_summary(product):
+    return {
+        'id': product['pk'],
+        'name': product['product_name'],
+        'selling_price': str(product['selling_price']),
+        'stock': product['quantity_in_stock'],
+        'bar_code': product['bar_code'],
+        'sku': product['sku'],
+    }
+
+
+def lookup_products(codes):
+    """Map each barcode or SKU in ``codes`` to an active product's summary, or ``None`` if nothing matches.
+
+    Codes are resolved from the process-local LRU first, then with one
+    ``get_many`` on the shared cache, and whatever is left with one query.
+    """
+    codes = list(dict.fromkeys(code.strip() for code in codes if code and code.strip()))
+    found = {}
+    missing = []
+    for code in codes:
+        summary = local_lookups.get(code)
+        if summary is None:
+            missing.append(code)
+        else:
+            found[code] = summary
+
+    if missing:
+        generation = lookup_generation()
+        cached = cache.get_many([_cache_key(generation, code) for code in missing])
+        for code in missing:
+            summary = cached.get(_cache_key(generation, code))
+            if summary is not None and summary != INVALIDATED:
+                found[code] = summary
+                local_lookups.set(code, summary)
+
+        remaining = [code for code in missing if code not in found]
+        if remaining:
+            fresh = {}
+            for product in Product.objects.filter(
+                Q(bar_code__in=remaining) | Q(sku__in=remaining), is_active=True,
+            ).values(*LOOKUP_FIELDS):
+                summary = product_summary(product)
+                for code in (product['bar_code'], product['sku']):
+                    if code in remaining:
+                        fresh[code] = summary
+            # Misses are not cached, so products created in bulk are found straight away.
+            for code, summary in fresh.items():
+                cache.add(_cache_key(generation, code), summary, PRODUCT_LOOKUP_CACHE_TIMEOUT)
+                local_lookups.set(code, summary)
+            found.update(fresh)
+
+    return {code: found.get(code) for code in codes}
+
+
+def lookup_product(code):
+    return lookup_products([code]).get(code.strip()) if code else None
+
+
+def invalidate_product_lookups(codes):
+    """Forget cached lookups for the given barcodes and SKUs, in this process and in the shared cache.
+
+    Shared entries are overwritten with ``INVALIDATED`` rather than deleted,
+    so a lookup still holding the old row cannot ``add`` it back.
+    """
+    codes = [code for code in codes if code]
+    if not codes:
+        return
+    for code in codes:
+        local_lookups.delete(code)
+    generation = lookup_generation()
+    cache.set_many(
+        {_cache_key(generation, code): INVALIDATED for code in codes}, PRODUCT_LOOKUP_INVALIDATED_TIMEOUT,
+    )
+
+
+def invalidate_all_product_lookups():
+    # Bumping the generation orphans every shared entry at once.
+    local_lookups.clear()
+    try:
+        cache.incr(PRODUCT_LOOKUP_GENERATION_KEY)
+    except ValueError:
+        cache.set(PRODUCT_LOOKUP_GENERATION_KEY, 2, None)
@@ -0,0 +1,257 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    Customer, CustomerSalesRollup, DashboardSnapshot, Product, ProductSalesRollup, Purchase, PurchaseItem, Sale,
+    SaleItem, SalesDailyRollup, SalesMonthlyRollup, Supplier,
+)
+
+
+# Fields each model contributes to the dashboard snapshot. Only these are
+# re-read before an update so the signal handlers can apply a delta.
+DASHBOARD_TRACKED_FIELDS = {
+    PurchaseItem: ('quantity',),
+    SaleItem: ('quantity',),
+    Sale: ('total_amount',),
+    Purchase: ('total_amount',),
+    Supplier: (),
+    Customer: (),
+    Product: ('cost_price', 'quantity_in_stock', 'is_active'),
+}
+
+
+def _decimal(value):
+    if value is None:
+        return Decimal('0')
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def dashboard_contribution(model, values):
+    """Return the KPI amounts a single ``model`` row with ``values`` adds to the snapshot."""
+    if model is PurchaseItem:
+        return {'total_purchase_quantity': values['quantity'] or 0}
+    if model is SaleItem:
+        return {'total_sold_quantity': values['quantity'] or 0}
+    if model is Sale:
+        return {'total_sold_amount': _decimal(values['total_amount'])}
+    if model is Purchase:
+        return {'total_purchase_amount': _decimal(values['total_amount'])}
+    if model is Supplier:
+        return {'total_suppliers': 1}
+    if model is Customer:
+        return {'total_customers': 1}
+    if model is Product:
+        if not values['is_active']:
+            return {}
+        quantity = values['quantity_in_stock'] or 0
+        return {'available_stock_amount': _decimal(values['cost_price']) * quantity, 'total_stock_quantity': quantity}
+    return {}
+
+
+def instance_contribution(instance):
+    model = type(instance)
+    values = {field: getattr(instance, field) for field in DASHBOARD_TRACKED_FIELDS[model]}
+    return dashboard_contribution(model, values)
+
+
+def stored_contribution(model, pk):
+    """Contribution of the row as currently stored, or ``None`` if it does not exist yet."""
+    row = model.objects.filter(pk=pk).values('pk', *DASHBOARD_TRACKED_FIELDS[model]).first()
+    if row is None:
+        return None
+    return dashboard_contribution(model, row)
+
+
+def contribution_delta(current, previous):
+    keys = set(current) | set(previous)
+    return {key: current.get(key, 0) - previous.get(key, 0) for key in keys}
+
+
+def apply_dashboard_delta(**deltas):
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    updated = DashboardSnapshot.objects.filter(pk=DashboardSnapshot.SINGLETON_ID).update(
+        last_updated=timezone.now(), **updates
+    )
+    if not updated:
+        # No snapshot yet: the full rebuild already includes this change.
+        rebuild_dashboard_snapshot()
+
+
+def compute_dashboard_totals():
+    total_purchase_quantity = PurchaseItem.objects.aggregate(total_quantity=Sum('quantity'))['total_quantity'] or 0
+    total_sold_quantity = SaleItem.objects.aggregate(total_quantity=Sum('quantity'))['total_quantity'] or 0
+    total_suppliers = Supplier.objects.aggregate(total_suppliers=Count('id'))['total_suppliers'] or 0
+    total_customers = Customer.objects.aggregate(total_customers=Count('id'))['total_customers'] or 0
+    total_sold_amount = Sale.objects.aggregate(total_amount=Sum('total_amount'))['total_amount'] or 0
+    total_purchase_amount = Purchase.objects.aggregate(total_amount=Sum('total_amount'))['total_amount'] or 0
+    stock = Product.objects.filter(is_active=True).aggregate(
+        total_stock_amount=Sum(
+            ExpressionWrapper(
+                F('cost_price') * F('quantity_in_stock'),
+                output_field=DecimalField(),
+            )
+        ),
+        total_stock_quantity=Sum('quantity_in_stock'),
+    )
+
+    return {
+        'total_purchase_quantity': total_purchase_quantity,
+        'total_sold_quantity': total_sold_quantity,
+        'total_suppliers': total_suppliers,
+        'total_customers': total_customers,
+        'total_sold_amount': total_sold_amount,
+        'total_purchase_amount': total_purchase_amount,
+        'available_stock_amount': stock['total_stock_amount'] or 0,
+        'total_stock_quantity': stock['total_stock_quantity'] or 0,
+    }
+
+
+def rebuild_dashboard_snapshot():
+    now = timezone.now()
+    defaults = compute_dashboard_totals()
+    defaults.update(rebuilt_at=now, last_updated=now)
+
+    try:
+        with transaction.atomic():
+            snapshot, _ = DashboardSnapshot.objects.update_or_create(
+                pk=DashboardSnapshot.SINGLETON_ID, defaults=defaults
+            )
+    except IntegrityError:
+        # Another process created the row first; overwrite it with our totals.
+        DashboardSnapshot.objects.filter(pk=DashboardSnapshot.SINGLETON_ID).update(**defaults)
+        snapshot = DashboardSnapshot.objects.get(pk=DashboardSnapshot.SINGLETON_ID)
+    return snapshot
+
+
+def get_dashboard_snapshot():
+    snapshot = DashboardSnapshot.objects.filter(pk=DashboardSnapshot.SINGLETON_ID).first()
+    if snapshot is None:
+        snapshot = rebuild_dashboard_snapshot()
+    return snapshot
+
+
+#Sales rollups
+def _bump_rollup(model, lookup, **deltas):
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**lookup).update(last_updated=timezone.now(), **updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # A concurrent writer created the bucket between our update and insert.
+        model.objects.filter(**lookup).update(last_updated=timezone.now(), **updates)
+
+
+def sale_rollup_date(sale_date):
+    if timezone.is_aware(sale_date):
+        sale_date = timezone.localtime(sale_date)
+    return sale_date.date()
+
+
+def apply_sales_rollup_delta(sale_date, amount, count):
+    if not amount and not count:
+        return
+    day = sale_rollup_date(sale_date)
+    _bump_rollup(SalesDailyRollup, {'date': day}, total_amount=amount, sale_count=count)
+    _bump_rollup(SalesMonthlyRollup, {'year': day.year, 'month': day.month}, total_amount=amount, sale_count=count)
+
+
+def apply_product_sales_delta(quantities):
+    """Add ``{product_id: quantity}`` to the per-product sold quantities, in product order."""
+    for product_id in sorted(pk for pk in quantities if pk is not None):
+        if quantities[product_id]:
+            _bump_rollup(ProductSalesRollup, {'product_id': product_id}, total_quantity=quantities[product_id])
+
+
+def apply_customer_sales_delta(customer_id, amount, count):
+    # Walk-in sales have no customer and are not ranked.
+    if customer_id is None or (not amount and not count):
+        return
+    _bump_rollup(CustomerSalesRollup, {'customer_id': customer_id}, total_amount=amount, sale_count=count)
+
+
+def rebuild_sales_rollups():
+    daily = (
+        Sale.objects.annotate(day=TruncDate('sale_date'))
+        .values('day')
+        .annotate(total=Sum('total_amount'), count=Count('id'))
+        .order_by('day')
+    )
+    daily_rows = [
+        SalesDailyRollup(date=row['day'], total_amount=row['total'] or 0, sale_count=row['count'])
+        for row in daily
+    ]
+
+    monthly = {}
+    for row in daily_rows:
+        key = (row.date.year, row.date.month)
+        bucket = monthly.setdefault(key, SalesMonthlyRollup(year=key[0], month=key[1]))
+        bucket.total_amount += row.total_amount
+        bucket.sale_count += row.sale_count
+
+    product_rows = [
+        ProductSalesRollup(product_id=row['product'], total_quantity=row['total'])
+        for row in SaleItem.objects.filter(product__isnull=False).values('product').annotate(total=Sum('quantity'))
+        .order_by('product')
+    ]
+    customer_rows = [
+        CustomerSalesRollup(customer_id=row['customer'], total_amount=row['total'] or 0, sale_count=row['count'])
+        for row in Sale.objects.filter(customer__isnull=False).values('customer')
+        .annotate(total=Sum('total_amount'), count=Count('id')).order_by('customer')
+    ]
+
+    with transaction.atomic():
+        SalesDailyRollup.objects.all().delete()
+        SalesMonthlyRollup.objects.all().delete()
+        ProductSalesRollup.objects.all().delete()
+        CustomerSalesRollup.objects.all().delete()
+        SalesDailyRollup.objects.bulk_create(daily_rows, batch_size=1000)
+        SalesMonthlyRollup.objects.bulk_create(monthly.values(), batch_size=1000)
+        ProductSalesRollup.objects.bulk_create(product_rows, batch_size=1000)
+        CustomerSalesRollup.objects.bulk_create(customer_rows, batch_size=1000)
+
+    return len(daily_rows), len(monthly), len(product_rows), len(customer_rows)
+
+
+def monthly_sales_series(months=12, end=None):
+    end = sale_rollup_date(end or timezone.now())
+    start_year, start_month = divmod(end.year * 12 + end.month - 1 - (months - 1), 12)
+    start_month += 1
+
+    rows = SalesMonthlyRollup.objects.filter(
+        Q(year__gt=start_year) | Q(year=start_year, month__gte=start_month),
+        Q(year__lt=end.year) | Q(year=end.year, month__lte=end.month),
+    ).order_by('year', 'month').values('year', 'month', 'total_amount')
+
+    return [
+        {
+            'year': row['year'],
+            'month': row['month'],
+            'label': f"{row['year']}-{row['month']:02d}",
+            'total_amount': float(row['total_amount']),
+        }
+        for row in rows
+    ]
+
+
+def top_selling_products(limit=10):
+    return list(
+        ProductSalesRollup.objects.filter(total_quantity__gt=0).order_by('-total_quantity', 'product_id')
+        .values('product__product_name', 'total_quantity')[:limit]
+    )
+
+
+def top_customers(limit=10):
+    return list(
+        CustomerSalesRollup.objects.filter(sale_count__gt=0).order_by('-total_amount', 'customer_id')
+        .annotate(total_purchases=F('sale_count')).values('customer__name', 'total_amount', 'total_purchases')[:limit]
+    )
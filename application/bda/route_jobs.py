@@ -0,0 +1,368 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time, timedelta
+
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .decomposition import decomposed_tour
+from .distance_cache import distance_matrix_cache
+from .local_search import cheapest_insertion, improve_tour, neighbour_lists, splice_out, tour_cost
+from .models import CityBankBranch, RouteJob
+from .tsp import (
+    SOLVER_TIME_LIMIT, SolverTelemetry, branch_coordinates, greedy_order, minutes_since_midnight, split_route,
+    tour_length, vrp_solver,
+)
+
+
+logger = logging.getLogger(__name__)
+
+ROUTE_JOB_WORKERS = getattr(settings, 'ROUTE_JOB_WORKERS', 2)
+# A pending/running job that has not finished by then is assumed lost (e.g.
+# the worker process was restarted) and gets resubmitted.
+ROUTE_JOB_STALE_AFTER = timedelta(seconds=getattr(settings, 'ROUTE_JOB_STALE_SECONDS', 300))
+# A failed job is shown as failed until this has passed or a retry is asked for.
+ROUTE_JOB_RETRY_AFTER = timedelta(seconds=getattr(settings, 'ROUTE_JOB_RETRY_SECONDS', 300))
+SUBMIT_LOCK_TIMEOUT = 30
+ROUTE_VEHICLE_SPEED_KMH = getattr(settings, 'ROUTE_VEHICLE_SPEED_KMH', 30)
+MAX_VEHICLES = 50
+# Up to this many added, moved or deleted branches (or this share of the
+# set, if larger) the previous solution is repaired instead of re-solved.
+ROUTE_INCREMENTAL_MAX_CHANGES = getattr(settings, 'ROUTE_INCREMENTAL_MAX_CHANGES', 10)
+ROUTE_INCREMENTAL_MAX_RATIO = 0.05
+INCREMENTAL_MAX_ITERATIONS = 200
+# OR-Tools keeps improving with guided local search until the time limit,
+# unless the objective improves by less than ROUTE_SOLVER_MIN_IMPROVEMENT
+# over ROUTE_SOLVER_PLATEAU_SECONDS.
+ROUTE_SOLVER_TIME_LIMIT = getattr(settings, 'ROUTE_SOLVER_TIME_LIMIT', SOLVER_TIME_LIMIT)
+ROUTE_SOLVER_PLATEAU_SECONDS = getattr(settings, 'ROUTE_SOLVER_PLATEAU_SECONDS', 2)
+ROUTE_SOLVER_MIN_IMPROVEMENT = getattr(settings, 'ROUTE_SOLVER_MIN_IMPROVEMENT', 0.005)
+# Single-vehicle plans for more branches than this are clustered and solved
+# in parallel, never building the full distance matrix.
+ROUTE_DECOMPOSE_THRESHOLD = getattr(settings, 'ROUTE_DECOMPOSE_THRESHOLD', 2000)
+ROUTE_DECOMPOSE_WORKERS = getattr(settings, 'ROUTE_DECOMPOSE_WORKERS', None)
+ROUTE_DECOMPOSE_TIME_LIMIT = getattr(settings, 'ROUTE_DECOMPOSE_TIME_LIMIT', 60)
+# Budget for the 2-opt/Or-opt stage run over every route a job produces.
+ROUTE_LOCAL_SEARCH_TIME_LIMIT = getattr(settings, 'ROUTE_LOCAL_SEARCH_TIME_LIMIT', 0.5)
+ROUTE_LOCAL_SEARCH_MAX_ITERATIONS = getattr(settings, 'ROUTE_LOCAL_SEARCH_MAX_ITERATIONS', 100000)
+# Everything that changes the answer; the first three also key the distance matrix cache.
+ROUTE_BRANCH_FIELDS = ('pk', 'latitude', 'longitude', 'demand', 'service_time', 'time_window_start', 'time_window_end')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ROUTE_JOB_WORKERS, thread_name_prefix='route-job')
+        return _executor
+
+
+def branch_rows():
+    return list(CityBankBranch.objects.order_by('pk').values_list(*ROUTE_BRANCH_FIELDS))
+
+
+def branch_set_hash(rows):
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update((':'.join(repr(value) for value in row) + ';').encode())
+    return digest.hexdigest()
+
+
+def latest_job(set_hash, vehicle_count=1, vehicle_capacity=None):
+    return RouteJob.objects.filter(
+        branch_set_hash=set_hash, vehicle_count=vehicle_count, vehicle_capacity=vehicle_capacity
+    ).order_by('-created_at').first()
+
+
+def is_stale(job):
+    return job.status in ('pending', 'running') and job.created_at < timezone.now() - ROUTE_JOB_STALE_AFTER
+
+
+def needs_submit(job, retry=False):
+    if job is None or is_stale(job):
+        return True
+    if job.status != 'failed':
+        return False
+    return retry or (job.finished_at or job.created_at) < timezone.now() - ROUTE_JOB_RETRY_AFTER
+
+
+def cached_branches(rows=None):
+    """Branches in distance-matrix cache order, together with the cached matrix.
+
+    The branches are built from ``rows`` rather than re-read, so the solve
+    covers exactly the set whose hash the job was stored under.
+    """
+    rows = branch_rows() if rows is None else rows
+    ids, distance_matrix, _ = distance_matrix_cache.matrix(rows)
+    branches = {row[0]: CityBankBranch(**dict(zip(ROUTE_BRANCH_FIELDS, row))) for row in rows}
+    return [branches[pk] for pk in ids], distance_matrix
+
+
+def cached_routes(vehicle_count, branch_ids):
+    """Vehicle routes of the last finished job with the same fleet, limited to ``branch_ids``."""
+    job = RouteJob.objects.filter(status='done', vehicle_count=vehicle_count).order_by('-finished_at').first()
+    if job is None or not job.result or 'vehicles' not in job.result:
+        return None
+    routes = [[pk for pk in route if pk in branch_ids] for route in job.result['vehicles']]
+    return routes if any(routes) else None
+
+
+def improve_route(tour, distance_matrix, neighbours):
+    return improve_tour(
+        tour, distance_matrix, neighbours=neighbours,
+        max_iterations=ROUTE_LOCAL_SEARCH_MAX_ITERATIONS, time_limit=ROUTE_LOCAL_SEARCH_TIME_LIMIT,
+    )
+
+
+def greedy_tour(city_branches, distance_matrix, depot, neighbours):
+    """Nearest-neighbour tour from the depot, tightened by the local search stage."""
+    latitudes, longitudes = branch_coordinates(city_branches)
+    return improve_route(greedy_order(latitudes, longitudes, start=depot), distance_matrix, neighbours)
+
+
+def initial_routes(city_branches, depot, vehicle_count, demands, vehicle_capacity, greedy):
+    """Warm start for the solver: a previous solution when there is one, else the greedy tour split across vehicles."""
+    positions = {branch.pk: index for index, branch in enumerate(city_branches)}
+    routes = cached_routes(vehicle_count, positions)
+    if routes is not None:
+        depot_pk = city_branches[depot].pk
+        return [[positions[pk] for pk in route if pk != depot_pk] for route in routes]
+    return split_route(greedy[1:], vehicle_count, demands, vehicle_capacity)
+
+
+def branch_fingerprint(branch):
+    row = tuple(getattr(branch, field) for field in ROUTE_BRANCH_FIELDS)
+    return hashlib.sha1(repr(row).encode()).hexdigest()[:12]
+
+
+def should_decompose(rows, vehicle_count, vehicle_capacity):
+    if len(rows) <= ROUTE_DECOMPOSE_THRESHOLD or vehicle_count != 1 or vehicle_capacity is not None:
+        return False
+    # Time windows (the last two route fields) need the full routing model.
+    return not any(row[5] or row[6] for row in rows)
+
+
+def solve_decomposed(rows):
+    """Single-vehicle plan for a very large branch set; ``rows`` are ordered by pk, so the depot is the first."""
+    ids = [row[0] for row in rows]
+    latitudes = np.array([row[1] for row in rows], dtype=np.float64)
+    longitudes = np.array([row[2] for row in rows], dtype=np.float64)
+
+    tour = decomposed_tour(
+        latitudes, longitudes, depot=0, workers=ROUTE_DECOMPOSE_WORKERS, time_limit=ROUTE_DECOMPOSE_TIME_LIMIT
+    )
+    greedy = greedy_order(latitudes, longitudes)
+    return {
+        'mode': 'decomposed',
+        'vehicles': [[ids[node] for node in tour]],
+        'vehicle_distances': [tour_length(latitudes, longitudes, tour)],
+        'dropped': [],
+        'greedy': [ids[node] for node in greedy],
+        'greedy_distance': tour_length(latitudes, longitudes, greedy),
+    }
+
+
+def previous_solution(vehicle_count, vehicle_capacity):
+    job = RouteJob.objects.filter(
+        status='done', vehicle_count=vehicle_count, vehicle_capacity=vehicle_capacity
+    ).order_by('-finished_at').first()
+    if job is None or not job.result or 'fingerprints' not in job.result:
+        return None
+    return job.result
+
+
+def repair_routes(city_branches, distance_matrix, depot, previous, fingerprints, demands, vehicle_count, vehicle_capacity):
+    """Patch ``previous`` routes for a few changed branches, or return ``None`` if a full solve is needed.
+
+    Deleted and moved branches are spliced out, new and moved ones go in by
+    cheapest insertion, and a short local search runs around every node
+    next to a change.
+    """
+    previous_fingerprints = {int(pk): value for pk, value in previous['fingerprints'].items()}
+    depot_pk = city_branches[depot].pk
+    if previous_fingerprints.get(depot_pk) != fingerprints[depot_pk]:
+        return None
+
+    removed = set(previous_fingerprints) - set(fingerprints)
+    changed = {pk for pk, value in fingerprints.items() if previous_fingerprints.get(pk) != value}
+    limit = max(ROUTE_INCREMENTAL_MAX_CHANGES, int(len(city_branches) * ROUTE_INCREMENTAL_MAX_RATIO))
+    if len(removed) + len(changed) > limit:
+        return None
+
+    positions = {branch.pk: index for index, branch in enumerate(city_branches)}
+    focus = set()
+    for route in previous['vehicles']:
+        for index, pk in enumerate(route):
+            if pk in removed or pk in changed:
+                focus.update(positions[neighbour] for neighbour in route[max(index - 1, 0):index + 2] if neighbour in positions)
+
+    tours = splice_out(
+        [[positions[pk] for pk in route if pk in positions] for route in previous['vehicles']],
+        [positions[pk] for pk in changed],
+    )
+    tours = [tour for tour in tours if len(tour) > 1]
+    loads = [sum(demands[node] for node in tour) for tour in tours]
+
+    dropped = []
+    pending = [positions[pk] for pk in changed] + [positions[pk] for pk in previous['dropped'] if pk in positions and pk not in changed]
+    for node in pending:
+        if cheapest_insertion(
+            tours, node, distance_matrix, depot=depot, vehicle_count=vehicle_count,
+            loads=loads, demands=demands, capacity=vehicle_capacity,
+        ) is None:
+            dropped.append(node)
+        else:
+            focus.add(node)
+
+    routes = [
+        improve_tour(tour, distance_matrix, focus=[node for node in tour if node in focus], max_iterations=INCREMENTAL_MAX_ITERATIONS)[1:]
+        if focus.intersection(tour) else tour[1:]
+        for tour in tours
+    ]
+    return routes, dropped
+
+
+def solve_routes(city_branches, distance_matrix, vehicle_count=1, vehicle_capacity=None, telemetry=None):
+    if not city_branches:
+        return {
+            'mode': 'full', 'vehicles': [], 'vehicle_distances': [], 'dropped': [], 'greedy': [], 'greedy_distance': 0,
+            'fingerprints': {},
+        }
+
+    # The first branch by id is the depot every vehicle starts from.
+    depot = min(range(len(city_branches)), key=lambda index: city_branches[index].pk)
+    demands = [branch.demand for branch in city_branches]
+    time_windows = [
+        (minutes_since_midnight(branch.time_window_start or time.min), minutes_since_midnight(branch.time_window_end or time.max))
+        if branch.time_window_start or branch.time_window_end else None
+        for branch in city_branches
+    ]
+    has_time_windows = any(window is not None for window in time_windows)
+    has_service_times = any(branch.service_time for branch in city_branches)
+
+    neighbours = neighbour_lists(distance_matrix)
+    greedy = greedy_tour(city_branches, distance_matrix, depot, neighbours)
+
+    fingerprints = {branch.pk: branch_fingerprint(branch) for branch in city_branches}
+    repaired = None
+    if not has_time_windows:
+        # Time windows make a local patch unreliable; those sets are always solved in full.
+        previous = previous_solution(vehicle_count, vehicle_capacity)
+        if previous is not None:
+            repaired = repair_routes(
+                city_branches, distance_matrix, depot, previous, fingerprints, demands, vehicle_count, vehicle_capacity
+            )
+
+    if repaired is not None:
+        routes, dropped = repaired
+        mode = 'incremental'
+    else:
+        routes, dropped = vrp_solver(
+            distance_matrix,
+            vehicle_count=vehicle_count,
+            depot=depot,
+            demands=demands,
+            vehicle_capacities=[vehicle_capacity] * vehicle_count if vehicle_capacity is not None else None,
+            service_times=[branch.service_time for branch in city_branches] if has_service_times else None,
+            time_windows=time_windows if has_time_windows else None,
+            speed_kmh=ROUTE_VEHICLE_SPEED_KMH,
+            initial_routes=initial_routes(city_branches, depot, vehicle_count, demands, vehicle_capacity, greedy),
+            time_limit=ROUTE_SOLVER_TIME_LIMIT,
+            guided=True,
+            telemetry=telemetry,
+        )
+        mode = 'full'
+        if not has_time_windows:
+            # Reordering stops within a route keeps its load, so only time windows can be broken by this.
+            routes = [improve_route([depot] + route, distance_matrix, neighbours)[1:] if route else route for route in routes]
+
+    tours = [[depot] + route for route in routes if route]
+    return {
+        'mode': mode,
+        'telemetry': telemetry.as_dict() if telemetry is not None and mode == 'full' else None,
+        'vehicles': [[city_branches[node].pk for node in tour] for tour in tours],
+        'vehicle_distances': [tour_cost(tour, distance_matrix) for tour in tours],
+        'dropped': [city_branches[node].pk for node in dropped],
+        'greedy': [city_branches[node].pk for node in greedy],
+        'greedy_distance': tour_cost(greedy, distance_matrix),
+        'fingerprints': {str(pk): value for pk, value in fingerprints.items()},
+    }
+
+
+def job_telemetry(job_id):
+    def report(telemetry):
+        RouteJob.objects.filter(pk=job_id).update(progress={
+            'elapsed': telemetry.solutions[-1][0],
+            'solution_count': len(telemetry.solutions),
+            'best_objective': telemetry.best_objective,
+        })
+
+    return SolverTelemetry(
+        plateau_seconds=ROUTE_SOLVER_PLATEAU_SECONDS, min_improvement=ROUTE_SOLVER_MIN_IMPROVEMENT, on_progress=report
+    )
+
+
+def run_route_job(job_id, rows):
+    """Solve ``rows``, the branch set the job was submitted and hashed with."""
+    close_old_connections()
+    try:
+        job = RouteJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return
+        updated = RouteJob.objects.filter(pk=job_id, status='pending').update(
+            status='running', started_at=timezone.now()
+        )
+        if not updated:
+            return
+        try:
+            if should_decompose(rows, job.vehicle_count, job.vehicle_capacity):
+                result = solve_decomposed(rows)
+            else:
+                result = solve_routes(
+                    *cached_branches(rows), job.vehicle_count, job.vehicle_capacity, telemetry=job_telemetry(job_id)
+                )
+        except Exception as error:
+            logger.exception('Route job %s failed', job_id)
+            RouteJob.objects.filter(pk=job_id).update(status='failed', error=str(error), finished_at=timezone.now())
+        else:
+            RouteJob.objects.filter(pk=job_id).update(status='done', result=result, finished_at=timezone.now())
+    finally:
+        close_old_connections()
+
+
+def submit_route_job(rows=None, vehicle_count=1, vehicle_capacity=None, retry=False):
+    """Return the job for the current branch set and fleet, starting one in the background if needed.
+
+    A failed job is returned as is until ``ROUTE_JOB_RETRY_AFTER`` has
+    passed, unless ``retry`` is set.
+    """
+    rows = branch_rows() if rows is None else rows
+    set_hash = branch_set_hash(rows)
+    fleet = {'vehicle_count': vehicle_count, 'vehicle_capacity': vehicle_capacity}
+
+    job = latest_job(set_hash, **fleet)
+    if not needs_submit(job, retry):
+        return job
+
+    lock_key = f'route-job-submit:{set_hash}:{vehicle_count}:{vehicle_capacity}'
+    if not cache.add(lock_key, 1, SUBMIT_LOCK_TIMEOUT):
+        # Someone else is submitting this branch set right now.
+        return latest_job(set_hash, **fleet) or RouteJob(branch_set_hash=set_hash, branch_count=len(rows), **fleet)
+
+    try:
+        if job is not None and job.status != 'failed':
+            RouteJob.objects.filter(pk=job.pk).update(status='failed', error='Job went stale.', finished_at=timezone.now())
+        job = RouteJob.objects.create(branch_set_hash=set_hash, branch_count=len(rows), **fleet)
+        transaction.on_commit(lambda: get_executor().submit(run_route_job, job.pk, rows))
+    finally:
+        cache.delete(lock_key)
+    return job
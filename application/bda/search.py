@@ -0,0 +1,114 @@
+import unicodedata
+
+from django.db import transaction
+from django.db.models import IntegerField, OuterRef, Q, Subquery, Sum
+
+from .models import Product, ProductSearchToken
+
+
+TOKEN_MAX_LENGTH = 50
+MAX_QUERY_TERMS = 6
+INDEX_BATCH_SIZE = 500
+
+# Relative weight of a token depending on where it was found.
+FIELD_WEIGHTS = (
+    ('product_name', 5),
+    ('sku', 4),
+    ('bar_code', 4),
+    ('category__name', 2),
+    ('supplier__name', 1),
+)
+
+
+def tokenize(text):
+    """Split ``text`` into casefolded words of letters, digits and combining marks.
+
+    Marks are kept inside words because ``\\w`` leaves them out and would split
+    'চাল' at its vowel sign.
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize('NFC', str(text).casefold())
+    words = ''.join(char if char.isalnum() or unicodedata.category(char).startswith('M') else ' ' for char in text)
+    return [token[:TOKEN_MAX_LENGTH] for token in words.split()]
+
+
+def product_tokens(values):
+    weights = {}
+    for field, weight in FIELD_WEIGHTS:
+        value = values.get(field)
+        tokens = tokenize(value)
+        if field in ('sku', 'bar_code') and value:
+            # Codes are also searchable as a whole, punctuation included.
+            tokens.append(str(value).casefold()[:TOKEN_MAX_LENGTH])
+        for token in set(tokens):
+            weights[token] = weights.get(token, 0) + weight
+    return weights
+
+
+def index_products(product_ids):
+    """(Re)build the search tokens of the given products in batches."""
+    product_ids = list(product_ids)
+    fields = [field for field, _ in FIELD_WEIGHTS]
+    for start in range(0, len(product_ids), INDEX_BATCH_SIZE):
+        batch = product_ids[start:start + INDEX_BATCH_SIZE]
+        rows = Product.objects.filter(pk__in=batch).values('pk', *fields)
+        tokens = [
+            ProductSearchToken(product_id=row['pk'], token=token, weight=weight)
+            for row in rows
+            for token, weight in product_tokens(row).items()
+        ]
+        with transaction.atomic():
+            ProductSearchToken.objects.filter(product_id__in=batch).delete()
+            ProductSearchToken.objects.bulk_create(tokens, batch_size=1000)
+
+
+def rebuild_search_index():
+    ProductSearchToken.objects.all().delete()
+    product_ids = Product.objects.order_by('pk').values_list('pk', flat=True)
+    last_pk = 0
+    total = 0
+    while True:
+        batch = list(product_ids.filter(pk__gt=last_pk)[:INDEX_BATCH_SIZE])
+        if not batch:
+            return total
+        index_products(batch)
+        total += len(batch)
+        last_pk = batch[-1]
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def match_products(queryset, query):
+    """Filter ``queryset`` to products matching every term of ``query`` as a word prefix."""
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none() if query and query.strip() else queryset
+
+    for term in terms:
+        queryset = queryset.filter(
+            pk__in=ProductSearchToken.objects.filter(token__istartswith=term).values('product_id')
+        )
+    return queryset
+
+
+def search_products(queryset, query):
+    """Like ``match_products`` but ordered by relevance, best matches first."""
+    terms = query_terms(query)
+    queryset = match_products(queryset, query)
+    if not terms:
+        return queryset
+
+    matches_any = Q()
+    for term in terms:
+        matches_any |= Q(token__istartswith=term)
+
+    rank = (
+        ProductSearchToken.objects.filter(matches_any, product=OuterRef('pk'))
+        .values('product')
+        .annotate(total=Sum('weight'))
+        .values('total')
+    )
+    return queryset.annotate(search_rank=Subquery(rank, output_field=IntegerField())).order_by('-search_rank', 'pk')
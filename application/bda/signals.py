@@ -0,0 +1,263 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import ProtectedError
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .distance_cache import distance_matrix_cache
+from .inventory import (
+    STOCK_SOURCES, deleting_stock_owner, instance_stock_lines, record_product_adjustment, record_stock_change,
+    stored_stock_lines,
+)
+from .low_stock import check_low_stock
+from .models import (
+    CityBankBranch, Product, ProductCategory, Purchase, Sale, SaleItem, Supplier, Warehouse, WarehouseStock,
+)
+from .product_lookup import invalidate_product_lookups
+from .reporting import (
+    DASHBOARD_TRACKED_FIELDS, apply_customer_sales_delta, apply_dashboard_delta, apply_product_sales_delta,
+    apply_sales_rollup_delta, contribution_delta, instance_contribution, stored_contribution,
+)
+from .search import index_products
+from .facets import invalidate_facets
+
+
+#Dashboard snapshot
+def remember_dashboard_contribution(sender, instance, raw=False, **kwargs):
+    previous = None
+    if instance.pk is not None and not raw:
+        previous = stored_contribution(sender, instance.pk)
+    instance._dashboard_contribution = previous
+
+
+def update_dashboard_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_dashboard_contribution', None) or {}
+    apply_dashboard_delta(**contribution_delta(instance_contribution(instance), previous))
+    instance._dashboard_contribution = None
+
+
+def update_dashboard_on_delete(sender, instance, **kwargs):
+    apply_dashboard_delta(**contribution_delta({}, instance_contribution(instance)))
+
+
+# Connected per sender so every other model keeps Django's fast-delete path.
+for model in DASHBOARD_TRACKED_FIELDS:
+    name = model._meta.model_name
+    pre_save.connect(remember_dashboard_contribution, sender=model, dispatch_uid=f'bda_dashboard_pre_save_{name}')
+    post_save.connect(update_dashboard_on_save, sender=model, dispatch_uid=f'bda_dashboard_post_save_{name}')
+    post_delete.connect(update_dashboard_on_delete, sender=model, dispatch_uid=f'bda_dashboard_post_delete_{name}')
+
+
+#Sales rollups
+@receiver(pre_save, sender=Sale, dispatch_uid='bda_sales_rollup_pre_save')
+def remember_sale_rollup(sender, instance, raw=False, **kwargs):
+    previous = None
+    if instance.pk is not None and not raw:
+        previous = sender.objects.filter(pk=instance.pk).values('sale_date', 'total_amount', 'customer_id').first()
+    instance._rollup_previous = previous
+
+
+@receiver(post_save, sender=Sale, dispatch_uid='bda_sales_rollup_post_save')
+def update_sales_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    current_amount = instance_contribution(instance)['total_sold_amount']
+
+    if previous is None:
+        apply_sales_rollup_delta(instance.sale_date, current_amount, 1)
+        apply_customer_sales_delta(instance.customer_id, current_amount, 1)
+    else:
+        if previous['sale_date'] != instance.sale_date:
+            apply_sales_rollup_delta(previous['sale_date'], -previous['total_amount'], -1)
+            apply_sales_rollup_delta(instance.sale_date, current_amount, 1)
+        else:
+            apply_sales_rollup_delta(instance.sale_date, current_amount - previous['total_amount'], 0)
+        if previous['customer_id'] != instance.customer_id:
+            apply_customer_sales_delta(previous['customer_id'], -previous['total_amount'], -1)
+            apply_customer_sales_delta(instance.customer_id, current_amount, 1)
+        else:
+            apply_customer_sales_delta(instance.customer_id, current_amount - previous['total_amount'], 0)
+    instance._rollup_previous = None
+
+
+@receiver(post_delete, sender=Sale, dispatch_uid='bda_sales_rollup_post_delete')
+def update_sales_rollup_on_delete(sender, instance, **kwargs):
+    amount = instance_contribution(instance)['total_sold_amount']
+    apply_sales_rollup_delta(instance.sale_date, -amount, -1)
+    apply_customer_sales_delta(instance.customer_id, -amount, -1)
+
+
+@receiver(pre_save, sender=SaleItem, dispatch_uid='bda_product_sales_pre_save')
+def remember_product_sales(sender, instance, raw=False, **kwargs):
+    previous = None
+    if instance.pk is not None and not raw:
+        previous = sender.objects.filter(pk=instance.pk).values('product_id', 'quantity').first()
+    instance._product_sales_previous = previous
+
+
+@receiver(post_save, sender=SaleItem, dispatch_uid='bda_product_sales_post_save')
+def update_product_sales_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    quantities = defaultdict(int)
+    quantities[instance.product_id] += instance.quantity or 0
+    previous = getattr(instance, '_product_sales_previous', None)
+    if previous is not None:
+        quantities[previous['product_id']] -= previous['quantity'] or 0
+    apply_product_sales_delta(quantities)
+    instance._product_sales_previous = None
+
+
+@receiver(post_delete, sender=SaleItem, dispatch_uid='bda_product_sales_post_delete')
+def update_product_sales_on_delete(sender, instance, **kwargs):
+    apply_product_sales_delta({instance.product_id: -(instance.quantity or 0)})
+
+
+#Product search index
+@receiver(post_save, sender=Product, dispatch_uid='bda_search_product_post_save')
+def index_product_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_products([instance.pk])
+
+
+@receiver(pre_save, sender=ProductCategory, dispatch_uid='bda_search_category_pre_save')
+@receiver(pre_save, sender=Supplier, dispatch_uid='bda_search_supplier_pre_save')
+def remember_indexed_name(sender, instance, raw=False, **kwargs):
+    previous = None
+    if instance.pk is not None and not raw:
+        previous = sender.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+    instance._indexed_name = previous
+
+
+@receiver(post_save, sender=ProductCategory, dispatch_uid='bda_search_category_post_save')
+@receiver(post_save, sender=Supplier, dispatch_uid='bda_search_supplier_post_save')
+def reindex_products_on_rename(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw or getattr(instance, '_indexed_name', None) in (None, instance.name):
+        return
+    lookup = 'category' if sender is ProductCategory else 'supplier'
+    index_products(Product.objects.filter(**{lookup: instance}).values_list('pk', flat=True))
+
+
+#Shop facet cache
+@receiver(post_save, sender=Product, dispatch_uid='bda_facets_product_post_save')
+@receiver(post_delete, sender=Product, dispatch_uid='bda_facets_product_post_delete')
+@receiver(post_save, sender=ProductCategory, dispatch_uid='bda_facets_category_post_save')
+@receiver(post_delete, sender=ProductCategory, dispatch_uid='bda_facets_category_post_delete')
+@receiver(post_save, sender=Supplier, dispatch_uid='bda_facets_supplier_post_save')
+@receiver(post_delete, sender=Supplier, dispatch_uid='bda_facets_supplier_post_delete')
+def invalidate_facets_on_change(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_facets()
+
+
+#Branch distance matrix cache
+@receiver(post_save, sender=CityBankBranch, dispatch_uid='bda_distance_cache_branch_post_save')
+def update_distance_cache_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    pk, latitude, longitude = instance.pk, instance.latitude, instance.longitude
+    transaction.on_commit(lambda: distance_matrix_cache.upsert(pk, latitude, longitude))
+
+
+@receiver(post_delete, sender=CityBankBranch, dispatch_uid='bda_distance_cache_branch_post_delete')
+def update_distance_cache_on_delete(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: distance_matrix_cache.remove(pk))
+
+
+#Stock ledger
+def remember_stock_lines(sender, instance, raw=False, **kwargs):
+    previous = []
+    if instance.pk is not None and not raw:
+        previous = stored_stock_lines(sender, instance.pk)
+    instance._stock_lines = previous
+
+
+def post_stock_movements_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_stock_change(instance, previous=getattr(instance, '_stock_lines', None) or [])
+    instance._stock_lines = None
+
+
+def post_stock_movements_on_delete(sender, instance, origin=None, **kwargs):
+    if origin is not None and deleting_stock_owner(origin):
+        return
+    record_stock_change(instance, previous=instance_stock_lines(instance), current=[])
+
+
+for model in STOCK_SOURCES:
+    name = model._meta.model_name
+    pre_save.connect(remember_stock_lines, sender=model, dispatch_uid=f'bda_stock_ledger_pre_save_{name}')
+    post_save.connect(post_stock_movements_on_save, sender=model, dispatch_uid=f'bda_stock_ledger_post_save_{name}')
+    post_delete.connect(post_stock_movements_on_delete, sender=model, dispatch_uid=f'bda_stock_ledger_post_delete_{name}')
+
+
+@receiver(pre_delete, sender=Warehouse, dispatch_uid='bda_stock_ledger_warehouse_pre_delete')
+def protect_warehouse_with_stock(sender, instance, **kwargs):
+    # Its balances would cascade away while the product totals kept the units.
+    held = WarehouseStock.objects.filter(warehouse=instance, quantity_in_stock__gt=0)
+    if held.exists():
+        raise ProtectedError(
+            f"Warehouse '{instance}' still holds stock; transfer it out before deleting the warehouse.", set(held),
+        )
+
+
+@receiver(pre_delete, sender=Supplier, dispatch_uid='bda_stock_ledger_supplier_pre_delete')
+def protect_supplier_with_purchases(sender, instance, **kwargs):
+    # The cascade would reverse its purchases, which fails once the stock is sold.
+    purchases = Purchase.objects.filter(supplier=instance)
+    if purchases.exists():
+        raise ProtectedError(
+            f"Supplier '{instance}' still has purchases; delete them before deleting the supplier.", set(purchases),
+        )
+
+
+@receiver(pre_save, sender=Product, dispatch_uid='bda_stock_ledger_product_pre_save')
+def keep_stock_on_product_edit(sender, instance, raw=False, **kwargs):
+    # quantity_in_stock is the running sum of the ledger, so saving a product
+    # never changes it: a possibly stale value on the instance is replaced by
+    # the stored one. Stock is changed with inventory.adjust_stock() instead.
+    if instance.pk is None or raw:
+        return
+    stored = sender.objects.filter(pk=instance.pk).values_list('quantity_in_stock', flat=True).first()
+    if stored is not None:
+        instance.quantity_in_stock = stored
+
+
+@receiver(post_save, sender=Product, dispatch_uid='bda_stock_ledger_product_post_save')
+def open_stock_on_product_create(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw and instance.quantity_in_stock:
+        record_product_adjustment(instance.pk, instance.quantity_in_stock, movement_type='opening')
+
+
+#Low-stock alerts
+@receiver(post_save, sender=Product, dispatch_uid='bda_low_stock_product_post_save')
+def check_low_stock_on_product_save(sender, instance, raw=False, **kwargs):
+    # Covers threshold and activity edits; ledger postings check the products they change.
+    if not raw:
+        check_low_stock([instance.pk])
+
+
+#Barcode lookup cache
+@receiver(pre_save, sender=Product, dispatch_uid='bda_product_lookup_pre_save')
+def remember_lookup_codes(sender, instance, raw=False, **kwargs):
+    previous = ()
+    if instance.pk is not None and not raw:
+        previous = sender.objects.filter(pk=instance.pk).values_list('bar_code', 'sku').first() or ()
+    instance._lookup_codes = previous
+
+
+@receiver(post_save, sender=Product, dispatch_uid='bda_product_lookup_post_save')
+@receiver(post_delete, sender=Product, dispatch_uid='bda_product_lookup_post_delete')
+def invalidate_lookups_on_product_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    codes = {instance.bar_code, instance.sku, *(getattr(instance, '_lookup_codes', None) or ())}
+    # After commit, so a concurrent scan cannot cache the old row again.
+    transaction.on_commit(lambda: invalidate_product_lookups(codes))
+    instance._lookup_codes = None
@@ -0,0 +1,136 @@
+import numpy as np
+
+
+LEAF_SIZE = 16
+
+
+def unit_vectors(latitudes, longitudes):
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+class SphereKDTree:
+    """k-d tree over points on the unit sphere with support for removing points.
+
+    Points are stored as 3-d unit vectors, where straight-line (chord) distance
+    orders neighbours exactly like great-circle distance, so a plain Euclidean
+    k-d tree answers nearest-branch queries. Removed points stay in the tree
+    but every node keeps a count of live points below it, which lets queries
+    skip emptied subtrees; each removal costs O(log n).
+    """
+
+    def __init__(self, latitudes, longitudes, leaf_size=LEAF_SIZE):
+        points = unit_vectors(latitudes, longitudes)
+        self.size = len(points)
+        self.leaf_size = leaf_size
+        self._points = points.tolist()
+        self._alive = [True] * self.size
+        self._order = np.arange(self.size)
+
+        # Flat node arrays; a node is a leaf when its split axis is -1.
+        self._start, self._end = [], []
+        self._axis, self._split = [], []
+        self._left, self._right, self._parent = [], [], []
+        self._live = []
+        self._leaf_of = [0] * self.size
+        if self.size:
+            self._build(points)
+        self._order = self._order.tolist()
+
+    def __len__(self):
+        return self.size
+
+    def _add_node(self, start, end, parent):
+        self._start.append(start)
+        self._end.append(end)
+        self._axis.append(-1)
+        self._split.append(0.0)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._parent.append(parent)
+        self._live.append(end - start)
+        return len(self._start) - 1
+
+    def _build(self, points):
+        stack = [self._add_node(0, self.size, -1)]
+        while stack:
+            node = stack.pop()
+            start, end = self._start[node], self._end[node]
+            indices = self._order[start:end]
+            if end - start <= self.leaf_size:
+                for index in indices:
+                    self._leaf_of[index] = node
+                continue
+
+            subset = points[indices]
+            axis = int(np.argmax(subset.max(axis=0) - subset.min(axis=0)))
+            middle = (end - start) // 2
+            partition = np.argpartition(subset[:, axis], middle)
+            self._order[start:end] = indices[partition]
+            self._axis[node] = axis
+            self._split[node] = float(points[self._order[start + middle], axis])
+
+            self._left[node] = self._add_node(start, start + middle, node)
+            self._right[node] = self._add_node(start + middle, end, node)
+            stack.extend((self._left[node], self._right[node]))
+
+    def remove(self, index):
+        if not self._alive[index]:
+            return
+        self._alive[index] = False
+        self.size -= 1
+        node = self._leaf_of[index]
+        while node != -1:
+            self._live[node] -= 1
+            node = self._parent[node]
+
+    def restore(self, index):
+        if self._alive[index]:
+            return
+        self._alive[index] = True
+        self.size += 1
+        node = self._leaf_of[index]
+        while node != -1:
+            self._live[node] += 1
+            node = self._parent[node]
+
+    def chord_distance(self, first, second):
+        return sum((a - b) ** 2 for a, b in zip(self._points[first], self._points[second])) ** 0.5
+
+    def nearest(self, index):
+        """Index of the live point closest to point ``index``, or ``None`` if none is left."""
+        if not self._start or not self._live[0]:
+            return None
+
+        x, y, z = self._points[index]
+        target = (x, y, z)
+        points, alive, order = self._points, self._alive, self._order
+        best, best_distance = None, float('inf')
+
+        stack = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if bound >= best_distance or not self._live[node]:
+                continue
+
+            axis = self._axis[node]
+            if axis == -1:
+                for position in range(self._start[node], self._end[node]):
+                    candidate = order[position]
+                    if not alive[candidate]:
+                        continue
+                    px, py, pz = points[candidate]
+                    distance = (px - x) ** 2 + (py - y) ** 2 + (pz - z) ** 2
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+                continue
+
+            offset = target[axis] - self._split[node]
+            near, far = (self._left[node], self._right[node]) if offset < 0 else (self._right[node], self._left[node])
+            # Push the far side first so the near side is searched first.
+            stack.append((far, max(bound, offset * offset)))
+            stack.append((near, bound))
+
+        return best
@@ -1,3 +1,520 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import ProtectedError, Sum
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .benchmarks import LAYOUTS, SOLVERS, compare_reports, make_branches, run_benchmarks
+from .distance_cache import DistanceMatrixCache
+from .facets import get_facets
+from .forms import ProductForm
+from .imports import MAX_INTEGER, import_branches, import_products, read_branch_rows, read_tabular_rows
+from .inventory import InsufficientStock, adjust_stock, default_warehouse_id, transfer_stock, transfer_stock_batch
+from .models import (
+    CityBankBranch, Customer, Product, ProductCategory, RouteJob, SaleItem, SalesDailyRollup, SalesItemReturn,
+    SalesMonthlyRollup, SalesReturn, StockMovement, Supplier, Warehouse, WarehouseStock,
+)
+from .posting import post_purchase, post_sale
+from .product_lookup import LOOKUP_FIELDS, local_lookups, lookup_product, lookup_products
+from .reporting import (
+    compute_dashboard_totals, get_dashboard_snapshot, rebuild_sales_rollups, top_customers, top_selling_products,
+)
+from .route_jobs import ROUTE_JOB_STALE_AFTER, branch_rows, run_route_job, submit_route_job
+from .search import search_products
+from .tsp import haversine_matrix, scale_distances
+
+
+class BenchmarkTests(SimpleTestCase):
+    def branches(self, layout='uniform', size=25):
+        latitudes, longitudes = LAYOUTS[layout](size, np.random.default_rng(0))
+        return make_branches(latitudes, longitudes)
+
+    def test_layouts_stay_near_the_requested_size(self):
+        for layout, generate in LAYOUTS.items():
+            with self.subTest(layout=layout):
+                latitudes, longitudes = generate(40, np.random.default_rng(0))
+                self.assertEqual((len(latitudes), len(longitudes)), (40, 40))
+
+    def test_every_solver_returns_a_tour_over_all_branches(self):
+        city_branches = self.branches()
+        for name, (runner, _) in SOLVERS.items():
+            with self.subTest(solver=name):
+                tour = runner(city_branches)
+                if name == 'distance_matrix':
+                    self.assertIsNone(tour)
+                else:
+                    self.assertEqual(sorted(tour), list(range(len(city_branches))))
+
+    def test_run_benchmarks_skips_matrix_solvers_above_the_limit(self):
+        report = run_benchmarks(sizes=(8, 15), layouts=('clustered',), max_matrix_size=10)
+        self.assertEqual(len(report['results']), 2 * len(SOLVERS))
+        for entry in report['results']:
+            needs_matrix = SOLVERS[entry['solver']][1]
+            if needs_matrix and entry['size'] > 10:
+                self.assertEqual(entry['status'], 'skipped')
+            else:
+                self.assertEqual(entry['status'], 'ok')
+                self.assertGreater(entry['peak_memory_bytes'], 0)
+        json.dumps(report)
+
+    def test_compare_reports_flags_slower_and_longer_results(self):
+        entry = {'layout': 'road', 'size': 10, 'solver': 'greedy', 'status': 'ok', 'seconds': 1.0, 'tour_length_m': 1000}
+        baseline = {'results': [entry]}
+        self.assertEqual(compare_reports({'results': [dict(entry, seconds=1.1)]}, baseline), [])
+        self.assertEqual(len(compare_reports({'results': [dict(entry, seconds=2.0, tour_length_m=2000)]}, baseline)), 2)
+
+    def test_benchmark_routing_command_writes_a_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark_routing', sizes=[6], layouts=['road'], solvers=['greedy', 'decomposed'], output=output,
+                stdout=io.StringIO(), stderr=io.StringIO(),
+            )
+            with open(output) as file:
+                report = json.load(file)
+        self.assertEqual([entry['solver'] for entry in report['results']], ['greedy', 'decomposed'])
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.category = ProductCategory.objects.create(name='Tools')
+        self.supplier = Supplier.objects.create(name='Acme', email='acme@example.com')
+        self.product = Product.objects.create(
+            product_name='Hammer', category=self.category, cost_price=2, selling_price=3, quantity_in_stock=5,
+        )
+        self.main = default_warehouse_id()
+        self.other = Warehouse.objects.create(name='Overflow')
+
+    def balances(self):
+        return dict(
+            WarehouseStock.objects.filter(product=self.product, quantity_in_stock__gt=0)
+            .values_list('warehouse_id', 'quantity_in_stock')
+        )
+
+    def assertLedgerBalanced(self, expected_total):
+        """Product total == sum of warehouse balances == sum of movements, per warehouse too."""
+        self.product.refresh_from_db()
+        movements = dict(
+            StockMovement.objects.filter(product=self.product).values_list('warehouse_id')
+            .annotate(total=Sum('quantity')).order_by().values_list('warehouse_id', 'total')
+        )
+        self.assertEqual(self.product.quantity_in_stock, expected_total)
+        self.assertEqual(sum(self.balances().values()), expected_total)
+        self.assertEqual({pk: total for pk, total in movements.items() if total}, self.balances())
+
+    def test_opening_stock_goes_to_the_default_warehouse(self):
+        self.assertLedgerBalanced(5)
+        self.assertEqual(self.balances(), {self.main: 5})
+
+    def test_purchases_sales_and_returns_keep_the_ledger_balanced(self):
+        post_purchase(self.supplier, [{'product_id': self.product.pk, 'quantity': 4}])
+        self.assertLedgerBalanced(9)
+        sale = post_sale([{'product_id': self.product.pk, 'quantity': 6}])
+        self.assertLedgerBalanced(3)
+        sale_item = SaleItem.objects.get(sale=sale)
+        sales_return = SalesReturn.objects.create(sale=sale)
+        SalesItemReturn.objects.create(sales_return=sales_return, sale_item=sale_item, return_quantity=2)
+        self.assertLedgerBalanced(5)
+        # The return goes with the item, so both are reversed.
+        sale_item.delete()
+        self.assertLedgerBalanced(9)
+
+    def test_sales_draw_on_other_warehouses_once_the_default_is_empty(self):
+        transfer_stock(self.product.pk, self.main, self.other.pk, 4)
+        self.assertLedgerBalanced(5)
+        post_sale([{'product_id': self.product.pk, 'quantity': 3}])
+        self.assertLedgerBalanced(2)
+        self.assertEqual(self.balances(), {self.other.pk: 2})
+
+    def test_insufficient_stock_writes_nothing(self):
+        transfer_stock(self.product.pk, self.main, self.other.pk, 2)
+        movement_count = StockMovement.objects.count()
+        with self.assertRaises(InsufficientStock):
+            post_sale([{'product_id': self.product.pk, 'quantity': 6}])
+        with self.assertRaises(InsufficientStock):
+            transfer_stock(self.product.pk, self.other.pk, self.main, 3)
+        self.assertEqual(StockMovement.objects.count(), movement_count)
+        self.assertLedgerBalanced(5)
+
+    def test_saving_a_stale_product_keeps_the_posted_stock(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        post_purchase(self.supplier, [{'product_id': self.product.pk, 'quantity': 3}])
+        stale.selling_price = 4
+        stale.save()
+        self.assertLedgerBalanced(8)
+        self.assertFalse(StockMovement.objects.filter(movement_type='adjustment').exists())
+
+    def test_form_edits_adjust_relative_to_the_stock_shown(self):
+        data = {
+            'product_name': 'Hammer', 'category': self.category.pk, 'cost_price': '2', 'is_active': 'on',
+            'quantity_in_stock': '7', 'initial-quantity_in_stock': '5',
+        }
+        post_purchase(self.supplier, [{'product_id': self.product.pk, 'quantity': 10}])
+        form = ProductForm(data, instance=Product.objects.get(pk=self.product.pk))
+        self.assertTrue(form.is_valid(), form.errors)
+        adjust_stock(self.product.pk, form.stock_adjustment())
+        form.save()
+        self.assertLedgerBalanced(17)
+
+    def test_postings_refresh_stock_filtered_facets(self):
+        cache.clear()
+        low_stock = {'stock_threshold': 2}
+        self.assertEqual(sum(option['count'] for option in get_facets(low_stock)['is_active']), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            post_sale([{'product_id': self.product.pk, 'quantity': 4}])
+        self.assertEqual(sum(option['count'] for option in get_facets(low_stock)['is_active']), 1)
+
+    def test_warehouse_holding_stock_cannot_be_deleted(self):
+        transfer_stock(self.product.pk, self.main, self.other.pk, 2)
+        with self.assertRaises(ProtectedError), transaction.atomic():
+            self.other.delete()
+        transfer_stock(self.product.pk, self.other.pk, self.main, 2)
+        self.other.delete()
+        self.assertLedgerBalanced(5)
+
+    def test_supplier_with_purchases_cannot_be_deleted(self):
+        post_purchase(self.supplier, [{'product_id': self.product.pk, 'quantity': 5}])
+        post_sale([{'product_id': self.product.pk, 'quantity': 8}])
+        with self.assertRaises(ProtectedError), transaction.atomic():
+            self.supplier.delete()
+        self.assertLedgerBalanced(2)
+        Supplier.objects.create(name='Idle', email='idle@example.com').delete()
+
+    def test_transfer_movements_reference_their_transfer_without_returned_ids(self):
+        second = Product.objects.create(
+            product_name='Wrench', category=self.category, cost_price=2, selling_price=3, quantity_in_stock=4,
+        )
+        # As on MySQL, whose bulk_create returns no primary keys.
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            transfers = transfer_stock_batch([
+                (self.product.pk, self.main, self.other.pk, 2),
+                (second.pk, self.main, self.other.pk, 3),
+            ])
+        self.assertTrue(all(transfer.pk for transfer in transfers))
+        for transfer in transfers:
+            movements = StockMovement.objects.filter(reference_type='stocktransfer', reference_id=transfer.pk)
+            self.assertEqual(
+                sorted(movements.values_list('product_id', 'quantity')),
+                [(transfer.product_id, -transfer.quantity_transferred), (transfer.product_id, transfer.quantity_transferred)],
+            )
+        self.assertLedgerBalanced(5)
+
+
+class PostingValidationTests(TestCase):
+    def setUp(self):
+        category = ProductCategory.objects.create(name='Tools')
+        self.product = Product.objects.create(
+            product_name='Hammer', category=category, cost_price=2, selling_price=3, quantity_in_stock=5,
+        )
+
+    def test_product_ids_may_be_strings(self):
+        sale = post_sale([{'product_id': str(self.product.pk), 'quantity': 2}])
+        self.assertEqual(sale.total_amount, 6)
+
+    def test_invalid_amounts_are_rejected_before_anything_is_written(self):
+        for unit_price, message in (
+            ('-1', 'cannot be negative'), ('nan', 'must be a number'), ('1e12', 'cannot be more than'),
+            ('99999999', 'total_price cannot be more than'),
+        ):
+            with self.subTest(unit_price=unit_price), self.assertRaisesMessage(ValueError, message):
+                post_sale([{'product_id': self.product.pk, 'quantity': 2, 'unit_price': unit_price}])
+        with self.assertRaisesMessage(ValueError, 'product_id must be a whole number'):
+            post_sale([{'product_id': 'three', 'quantity': 1}])
+        self.assertFalse(SaleItem.objects.exists())
+
+
+class ProductLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_lookups.clear()
+        category = ProductCategory.objects.create(name='Tools')
+        self.product = Product.objects.create(
+            product_name='Hammer', category=category, cost_price=2, selling_price=3, bar_code='HAM-1', sku='HAM',
+        )
+
+    def test_lookups_see_saved_changes(self):
+        self.assertEqual(lookup_products(['HAM-1', 'HAM', 'NONE'])['HAM']['selling_price'], '3.00')
+        self.product.selling_price = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(lookup_product('HAM-1')['selling_price'], '4.00')
+        self.assertIsNone(lookup_product('NONE'))
+
+    def test_a_lookup_that_read_the_old_row_cannot_cache_it_again(self):
+        old_rows = list(Product.objects.filter(pk=self.product.pk).values(*LOOKUP_FIELDS))
+        self.product.selling_price = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        # The save's invalidation lands between a slower lookup's query and its cache write.
+        with mock.patch('bda.product_lookup.Product.objects.filter') as query:
+            query.return_value.values.return_value = old_rows
+            self.assertEqual(lookup_product('HAM')['selling_price'], '3.00')
+        local_lookups.clear()
+        self.assertEqual(lookup_product('HAM')['selling_price'], '4.00')
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.category = ProductCategory.objects.create(name='Groceries')
+
+    def product(self, name, **fields):
+        return Product.objects.create(product_name=name, category=self.category, cost_price=1, selling_price=2, **fields)
+
+    def search(self, query):
+        return list(search_products(Product.objects.all(), query).values_list('product_name', flat=True))
+
+    def test_non_ascii_names_are_searchable(self):
+        self.product('মিনিকেট চাল')
+        self.product('Crème Brûlée')
+        self.product('Hammer')
+        self.assertEqual(self.search('চাল'), ['মিনিকেট চাল'])
+        self.assertEqual(self.search('মিনি'), ['মিনিকেট চাল'])
+        self.assertEqual(self.search('CRÈME'), ['Crème Brûlée'])
+        self.assertEqual(self.search('ঢাকা'), [])
+
+    def test_renaming_a_category_or_supplier_reindexes_its_products(self):
+        supplier = Supplier.objects.create(name='Acme', email='acme@example.com')
+        self.product('Hammer', supplier=supplier)
+        self.assertEqual(self.search('groceries acme'), ['Hammer'])
+        self.category.name = 'Hardware'
+        self.category.save()
+        supplier.name = 'Globex'
+        supplier.save()
+        self.assertEqual(self.search('groceries'), [])
+        self.assertEqual(self.search('acme'), [])
+        self.assertEqual(self.search('hardware globex'), ['Hammer'])
+
+
+class SalesReportingTests(TestCase):
+    def setUp(self):
+        category = ProductCategory.objects.create(name='Tools')
+        self.hammer = Product.objects.create(
+            product_name='Hammer', category=category, cost_price=2, selling_price=3, quantity_in_stock=50,
+        )
+        self.saw = Product.objects.create(
+            product_name='Saw', category=category, cost_price=5, selling_price=8, quantity_in_stock=50,
+        )
+        self.alice = Customer.objects.create(name='Alice', email='alice@example.com', contact_number='1')
+        self.bob = Customer.objects.create(name='Bob', email='bob@example.com', contact_number='2')
+
+    def top_lists(self):
+        return (
+            [(row['product__product_name'], row['total_quantity']) for row in top_selling_products()],
+            [(row['customer__name'], row['total_amount'], row['total_purchases']) for row in top_customers()],
+        )
+
+    def rollups(self):
+        return (
+            list(
+                SalesDailyRollup.objects.filter(sale_count__gt=0).order_by('date')
+                .values_list('date', 'total_amount', 'sale_count')
+            ),
+            list(
+                SalesMonthlyRollup.objects.filter(sale_count__gt=0).order_by('year', 'month')
+                .values_list('year', 'month', 'total_amount', 'sale_count')
+            ),
+        )
+
+    def assertSnapshotMatchesTotals(self):
+        snapshot = get_dashboard_snapshot()
+        for field, total in compute_dashboard_totals().items():
+            self.assertEqual(getattr(snapshot, field), total, field)
+
+    def test_snapshot_and_rollups_follow_sale_create_edit_and_delete(self):
+        january = timezone.make_aware(datetime(2026, 1, 31, 12))
+        february = timezone.make_aware(datetime(2026, 2, 2, 12))
+        get_dashboard_snapshot()
+
+        sale = post_sale([{'product_id': self.hammer.pk, 'quantity': 2}], customer=self.alice, sale_date=january)
+        self.assertSnapshotMatchesTotals()
+        self.assertEqual(self.rollups(), ([(january.date(), 6, 1)], [(2026, 1, 6, 1)]))
+
+        sale.sale_date = february
+        sale.total_amount = 10
+        sale.save()
+        item = SaleItem.objects.get(sale=sale)
+        item.quantity = 3
+        item.save()
+        self.assertSnapshotMatchesTotals()
+        self.assertEqual(self.rollups(), ([(february.date(), 10, 1)], [(2026, 2, 10, 1)]))
+
+        post_sale([{'product_id': self.saw.pk, 'quantity': 1}], sale_date=february)
+        sale.delete()
+        self.assertSnapshotMatchesTotals()
+        maintained = self.rollups()
+        self.assertEqual(maintained, ([(february.date(), 8, 1)], [(2026, 2, 8, 1)]))
+        rebuild_sales_rollups()
+        self.assertEqual(self.rollups(), maintained)
+
+    def test_top_lists_follow_sales_and_match_a_rebuild(self):
+        post_sale([{'product_id': self.hammer.pk, 'quantity': 4}], customer=self.alice)
+        sale = post_sale(
+            [{'product_id': self.saw.pk, 'quantity': 2}, {'product_id': self.hammer.pk, 'quantity': 1}], customer=self.bob,
+        )
+        post_sale([{'product_id': self.saw.pk, 'quantity': 1}])
+        self.assertEqual(self.top_lists(), ([('Hammer', 5), ('Saw', 3)], [('Bob', 19, 1), ('Alice', 12, 1)]))
+
+        sale.customer = self.alice
+        sale.save()
+        item = SaleItem.objects.get(sale=sale, product=self.saw)
+        item.product = self.hammer
+        item.save()
+        self.assertEqual(self.top_lists(), ([('Hammer', 7), ('Saw', 1)], [('Alice', 31, 2)]))
+
+        sale.delete()
+        maintained = self.top_lists()
+        self.assertEqual(maintained, ([('Hammer', 4), ('Saw', 1)], [('Alice', 12, 1)]))
+        rebuild_sales_rollups()
+        self.assertEqual(self.top_lists(), maintained)
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        ProductCategory.objects.create(name='Tools')
+
+    def rows(self, text):
+        return read_tabular_rows(io.BytesIO(text.encode()), 'products.csv')
+
+    def test_out_of_range_numbers_only_reject_their_row(self):
+        result = import_products(self.rows(
+            'product_name,category,cost_price,quantity_in_stock,stock_threshold\n'
+            f'Hammer,Tools,2,{MAX_INTEGER + 1},1\n'
+            f'Saw,Tools,5,3,{10 ** 20}\n'
+            'Drill,Tools,9,4,1\n'
+        ))
+        self.assertEqual(result.created, 1)
+        self.assertEqual([row for row, _ in result.errors], [2, 3])
+        self.assertIn('cannot be more than', result.errors[0][1])
+        self.assertEqual(Product.objects.get().product_name, 'Drill')
+
+    def test_unreadable_csv_is_a_value_error(self):
+        with self.assertRaisesMessage(ValueError, 'not valid CSV'):
+            import_products(self.rows('product_name,category\n"' + 'x' * 200000 + '",Tools\n'))
+
+    def test_branch_rows_are_bounded_one_by_one(self):
+        result = import_branches(read_branch_rows(io.BytesIO((
+            'name,latitude,longitude,demand,service_time\n'
+            f'Gulshan,23.78,90.41,{MAX_INTEGER + 1},5\n'
+            'Banani,23.79,90.40,3,2000\n'
+            'Motijheel,23.73,90.42,3,15\n'
+        ).encode()), 'branches.csv'))
+        self.assertEqual(result.created, 1)
+        self.assertEqual([row for row, _ in result.errors], [2, 3])
+        self.assertIn('service_time cannot be more than 1440', result.errors[1][1])
+
+
+class BranchCacheTestMixin:
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = DistanceMatrixCache(directory.name)
+        for target in ('bda.signals.distance_matrix_cache', 'bda.route_jobs.distance_matrix_cache'):
+            patcher = mock.patch(target, self.cache)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.branches = [
+            CityBankBranch.objects.create(
+                name=f'Branch {index}', latitude=23.70 + index * 0.01, longitude=90.35 + (index % 3) * 0.02,
+            )
+            for index in range(8)
+        ]
+
+    def coordinate_rows(self):
+        return [row[:3] for row in branch_rows()]
+
+
+class DistanceCacheSignalTests(BranchCacheTestMixin, TestCase):
+    def cached_ids(self):
+        return [int(pk) for pk in self.cache._load_meta()['ids']]
+
+    def test_branch_changes_patch_the_cache_on_commit(self):
+        self.cache.rebuild(self.coordinate_rows())
+        before = self.cached_ids()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            added = CityBankBranch.objects.create(name='New', latitude=23.9, longitude=90.5)
+        self.assertEqual(self.cached_ids(), before)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.cached_ids(), before + [added.pk])
+
+        moved = self.branches[2]
+        moved.latitude = 23.65
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.save()
+            self.branches[0].delete()
+
+        version = self.cache._load_meta()['version']
+        ids, matrix, matrix_version = self.cache.matrix(self.coordinate_rows())
+        # Already in line with the table, so reading it did not have to resync.
+        self.assertEqual(matrix_version, version)
+        self.assertEqual(sorted(ids), sorted(CityBankBranch.objects.values_list('pk', flat=True)))
+        coordinates = dict((row[0], row[1:]) for row in self.coordinate_rows())
+        expected = scale_distances(haversine_matrix(
+            np.array([coordinates[pk][0] for pk in ids]), np.array([coordinates[pk][1] for pk in ids]),
+        ))
+        np.testing.assert_array_equal(matrix, expected)
+
+
+@mock.patch('bda.route_jobs.close_old_connections', mock.Mock())
+@mock.patch('bda.route_jobs.ROUTE_SOLVER_TIME_LIMIT', 1)
+class RouteJobTests(BranchCacheTestMixin, TestCase):
+    def visited(self, job):
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done', job.error)
+        stops = [pk for route in job.result['vehicles'] for pk in route] + job.result['dropped']
+        self.assertEqual(sorted(stops), sorted(CityBankBranch.objects.values_list('pk', flat=True)))
+        return job.result['mode']
+
+    def test_submit_reuses_pending_jobs_and_retries_failed_or_stale_ones(self):
+        job = submit_route_job()
+        self.assertEqual(job.status, 'pending')
+        self.assertEqual(submit_route_job().pk, job.pk)
+
+        RouteJob.objects.filter(pk=job.pk).update(status='failed', error='boom', finished_at=timezone.now())
+        self.assertEqual(submit_route_job().pk, job.pk)
+        retried = submit_route_job(retry=True)
+        self.assertNotEqual(retried.pk, job.pk)
+        self.assertEqual(retried.status, 'pending')
+
+        long_ago = timezone.now() - ROUTE_JOB_STALE_AFTER - timedelta(seconds=1)
+        RouteJob.objects.filter(pk=job.pk).update(created_at=long_ago - timedelta(hours=1))
+        RouteJob.objects.filter(pk=retried.pk).update(created_at=long_ago)
+        replacement = submit_route_job()
+        self.assertNotIn(replacement.pk, (job.pk, retried.pk))
+        self.assertEqual(RouteJob.objects.get(pk=retried.pk).error, 'Job went stale.')
+
+    def test_small_changes_repair_the_previous_routes(self):
+        job = submit_route_job()
+        run_route_job(job.pk, branch_rows())
+        self.assertEqual(self.visited(job), 'full')
+
+        CityBankBranch.objects.create(name='New', latitude=23.76, longitude=90.39)
+        moved = self.branches[3]
+        moved.longitude = 90.45
+        moved.save()
+        self.branches[5].delete()
+        job = submit_route_job()
+        run_route_job(job.pk, branch_rows())
+        self.assertEqual(self.visited(job), 'incremental')
+
+    def test_time_windows_force_a_full_solve(self):
+        job = submit_route_job()
+        run_route_job(job.pk, branch_rows())
+        self.visited(job)
+        branch = self.branches[4]
+        branch.time_window_start = datetime(2026, 1, 1, 9).time()
+        branch.time_window_end = datetime(2026, 1, 1, 17).time()
+        branch.save()
+        job = submit_route_job()
+        run_route_job(job.pk, branch_rows())
+        self.assertEqual(self.visited(job), 'full')
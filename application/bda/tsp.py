@@ -0,0 +1,308 @@
+import time
+
+import numpy as np
+from ortools.constraint_solver import routing_enums_pb2
+from ortools.constraint_solver import pywrapcp
+
+from .spatial import SphereKDTree, unit_vectors
+
+
+EARTH_RADIUS_KM = 6371.0088
+# OR-Tools only works with integer arc costs, so distances are stored in metres.
+DISTANCE_SCALE = 1000
+DEFAULT_SPEED_KMH = 30
+DAY_MINUTES = 24 * 60
+# Cost of leaving a branch unserved; far above any real route length.
+DROP_PENALTY = 10 ** 9
+SOLVER_TIME_LIMIT = 10
+SPAN_COST_COEFFICIENT = 100
+
+
+def branch_coordinates(city_branches):
+    coordinates = np.array([(branch.latitude, branch.longitude) for branch in city_branches], dtype=np.float64)
+    if not len(coordinates):
+        return np.empty(0), np.empty(0)
+    return coordinates[:, 0], coordinates[:, 1]
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.asarray(chord) * 0.5, 1.0))
+
+
+def haversine_matrix(latitudes, longitudes):
+    """Great-circle distances in km between every pair of points, in one vectorized pass.
+
+    Points are mapped onto the unit sphere so the whole matrix comes out of a
+    single matrix product: |p - q|^2 = 2 - 2 p.q is the squared chord length,
+    which converts to the same arc length the haversine formula gives.
+    """
+    points = unit_vectors(latitudes, longitudes)
+    distances = points @ points.T
+    np.subtract(1.0, distances, out=distances)
+    distances *= 2.0
+    np.maximum(distances, 0.0, out=distances)
+    np.sqrt(distances, out=distances)
+    distances *= 0.5
+    np.minimum(distances, 1.0, out=distances)
+    np.arcsin(distances, out=distances)
+    distances *= 2 * EARTH_RADIUS_KM
+    # The product is not guaranteed to be bit-for-bit symmetric.
+    distances += distances.T
+    distances *= 0.5
+    return distances
+
+
+def distances_from(latitude, longitude, latitudes, longitudes, scale=DISTANCE_SCALE):
+    """Scaled distances from one point to each of the given points; one row of the matrix in O(n)."""
+    origin = unit_vectors([latitude], [longitude])[0]
+    points = unit_vectors(latitudes, longitudes)
+    chords = np.sqrt(np.maximum(2.0 - 2.0 * (points @ origin), 0.0))
+    return np.rint(chord_to_km(chords) * scale).astype(np.int64)
+
+
+def tour_length(latitudes, longitudes, tour, scale=DISTANCE_SCALE):
+    """Scaled length of a closed tour computed from coordinates, for sets too large for a full matrix."""
+    if len(tour) < 2:
+        return 0
+    points = unit_vectors(latitudes, longitudes)[np.asarray(tour)]
+    chords = np.linalg.norm(points - np.roll(points, -1, axis=0), axis=1)
+    return int(np.rint(chord_to_km(chords) * scale).sum())
+
+
+def scale_distances(distances_km, scale=DISTANCE_SCALE):
+    matrix = np.rint(distances_km * scale).astype(np.int64)
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+
+def calculate_distance_matrix(city_branches, scale=DISTANCE_SCALE):
+    latitudes, longitudes = branch_coordinates(city_branches)
+    return scale_distances(haversine_matrix(latitudes, longitudes), scale)
+
+
+def greedy_order(latitudes, longitudes, start=0):
+    """Nearest-neighbour visiting order, as indices, starting from ``start``."""
+    tree = SphereKDTree(latitudes, longitudes)
+    if not len(tree):
+        return []
+
+    order = [start]
+    tree.remove(start)
+    current = start
+    while len(tree):
+        current = tree.nearest(current)
+        tree.remove(current)
+        order.append(current)
+    return order
+
+
+def tsp_greedy_solver(city_branches):
+    city_branches = list(city_branches)
+    latitudes, longitudes = branch_coordinates(city_branches)
+    return [city_branches[index] for index in greedy_order(latitudes, longitudes)]
+
+
+def minutes_since_midnight(value):
+    return value.hour * 60 + value.minute
+
+
+def travel_minutes(distance_matrix, speed_kmh=DEFAULT_SPEED_KMH, scale=DISTANCE_SCALE):
+    metres_per_minute = speed_kmh * 1000 / 60
+    return np.ceil(np.asarray(distance_matrix) / scale * 1000 / metres_per_minute).astype(np.int64)
+
+
+def split_route(order, vehicle_count, demands=None, capacity=None):
+    """Cut one visiting order into at most ``vehicle_count`` consecutive routes.
+
+    Routes are balanced by stop count and, with a ``capacity``, closed early
+    once the next stop would overload the vehicle. Stops that do not fit in
+    any vehicle are left out; the solver decides what to do with them.
+    """
+    routes = []
+    per_vehicle = -(-len(order) // max(vehicle_count, 1)) if order else 0
+    route, load = [], 0
+    for node in order:
+        demand = demands[node] if demands is not None else 0
+        full = len(route) >= per_vehicle or (capacity is not None and load + demand > capacity)
+        if route and full:
+            routes.append(route)
+            route, load = [], 0
+            if len(routes) == vehicle_count:
+                break
+        route.append(node)
+        load += demand
+    else:
+        if route:
+            routes.append(route)
+    return routes
+
+
+class SolverTelemetry:
+    """Records (elapsed seconds, objective) for every solution OR-Tools reports during a search.
+
+    With ``plateau_seconds`` the search is finished early once the objective
+    has not improved by at least ``min_improvement`` (a fraction) for that
+    long. ``on_progress`` receives the telemetry at most every
+    ``progress_interval`` seconds, for live reporting.
+    """
+
+    def __init__(self, plateau_seconds=None, min_improvement=0.005, on_progress=None, progress_interval=1.0):
+        self.plateau_seconds = plateau_seconds
+        self.min_improvement = min_improvement
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self.solutions = []
+        self.stopped_early = False
+        self.elapsed = 0.0
+        self._routing = None
+        self._started = None
+        self._baseline = None
+        self._baseline_at = 0.0
+        self._reported_at = None
+
+    def attach(self, routing):
+        self._routing = routing
+        self._started = time.monotonic()
+        routing.AddAtSolutionCallback(self._on_solution)
+
+    def _on_solution(self):
+        elapsed = time.monotonic() - self._started
+        objective = self._routing.CostVar().Value()
+        self.solutions.append((round(elapsed, 3), objective))
+
+        if self._baseline is None or objective < self._baseline * (1 - self.min_improvement):
+            self._baseline, self._baseline_at = objective, elapsed
+        elif self.plateau_seconds is not None and elapsed - self._baseline_at >= self.plateau_seconds:
+            self.stopped_early = True
+            self._routing.solver().FinishCurrentSearch()
+
+        if self.on_progress is not None and (
+            self._reported_at is None or elapsed - self._reported_at >= self.progress_interval
+        ):
+            self._reported_at = elapsed
+            self.on_progress(self)
+
+    def finish(self):
+        self.elapsed = time.monotonic() - self._started
+
+    @property
+    def best_objective(self):
+        return min((objective for _, objective in self.solutions), default=None)
+
+    def as_dict(self):
+        return {
+            'elapsed': round(self.elapsed, 3),
+            'solution_count': len(self.solutions),
+            'best_objective': self.best_objective,
+            'stopped_early': self.stopped_early,
+            'solutions': self.solutions,
+        }
+
+
+def vrp_solver(
+    distance_matrix, vehicle_count=1, depot=0, demands=None, vehicle_capacities=None,
+    service_times=None, time_windows=None, speed_kmh=DEFAULT_SPEED_KMH,
+    initial_routes=None, time_limit=SOLVER_TIME_LIMIT, guided=False, telemetry=None,
+):
+    """Solve a vehicle routing problem over node indices of ``distance_matrix``.
+
+    ``time_windows`` holds ``(start, end)`` minutes since midnight or ``None``
+    per node and ``service_times`` the minutes spent at each node. When any
+    capacity or time window is given, nodes may be dropped at a high penalty
+    so an over-constrained day still yields routes. ``initial_routes`` (lists
+    of node indices, depot excluded) seed the search when they are feasible.
+    ``guided`` keeps improving with guided local search until ``time_limit``
+    (or a ``telemetry`` plateau) instead of stopping at the first local optimum.
+
+    Returns ``(routes, dropped)``: one list of visited nodes per vehicle
+    (depot excluded) and the nodes no vehicle could serve.
+    """
+    distance_matrix = np.asarray(distance_matrix, dtype=np.int64)
+    size = len(distance_matrix)
+    manager = pywrapcp.RoutingIndexManager(size, vehicle_count, depot)
+    routing = pywrapcp.RoutingModel(manager)
+
+    # A registered matrix is evaluated natively instead of calling back into Python per arc.
+    transit_callback_index = routing.RegisterTransitMatrix(distance_matrix.tolist())
+    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+
+    if vehicle_count > 1:
+        # Penalise the longest route so work is spread over the fleet instead of one vehicle doing it all.
+        routing.AddDimension(transit_callback_index, 0, int(distance_matrix.sum()) or 1, True, 'Distance')
+        routing.GetDimensionOrDie('Distance').SetGlobalSpanCostCoefficient(SPAN_COST_COEFFICIENT)
+
+    constrained = False
+    if vehicle_capacities is not None:
+        constrained = True
+        demand_callback_index = routing.RegisterUnaryTransitVector([int(demand) for demand in demands])
+        routing.AddDimensionWithVehicleCapacity(
+            demand_callback_index, 0, [int(capacity) for capacity in vehicle_capacities], True, 'Capacity'
+        )
+
+    if service_times is not None or time_windows is not None:
+        times = travel_minutes(distance_matrix, speed_kmh)
+        if service_times is not None:
+            # Service happens at the node the vehicle is leaving.
+            times += np.asarray(service_times, dtype=np.int64)[:, None]
+        np.fill_diagonal(times, 0)
+        time_callback_index = routing.RegisterTransitMatrix(times.tolist())
+        routing.AddDimension(time_callback_index, DAY_MINUTES, DAY_MINUTES, False, 'Time')
+        time_dimension = routing.GetDimensionOrDie('Time')
+        for node, window in enumerate(time_windows or ()):
+            if window is None or node == depot:
+                continue
+            constrained = True
+            time_dimension.CumulVar(manager.NodeToIndex(node)).SetRange(int(window[0]), int(window[1]))
+
+    if constrained:
+        for node in range(size):
+            if node != depot:
+                routing.AddDisjunction([manager.NodeToIndex(node)], DROP_PENALTY)
+
+    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+    search_parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+    search_parameters.time_limit.FromMilliseconds(int(time_limit * 1000))
+    if guided:
+        search_parameters.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
+
+    if telemetry is not None:
+        telemetry.attach(routing)
+
+    solution = None
+    if initial_routes:
+        routing.CloseModelWithParameters(search_parameters)
+        initial_routes = [list(map(int, route)) for route in initial_routes[:vehicle_count]]
+        initial_assignment = routing.ReadAssignmentFromRoutes(initial_routes, True)
+        if initial_assignment is not None:
+            solution = routing.SolveFromAssignmentWithParameters(initial_assignment, search_parameters)
+    if solution is None:
+        solution = routing.SolveWithParameters(search_parameters)
+    if telemetry is not None:
+        telemetry.finish()
+    if solution is None:
+        raise ValueError('No feasible route was found for these branches and vehicles.')
+
+    routes = []
+    visited = {depot}
+    for vehicle in range(vehicle_count):
+        route = []
+        index = solution.Value(routing.NextVar(routing.Start(vehicle)))
+        while not routing.IsEnd(index):
+            node = manager.IndexToNode(index)
+            route.append(node)
+            visited.add(node)
+            index = solution.Value(routing.NextVar(index))
+        routes.append(route)
+
+    dropped = [node for node in range(size) if node not in visited]
+    return routes, dropped
+
+
+def tsp_solver(city_branches, distance_matrix, depot=0):
+    city_branches = list(city_branches)
+    if not city_branches:
+        return []
+    latitudes, longitudes = branch_coordinates(city_branches)
+    order = greedy_order(latitudes, longitudes, start=depot)
+    routes, _ = vrp_solver(distance_matrix, depot=depot, initial_routes=[order[1:]])
+    return [city_branches[depot]] + [city_branches[node] for node in routes[0]]
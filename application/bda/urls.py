@@ -13,6 +13,9 @@ urlpatterns = [
     path('waiting-for-approval/', views.waiting_for_approval, name='waiting_for_approval'),
     path('login/', views.custom_login, name='login'),
     path('user-dashboard/', views.user_dashboard, name='user_dashboard'),
+    path('user-dashboard/sale-items/', views.sale_items_api, name='sale_items_api'),
+    path('pos/scan/', views.product_scan, name='product_scan'),
+    path('pos/scan/batch/', views.product_scan_batch, name='product_scan_batch'),
     path('subscribe/', views.subscribe, name='subscribe'),
     
     
@@ -22,10 +25,12 @@ urlpatterns = [
     path('categories/update/<int:pk>/', views.product_category_update, name='product_category_update'),
     path('categories/delete/<int:pk>/', views.product_category_delete, name='product_category_delete'),
     path('export-categories/', views.export_categories, name='export_categories'),
+    path('export/<slug:resource>/', views.export_data, name='export_data'),
     
     path('products/', views.product_list, name='product_list'),
     path('products/<int:pk>/', views.product_detail, name='product_detail'),
     path('products/create/', views.product_create, name='product_create'),
+    path('products/import/', views.product_import, name='product_import'),
     path('products/update/<int:pk>/', views.product_update, name='product_update'),
     path('products/delete/<int:pk>/', views.product_delete, name='product_delete'),
 
@@ -39,10 +44,12 @@ urlpatterns = [
     
     
     path('tsp/', views.tsp_view, name='tsp_view'),
+    path('tsp/jobs/<int:pk>/', views.route_job_status, name='route_job_status'),
     
     path('branches/', views.city_bank_branch_list, name='city_bank_branch_list'),
     path('branch/<int:pk>/', views.city_bank_branch_detail, name='city_bank_branch_detail'),
     path('branch/new/', views.city_bank_branch_create, name='city_bank_branch_create'),
+    path('branches/import/', views.city_bank_branch_import, name='city_bank_branch_import'),
     path('branch/<int:pk>/edit/', views.city_bank_branch_update, name='city_bank_branch_update'),
     path('branch/<int:pk>/delete/', views.city_bank_branch_delete, name='city_bank_branch_delete'),
     
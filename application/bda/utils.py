@@ -1,5 +1,34 @@
 import uuid
 
+from django.db import transaction
+
+from .models import Sequence
+
+
 def generate_barcode():
     barcode_value = str(uuid.uuid4().hex)[:20]
     return barcode_value
+
+
+def reserve_sequence(name, count=1):
+    """Atomically reserve ``count`` consecutive values of the named sequence."""
+    if count < 1:
+        raise ValueError('count must be at least 1.')
+    with transaction.atomic():
+        sequence, _ = Sequence.objects.select_for_update().get_or_create(name=name)
+        first = sequence.last_value + 1
+        sequence.last_value += count
+        sequence.save(update_fields=['last_value'])
+    return range(first, first + count)
+
+
+def format_sku(number):
+    return f'SKU{number:03d}'
+
+
+def reserve_skus(count):
+    return [format_sku(number) for number in reserve_sequence('sku', count)]
+
+
+def next_sku():
+    return reserve_skus(1)[0]
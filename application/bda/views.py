@@ -1,18 +1,24 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout
-from .models import Subscription, ProductCategory, Product, Supplier, Customer, Sale, SaleItem, PurchaseItem, Purchase
-from .forms import CustomUserCreationForm, CustomAuthenticationForm, SubscriptionForm, ProductCategoryForm, ProductForm, SupplierForm
+from .models import Subscription, ProductCategory, Product, Supplier, SaleItem
+from .forms import CustomUserCreationForm, CustomAuthenticationForm, SubscriptionForm, ProductCategoryForm, ProductForm, SupplierForm, ProductImportForm
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import HttpResponse
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-import csv
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.formats import date_format
 from .utils import generate_barcode
-from django.db.models import Sum, Count  
-from django.db.models import F, ExpressionWrapper, DecimalField
-from django.db.models import Sum
-from django.db.models.functions import ExtractMonth
+from .reporting import get_dashboard_snapshot, monthly_sales_series, top_customers, top_selling_products
+from .exports import stream_export
+from .search import search_products
+from .facets import apply_filters, get_facets, parse_filters
+from .imports import import_products, read_tabular_rows
+from .inventory import InsufficientStock, adjust_stock
+from .product_lookup import MAX_BATCH_CODES, lookup_product, lookup_products
+from .pagination import PAGE_SIZE_CHOICES, base_querystring, get_page_size, keyset_paginate, paginate
+from django.db import transaction
+from django.db.models import ProtectedError
 
 
 
@@ -88,41 +94,17 @@ def custom_login(request):
 
 @login_required
 def user_dashboard(request):
-    total_purchase_quantity = PurchaseItem.objects.aggregate(total_quantity=Sum('quantity'))['total_quantity'] or 0
-    total_suppliers = Supplier.objects.aggregate(total_suppliers=Count('id'))['total_suppliers'] or 0
-    total_sold_quantity = SaleItem.objects.aggregate(total_quantity=Sum('quantity'))['total_quantity'] or 0
-    total_customers = Customer.objects.aggregate(total_customers=Count('id'))['total_customers'] or 0
-    total_sold_amount = Sale.objects.aggregate(total_amount=Sum('total_amount'))['total_amount'] or 0
-    total_purchase_amount = Purchase.objects.aggregate(total_amount=Sum('total_amount'))['total_amount'] or 0
-    total_available_quantity = total_purchase_quantity - total_sold_quantity
-    available_stock_amount = Product.objects.filter(is_active=True).aggregate(
-        total_stock_amount=Sum(
-            ExpressionWrapper(
-                F('cost_price') * F('quantity_in_stock'),
-                output_field=DecimalField(),
-            )
-        )
-    )['total_stock_amount'] or 0
-
-    monthly_sales_amounts = Sale.objects.annotate(
-        month=ExtractMonth('sale_date')
-    ).values('month').annotate(
-        total_amount=Sum('total_amount')
-    ).order_by('month')
-    
-    monthly_sales_data = [
-        {'month': entry['month'], 'total_amount': float(entry['total_amount'])}
-        for entry in monthly_sales_amounts
-    ]
-    top_selling_products = SaleItem.objects.values('product__product_name').annotate(
-        total_quantity=Sum('quantity')
-    ).order_by('-total_quantity')[:10]
+    snapshot = get_dashboard_snapshot()
+
+    monthly_sales_data = monthly_sales_series()
+
+    top_selling = top_selling_products()
 
     top_selling_products_data = {
-        'labels': [item['product__product_name'] for item in top_selling_products],
+        'labels': [item['product__product_name'] for item in top_selling],
         'datasets': [{
             'label': 'Top Selling Products',
-            'data': [item['total_quantity'] for item in top_selling_products],
+            'data': [item['total_quantity'] for item in top_selling],
             'backgroundColor': 'rgba(75, 192, 192, 0.2)',
             'borderColor': 'rgba(75, 192, 192, 1)',
             'borderWidth': 1,
@@ -130,92 +112,145 @@ def user_dashboard(request):
         }]
     }
     
-    top_customers = Sale.objects.values('customer__name').annotate(
-        total_amount=Sum('total_amount'),
-        total_purchases=Count('id')
-    ).order_by('-total_amount')[:10]
+    best_customers = top_customers()
 
     top_customers_data = {
-        'labels': [customer['customer__name'] for customer in top_customers],
+        'labels': [customer['customer__name'] for customer in best_customers],
         'datasets': [{
             'label': 'Top 10 Customers',
-            'data': top_customers,
+            'data': best_customers,
             'backgroundColor': 'rgba(75, 192, 192, 0.5)',
             'borderColor': 'rgba(75, 192, 192, 1)',
             'pointRadius': 10, 
         }]
     }
     
-    sale_items = SaleItem.objects.all()
-
-
     context = {
-        'total_purchase_quantity': total_purchase_quantity,
-        'total_suppliers': total_suppliers,
-        'total_sold_quantity': total_sold_quantity,
-        'total_customers': total_customers,
-        'total_sold_amount': total_sold_amount,
-        'total_purchase_amount': total_purchase_amount,
-        'total_available_quantity': total_available_quantity,
-        'available_stock_amount': available_stock_amount,
+        'total_purchase_quantity': snapshot.total_purchase_quantity,
+        'total_suppliers': snapshot.total_suppliers,
+        'total_sold_quantity': snapshot.total_sold_quantity,
+        'total_customers': snapshot.total_customers,
+        'total_sold_amount': snapshot.total_sold_amount,
+        'total_purchase_amount': snapshot.total_purchase_amount,
+        'total_available_quantity': snapshot.total_stock_quantity,
+        'available_stock_amount': snapshot.available_stock_amount,
         'monthly_sales_data': monthly_sales_data,
         'top_selling_products_data': top_selling_products_data,
         'top_customers_data': top_customers_data,
-        'sale_items': sale_items,
+        'sale_items_page_size': SALE_ITEMS_PAGE_SIZE,
     }
 
     return render(request, 'dashboard/dashboard.html', context)
 
 
+SALE_ITEMS_PAGE_SIZE = 25
+SALE_ITEMS_MAX_PAGE_SIZE = 200
+
+
+@login_required
+def sale_items_api(request):
+    try:
+        limit = min(max(int(request.GET.get('limit', SALE_ITEMS_PAGE_SIZE)), 1), SALE_ITEMS_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = SALE_ITEMS_PAGE_SIZE
+
+    sale_items = SaleItem.objects.select_related('product', 'sale').only(
+        'id', 'quantity', 'unit_price', 'total_price', 'creation_date', 'last_updated',
+        'sale__id', 'product__product_name',
+    ).order_by('-id')
+
+    before = request.GET.get('before')
+    if before:
+        try:
+            sale_items = sale_items.filter(id__lt=int(before))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+
+    # One extra row tells us whether another page exists without a COUNT(*).
+    page = list(sale_items[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    results = [
+        {
+            'id': sale_item.id,
+            'sale': str(sale_item.sale),
+            'product': sale_item.product.product_name if sale_item.product else '',
+            'quantity': sale_item.quantity,
+            'unit_price': str(sale_item.unit_price),
+            'total_price': str(sale_item.total_price),
+            'creation_date': date_format(timezone.localtime(sale_item.creation_date), 'DATETIME_FORMAT'),
+            'last_updated': date_format(timezone.localtime(sale_item.last_updated), 'DATETIME_FORMAT'),
+        }
+        for sale_item in page
+    ]
+
+    return JsonResponse({
+        'results': results,
+        'next_cursor': page[-1].id if has_more else None,
+    })
+
+
+@login_required
+def product_scan(request):
+    code = (request.GET.get('code') or '').strip()
+    if not code:
+        return JsonResponse({'error': 'A barcode or SKU is required.'}, status=400)
+    product = lookup_product(code)
+    if product is None:
+        return JsonResponse({'error': f"No active product for '{code}'."}, status=404)
+    return JsonResponse({'product': product})
+
+
+@login_required
+def product_scan_batch(request):
+    codes = [code.strip() for code in request.GET.getlist('code') if code.strip()]
+    if not codes:
+        return JsonResponse({'error': 'At least one barcode or SKU is required.'}, status=400)
+    if len(codes) > MAX_BATCH_CODES:
+        return JsonResponse({'error': f'At most {MAX_BATCH_CODES} codes per request.'}, status=400)
+    products = lookup_products(codes)
+    return JsonResponse({
+        'results': [{'code': code, 'product': products[code]} for code in dict.fromkeys(codes)],
+        'missing': [code for code, product in products.items() if product is None],
+    })
+
+
 @login_required
 def product_category_list(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     search_name = request.GET.get('search_name')
 
-    if start_date or end_date or search_name:
-        categories = ProductCategory.objects.all()
-
-        if start_date and end_date:
-            categories = categories.filter(created_at__range=[start_date, end_date])
+    categories = ProductCategory.objects.all()
 
-        if search_name:
-            categories = categories.filter(name__icontains=search_name)
-        page = request.GET.get('page', 1)
-        paginator = Paginator(categories, 10000)
+    if start_date and end_date:
+        categories = categories.filter(created_at__range=[start_date, end_date])
 
-        try:
-            categories = paginator.page(page)
-        except PageNotAnInteger:
-            categories = paginator.page(1)
-        except EmptyPage:
-            categories = paginator.page(paginator.num_pages)
+    if search_name:
+        categories = categories.filter(name__icontains=search_name)
 
+    page_size = get_page_size(request)
+    if request.GET.get('paginate') == 'keyset':
+        categories = keyset_paginate(categories, 'created_at', request.GET.get('cursor'), page_size)
     else:
-        categories = ProductCategory.objects.all()
-        page = request.GET.get('page', 1)
-        paginator = Paginator(categories, 10000)
-
-        try:
-            categories = paginator.page(page)
-        except PageNotAnInteger:
-            categories = paginator.page(1)
-        except EmptyPage:
-            categories = paginator.page(paginator.num_pages)
+        categories = paginate(request, categories.order_by('-created_at', '-id'), page_size)
 
-    return render(request, 'product_category/product_category_list.html', {'categories': categories})
+    return render(request, 'product_category/product_category_list.html', {
+        'categories': categories,
+        'page_size': page_size,
+        'page_size_choices': PAGE_SIZE_CHOICES,
+        'base_query': base_querystring(request, 'page', 'cursor'),
+    })
 
 
 def export_categories(request):
-    categories = ProductCategory.objects.all()
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="product_categories.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['Name', 'Trade Type'])  
-    for category in categories:
-        writer.writerow([category.name, category.trade_type]) 
+    return stream_export('categories', request.GET)
+
 
-    return response
+@login_required
+def export_data(request, resource):
+    return stream_export(resource, request.GET)
 
 @login_required
 def product_category_detail(request, pk):
@@ -273,21 +308,24 @@ def product_list(request):
         products = products.filter(creation_date__range=[start_date, end_date])
 
     if search_name:
-        products = products.filter(product_name__icontains=search_name)
-        
-    products = products.select_related('category')
+        products = search_products(products, search_name)
 
-    page = request.GET.get('page', 1)
-    paginator = Paginator(products, 10000)
+    products = products.select_related('category', 'supplier')
 
-    try:
-        products = paginator.page(page)
-    except PageNotAnInteger:
-        products = paginator.page(1)
-    except EmptyPage:
-        products = paginator.page(paginator.num_pages)
+    page_size = get_page_size(request)
+    if request.GET.get('paginate') == 'keyset':
+        products = keyset_paginate(products, 'creation_date', request.GET.get('cursor'), page_size)
+    else:
+        if not search_name:
+            products = products.order_by('-creation_date', '-id')
+        products = paginate(request, products, page_size)
 
-    return render(request, 'product/product_list.html', {'products': products})
+    return render(request, 'product/product_list.html', {
+        'products': products,
+        'page_size': page_size,
+        'page_size_choices': PAGE_SIZE_CHOICES,
+        'base_query': base_querystring(request, 'page', 'cursor'),
+    })
 
 @login_required
 def product_detail(request, pk):
@@ -312,6 +350,27 @@ def product_create(request):
 
     return render(request, 'product/product_form.html', {'form': form, 'action': 'Create'})
 
+@login_required
+def product_import(request):
+    result = None
+    if request.method == 'POST':
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_products(read_tabular_rows(upload, upload.name), dry_run=form.cleaned_data['dry_run'])
+            except ValueError as error:
+                form.add_error('file', str(error))
+            else:
+                if form.cleaned_data['dry_run']:
+                    messages.success(request, f'{result.created} rows are valid.')
+                else:
+                    messages.success(request, f'{result.created} products imported.')
+    else:
+        form = ProductImportForm()
+
+    return render(request, 'product/product_import.html', {'form': form, 'result': result})
+
 @login_required
 def product_update(request, pk):
     product = get_object_or_404(Product, pk=pk)
@@ -319,9 +378,17 @@ def product_update(request, pk):
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES, instance=product)
         if form.is_valid():
-            form.save()
-            messages.success(request, 'Product updated successfully.')
-            return redirect('product_list')
+            try:
+                with transaction.atomic():
+                    # The ledger locks balances before the product row, as
+                    # postings do; the save then picks up the new stock.
+                    adjust_stock(product.pk, form.stock_adjustment())
+                    form.save()
+            except InsufficientStock as error:
+                form.add_error('quantity_in_stock', str(error))
+            else:
+                messages.success(request, 'Product updated successfully.')
+                return redirect('product_list')
     else:
         form = ProductForm(instance=product)
         form.fields['barcode'].widget.attrs['readonly'] = True  
@@ -381,12 +448,18 @@ def supplier_update(request, pk):
 def supplier_delete(request, pk):
     supplier = get_object_or_404(Supplier, pk=pk)
 
+    error = None
     if request.method == 'POST':
-        supplier.delete()
-        messages.success(request, 'Supplier deleted successfully.')
-        return redirect('supplier_list')
+        try:
+            with transaction.atomic():
+                supplier.delete()
+        except ProtectedError as exc:
+            error = exc.args[0]
+        else:
+            messages.success(request, 'Supplier deleted successfully.')
+            return redirect('supplier_list')
 
-    return render(request, 'supplier/supplier_confirm_delete.html', {'supplier': supplier})
+    return render(request, 'supplier/supplier_confirm_delete.html', {'supplier': supplier, 'error': error})
 
 
 #User logout
@@ -403,51 +476,24 @@ from .models import Product, ProductCategory, Supplier
 
 @login_required
 def shop_page(request):
-    categories = ProductCategory.objects.all()
-    suppliers = Supplier.objects.all()
-
-    category_filter = request.GET.get('category')
-    supplier_filter = request.GET.get('supplier')
-    price_filter = request.GET.get('price')
-    trade_type_filter = request.GET.get('trade_type')
-    unit_filter = request.GET.get('unit')
-    is_active_filter = request.GET.get('is_active') 
-    stock_threshold_filter = request.GET.get('stock_threshold')  
-    name_filter = request.GET.get('name') 
-
-    products = Product.objects.all()
-
-    if name_filter:
-        products = products.filter(product_name__icontains=name_filter)
-
-    if category_filter:
-        products = products.filter(category__name=category_filter)
-
-    if supplier_filter:
-        products = products.filter(supplier__name=supplier_filter)
-
-    if price_filter:
-        min_price, max_price = map(Decimal, price_filter.split('-'))
-        products = products.filter(selling_price__range=(min_price, max_price))
-
-    if trade_type_filter:
-        products = products.filter(category__trade_type=trade_type_filter)
+    filters = parse_filters(request.GET)
 
-    if unit_filter:
-        products = products.filter(unit=unit_filter)
-
-    if is_active_filter:
-        is_active_value = True if is_active_filter.lower() == 'true' else False
-        products = products.filter(is_active=is_active_value)
+    products = apply_filters(Product.objects.all(), filters, exclude='name')
+    if 'name' in filters:
+        products = search_products(products, filters['name'])
+    else:
+        products = products.order_by('product_name')
 
-    if stock_threshold_filter:
-        threshold_value = int(stock_threshold_filter)
-        products = products.filter(quantity_in_stock__lte=threshold_value)
+    page_size = get_page_size(request)
+    products = paginate(request, products, page_size)
 
     context = {
-        'categories': categories,
-        'suppliers': suppliers,
         'products': products,
+        'facets': get_facets(filters),
+        'filters': request.GET,
+        'page_size': page_size,
+        'page_size_choices': PAGE_SIZE_CHOICES,
+        'base_query': base_querystring(request, 'page'),
     }
 
     return render(request, 'shop_page.html', context)
@@ -459,98 +505,70 @@ def shop_page(request):
 # tspapp/views.py
 from django.shortcuts import render
 from .models import CityBankBranch
-from haversine import haversine, Unit
-from ortools.constraint_solver import routing_enums_pb2
-from ortools.constraint_solver import pywrapcp
-
-def calculate_distance_matrix(city_branches):
-    distance_matrix = []
-    for i in range(len(city_branches)):
-        row = []
-        for j in range(len(city_branches)):
-            if i == j:
-                row.append(0)  
-            else:
-                coords_i = (city_branches[i].latitude, city_branches[i].longitude)
-                coords_j = (city_branches[j].latitude, city_branches[j].longitude)
-                distance = haversine(coords_i, coords_j, unit=Unit.KILOMETERS)
-                row.append(distance)
-        distance_matrix.append(row)
-    return distance_matrix
-
-def find_nearest_neighbor(city_branch, unvisited_branches):
-    min_distance = float('inf')
-    nearest_neighbor = None
-
-    for neighbor in unvisited_branches:
-        coords_city = (city_branch.latitude, city_branch.longitude)
-        coords_neighbor = (neighbor.latitude, neighbor.longitude)
-        distance = haversine(coords_city, coords_neighbor, unit=Unit.KILOMETERS)
-
-        if distance < min_distance:
-            min_distance = distance
-            nearest_neighbor = neighbor
-
-    return nearest_neighbor, min_distance
-
-def tsp_greedy_solver(city_branches):
-    unvisited_branches = list(city_branches)
-    current_branch = unvisited_branches.pop(0)
-    optimized_route = [current_branch]
-
-    while unvisited_branches:
-        nearest_neighbor, distance = find_nearest_neighbor(current_branch, unvisited_branches)
-        optimized_route.append(nearest_neighbor)
-        current_branch = unvisited_branches.pop(unvisited_branches.index(nearest_neighbor))
-
-    return optimized_route
-
-def tsp_solver(city_branches, distance_matrix):
-    manager = pywrapcp.RoutingIndexManager(len(city_branches), 1, 0)
-    routing = pywrapcp.RoutingModel(manager)
-
-    def distance_callback(from_index, to_index):
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        return distance_matrix[from_node][to_node]
-
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
-
-    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
-
-    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-    search_parameters.time_limit.seconds = 10
-
-    solution = routing.SolveWithParameters(search_parameters)
-
-    index = routing.Start(0)
-    optimized_route = []
-    while not routing.IsEnd(index):
-        optimized_route.append(city_branches[manager.IndexToNode(index)])
-        index = solution.Value(routing.NextVar(index))
-
-    return optimized_route
+from .route_jobs import MAX_VEHICLES, submit_route_job
+from .tsp import DISTANCE_SCALE
+from .models import RouteJob
 
 def tsp_view(request):
-    city_branches = CityBankBranch.objects.all()
+    try:
+        vehicle_count = min(max(int(request.GET.get('vehicles', 1)), 1), MAX_VEHICLES)
+    except ValueError:
+        vehicle_count = 1
+    try:
+        vehicle_capacity = max(int(request.GET['capacity']), 1)
+    except (KeyError, ValueError):
+        vehicle_capacity = None
 
-    distance_matrix = calculate_distance_matrix(city_branches)
+    if request.method == 'POST':
+        # Explicit retry of a failed job; redirect so a reload does not resubmit.
+        submit_route_job(vehicle_count=vehicle_count, vehicle_capacity=vehicle_capacity, retry=True)
+        return redirect(request.get_full_path())
+
+    job = submit_route_job(vehicle_count=vehicle_count, vehicle_capacity=vehicle_capacity)
+
+    context = {'job': job, 'vehicle_count': vehicle_count, 'vehicle_capacity': vehicle_capacity}
+    if job.status == 'done':
+        result = job.result or {}
+        # Jobs finished before multi-vehicle routing stored a single 'ortools' route.
+        vehicle_routes = result.get('vehicles') or ([result['ortools']] if result.get('ortools') else [])
+        ids = {pk for route in vehicle_routes for pk in route} | set(result.get('greedy', [])) | set(result.get('dropped', []))
+        branches = CityBankBranch.objects.in_bulk(ids)
+        vehicle_distances = result.get('vehicle_distances') or [None] * len(vehicle_routes)
+        greedy_distance = result.get('greedy_distance')
+        context.update({
+            'vehicle_routes': [
+                {
+                    'branches': [branches[pk] for pk in route if pk in branches],
+                    'distance_km': distance / DISTANCE_SCALE if distance is not None else None,
+                }
+                for route, distance in zip(vehicle_routes, vehicle_distances)
+            ],
+            'dropped_branches': [branches[pk] for pk in result.get('dropped', []) if pk in branches],
+            'optimized_route_greedy': [branches[pk] for pk in result.get('greedy', []) if pk in branches],
+            'greedy_distance_km': greedy_distance / DISTANCE_SCALE if greedy_distance is not None else None,
+        })
 
-    optimized_route_ortools = tsp_solver(city_branches, distance_matrix)
+    return render(request, 'tspapp/tsp_result.html', context)
 
-    optimized_route_greedy = tsp_greedy_solver(city_branches)
 
-    context = {
-        'optimized_route_ortools': optimized_route_ortools,
-        'optimized_route_greedy': optimized_route_greedy,
-    }
-
-    return render(request, 'tspapp/tsp_result.html', context)
+def route_job_status(request, pk):
+    job = get_object_or_404(RouteJob, pk=pk)
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'branch_count': job.branch_count,
+        'vehicle_count': job.vehicle_count,
+        'vehicle_capacity': job.vehicle_capacity,
+        'progress': job.progress,
+        'telemetry': (job.result or {}).get('telemetry'),
+        'error': job.error,
+    })
 
 
 from django.shortcuts import render, get_object_or_404, redirect
 from .models import CityBankBranch
-from .forms import CityBankBranchForm
+from .forms import CityBankBranchForm, CityBankBranchImportForm
+from .imports import import_branches, read_branch_rows
 
 def city_bank_branch_list(request):
     branches = CityBankBranch.objects.all()
@@ -586,4 +604,25 @@ def city_bank_branch_delete(request, pk):
     if request.method == 'POST':
         branch.delete()
         return redirect('city_bank_branch_list')
-    return render(request, 'tspapp/city_bank_branch_confirm_delete.html', {'branch': branch})
\ No newline at end of file
+    return render(request, 'tspapp/city_bank_branch_confirm_delete.html', {'branch': branch})
+
+@login_required
+def city_bank_branch_import(request):
+    result = None
+    if request.method == 'POST':
+        form = CityBankBranchImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_branches(read_branch_rows(upload, upload.name), dry_run=form.cleaned_data['dry_run'])
+            except ValueError as error:
+                form.add_error('file', str(error))
+            else:
+                if form.cleaned_data['dry_run']:
+                    messages.success(request, f'{result.created} rows are valid.')
+                else:
+                    messages.success(request, f'{result.created} branches imported.')
+    else:
+        form = CityBankBranchImportForm()
+
+    return render(request, 'tspapp/city_bank_branch_import.html', {'form': form, 'result': result})